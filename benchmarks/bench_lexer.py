@@ -0,0 +1,220 @@
+"""Сравнение производительности лексера с посимвольной реализацией
+
+Запуск: python benchmarks/bench_lexer.py [--lines N]
+
+Генерирует корпус строк на языке .shldn, проверяет, что лексер выдаёт те же
+лексемы (включая позиции и ошибки), что и прежняя посимвольная реализация,
+и сравнивает время разбора корпуса.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lexer import Lexer, LexerException, Token, TokenType  # noqa: E402
+
+
+TEMPLATES = [
+    "игрок_{a}_уровень_{b} -> игрок_{a}_победитель",
+    '"у игрока {a} сила {b}" & "у монстра сила {c}" -> "игрок {a} победил монстра"',
+    "!x{a} | (y{b} & z{c}) <-> w{a} // комментарий",
+    "a{a} * b{b} + !c{c} /* вставка */ -> d{a}",
+    "? (p{a} & q{b}) -> r{c}",
+    "t{a}_{b}_{c}",
+]
+
+
+def generate_corpus(lines: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            a=rng.randint(1, 100), b=rng.randint(1, 100), c=rng.randint(1, 100)
+        )
+        for _ in range(lines)
+    ]
+
+
+def run(lexer, corpus: list[str]) -> float:
+    started = time.perf_counter()
+    for line in corpus:
+        lexer.tokenize_line(line)
+    return time.perf_counter() - started
+
+
+def tokens_or_error(lexer, line: str):
+    try:
+        return list(lexer.tokenize_line(line))
+    except LexerException as e:
+        return ("error", str(e), e.position)
+
+
+class ReferenceLexer:
+    """Прежняя посимвольная реализация лексера (для сравнения)"""
+    def __init__(self):
+        pass
+    
+    def advance(self, step: int = 1):
+        self.current_pos += step
+        if self.current_pos < len(self.text):
+            self.current_char = self.text[self.current_pos]
+        else:
+            self.current_char = None
+    
+    def peek(self, offset=1):
+        """Посмотреть на следующий символ без продвижения"""
+        pos = self.current_pos + offset
+        if pos < len(self.text):
+            return self.text[pos]
+        return None
+    
+    def skip_multiline_comment(self):
+        """Пропустить многострочный комментарий"""
+        self.advance(2)  # Пропустить /*
+        while self.current_char is not None:
+            if self.current_char == '*' and self.peek() == '/':
+                self.advance(2)
+                break
+            self.advance()
+    
+    def tokenize_line(self, text: str):
+        self.current_pos = 0
+        self.text = text
+        self.current_char = self.text[0] if text else None
+        self.tokens = []
+        
+        while self.current_char is not None:
+            self.token_pos = self.current_pos
+            
+            # Пропуск пробелов
+            if self.current_char.isspace():
+                self.advance()
+                continue
+            
+            # Комментарии
+            if self.current_char == '/' and self.peek() == '/':
+                break  # Остаток строки - комментарий
+            
+            if self.current_char == '/' and self.peek() == '*':
+                self.skip_multiline_comment()
+                continue
+            
+            # Операторы из двух символов
+            if self.current_char == '-' and self.peek() == '>':
+                self.tokens.append(Token(TokenType.IMPLIES, '->', self.token_pos))
+                self.advance(2)
+                continue
+            
+            if self.current_char == '<' and self.peek() == '-' and self.peek(2) == '>':
+                self.tokens.append(Token(TokenType.EQUIVALENCE, '<->', self.token_pos))
+                self.advance(3)
+                continue
+            
+            # Одиночные операторы
+            if self.current_char in '&*':
+                self.tokens.append(Token(TokenType.AND, self.current_char, self.token_pos))
+                self.advance()
+                continue
+            
+            if self.current_char in '|+':
+                self.tokens.append(Token(TokenType.OR, self.current_char, self.token_pos))
+                self.advance()
+                continue
+            
+            if self.current_char == '!':
+                self.tokens.append(Token(TokenType.NOT, '!', self.token_pos))
+                self.advance()
+                continue
+            
+            if self.current_char == '(':
+                self.tokens.append(Token(TokenType.LPAREN, '(', self.token_pos))
+                self.advance()
+                continue
+            
+            if self.current_char == ')':
+                self.tokens.append(Token(TokenType.RPAREN, ')', self.token_pos))
+                self.advance()
+                continue
+            
+            if self.current_char == '?':
+                self.tokens.append(Token(TokenType.QUESTION, '?', self.token_pos))
+                self.advance()
+                continue
+            
+            # Строки в кавычках
+            if self.current_char == '"':
+                self.advance()
+                self.parse_string()
+                if self.current_char != '"':
+                    raise LexerException("Незакрытая строка", self.token_pos)
+                self.advance()
+                continue
+            
+            # Идентификаторы
+            if self.current_char.isalpha() or self.current_char == '_':
+                self.parse_identifier()
+                continue
+            
+            raise LexerException(f"Неожиданный символ: {self.current_char}", self.token_pos)
+        
+        self.tokens.append(Token(TokenType.EOL, None, self.current_pos))
+        return self.tokens
+    
+    def parse_identifier(self, skip_spaces: bool = False):
+        self.current_value = []
+        while self.current_char and (
+            skip_spaces or self.current_char.isalnum() or self.current_char == "_"
+        ):
+            self.current_value.append(self.current_char)
+            self.advance()
+        
+        new_token = Token(
+            type=TokenType.IDENTIFIER,
+            value="".join(self.current_value),
+            position=self.token_pos,
+        )
+        self.tokens.append(new_token)
+    
+    def parse_string(self):
+        """Парсинг строки в кавычках"""
+        self.current_value = []
+        # Собираем все символы до закрывающей кавычки
+        while self.current_char and self.current_char != '"':
+            self.current_value.append(self.current_char)
+            self.advance()
+        
+        # Создаем токен идентификатора из строки
+        new_token = Token(
+            type=TokenType.IDENTIFIER,
+            value="".join(self.current_value),
+            position=self.token_pos,
+        )
+        self.tokens.append(new_token)
+
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=1_000_000)
+    args = arg_parser.parse_args()
+
+    corpus = generate_corpus(args.lines)
+    edge_cases = ['"незакрытая', "a $ b", "a /* без конца", "", "  ", '"a b" // c']
+    for line in corpus[:10_000] + edge_cases:
+        expected = tokens_or_error(ReferenceLexer(), line)
+        actual = tokens_or_error(Lexer(), line)
+        assert actual == expected, (line, actual, expected)
+
+    reference = run(ReferenceLexer(), corpus)
+    current = run(Lexer(), corpus)
+    print(f"Строк: {len(corpus)}")
+    print(f"Посимвольный лексер: {reference:.2f} с")
+    print(f"Лексер на регулярном выражении: {current:.2f} с")
+    print(f"Ускорение: {reference / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
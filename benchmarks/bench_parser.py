@@ -0,0 +1,285 @@
+"""Сравнение производительности синтаксического анализатора с рекурсивным спуском
+
+Запуск: python benchmarks/bench_parser.py [--lines N] [--depth N]
+
+Генерирует случайные выражения, проверяет, что анализатор строит те же
+деревья и выдаёт те же ошибки, что и прежний рекурсивный спуск, сравнивает
+время разбора и разбирает выражение, вложенность которого превышает предел
+рекурсии Python.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Iterable, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lexer import Lexer, LexerException, Token, TokenType  # noqa: E402
+from models import (  # noqa: E402
+    Operation, Predicate, Variable,
+    Conjunction, Disjunction, Negation,
+    Implication, Equivalence
+)
+from parser import Parser, ParserException  # noqa: E402
+
+
+BINARY = ["&", "|", "->", "<->", "*", "+"]
+
+
+def generate_expression(rng: random.Random, depth: int) -> str:
+    """Случайное выражение; с малой вероятностью - синтаксически неверное"""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(["", "!", "!!"]) + f"x{rng.randint(1, 50)}"
+    kind = rng.random()
+    if kind < 0.15:
+        return "!" + generate_expression(rng, depth - 1)
+    if kind < 0.35:
+        return "(" + generate_expression(rng, depth - 1) + ")"
+    left = generate_expression(rng, depth - 1)
+    right = generate_expression(rng, depth - 1)
+    return f"{left} {rng.choice(BINARY)} {right}"
+
+
+def generate_corpus(lines: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(lines):
+        line = generate_expression(rng, rng.randint(1, 6))
+        if rng.random() < 0.05:
+            # Порча строки: лишняя или пропущенная лексема
+            pos = rng.randint(0, len(line))
+            line = line[:pos] + rng.choice(["(", ")", "&", "?", " x ", ""]) + line[pos + 1:]
+        corpus.append(line)
+    return corpus
+
+
+def structure(node: Operation | Predicate):
+    """Дерево выражения в виде вложенных кортежей (без рекурсии)"""
+    result = []
+    stack = [(node, result)]
+    while stack:
+        current, target = stack.pop()
+        if isinstance(current, Predicate):
+            target.append(current.name)
+            continue
+        children = current.children if isinstance(current, Operation) else ()
+        if isinstance(current, Negation):
+            children = (current.child,)
+        item = [type(current).__name__]
+        target.append(item)
+        for child in reversed(children):
+            stack.append((child, item))
+    return result[0]
+
+
+def parse_or_error(parser_class, tokens: list[Token]):
+    try:
+        return structure(parser_class(tokens).parse())
+    except ParserException as e:
+        return ("error", str(e))
+
+
+def run(parser_class, corpus: list[list[Token]]) -> float:
+    started = time.perf_counter()
+    for tokens in corpus:
+        try:
+            parser_class(tokens).parse()
+        except ParserException:
+            pass
+    return time.perf_counter() - started
+
+
+class ReferenceParser:
+    """Прежний рекурсивный синтаксический анализатор (для сравнения)
+
+    Лексемы читаются из итератора по одной: хранятся только текущая
+    (просмотр на один токен вперёд) и предыдущая, поэтому можно разбирать
+    поток из Lexer.iter_tokens, не собирая его в список.
+    """
+    
+    def __init__(self, tokens: Iterable[Token]):
+        self.reset(tokens)
+    
+    def reset(self, tokens: Iterable[Token]):
+        """Начать разбор новой последовательности лексем"""
+        self.tokens = iter(tokens)
+        self.current_token: Optional[Token] = None
+        self.previous_token: Optional[Token] = None
+        self.loaded = False
+    
+    def parse(self) -> Operation | Predicate:
+        """Главный метод парсинга"""
+        if self.is_at_end():
+            raise ParserException("Пустое выражение")
+        
+        result = self.parse_equivalence()
+        
+        if not self.is_at_end():
+            raise ParserException(
+                f"Неожиданный токен: {self.peek().value}",
+                self.peek()
+            )
+        
+        return result
+    
+    def parse_equivalence(self) -> Operation | Predicate:
+        """Парсинг эквиваленции (самый низкий приоритет)"""
+        left = self.parse_implication()
+        
+        if self.match(TokenType.EQUIVALENCE):
+            right = self.parse_implication()
+            return Equivalence((left, right))
+        
+        return left
+    
+    def parse_implication(self) -> Operation | Predicate:
+        """Парсинг импликации (правая ассоциативность)"""
+        left = self.parse_disjunction()
+        
+        if self.match(TokenType.IMPLIES):
+            right = self.parse_implication()  # Рекурсивный вызов для правой ассоциативности
+            return Implication((left, right))
+        
+        return left
+    
+    def parse_disjunction(self) -> Operation | Predicate:
+        """Парсинг дизъюнкции"""
+        left = self.parse_conjunction()
+        
+        while self.match(TokenType.OR):
+            right = self.parse_conjunction()
+            left = Disjunction((left, right))
+        
+        return left
+    
+    def parse_conjunction(self) -> Operation | Predicate:
+        """Парсинг конъюнкции"""
+        left = self.parse_negation()
+        
+        while self.match(TokenType.AND):
+            right = self.parse_negation()
+            left = Conjunction((left, right))
+        
+        return left
+    
+    def parse_negation(self) -> Operation | Predicate:
+        """Парсинг отрицания"""
+        if self.match(TokenType.NOT):
+            operand = self.parse_negation()
+            return Negation(operand)
+        
+        return self.parse_primary()
+    
+    def parse_primary(self) -> Operation | Predicate:
+        """Парсинг базовых элементов"""
+        # Скобки
+        if self.match(TokenType.LPAREN):
+            expr = self.parse_equivalence()
+            if not self.match(TokenType.RPAREN):
+                raise ParserException(
+                    "Ожидалась закрывающая скобка",
+                    self.peek()
+                )
+            return expr
+        
+        # Идентификатор
+        if self.match(TokenType.IDENTIFIER):
+            name = self.previous().value
+            return Variable(name)
+        
+        raise ParserException(
+            f"Неожиданный токен: {self.peek().value if not self.is_at_end() else 'конец выражения'}",
+            self.peek() if not self.is_at_end() else None
+        )
+    
+    # Вспомогательные методы
+    
+    def match(self, *types: TokenType) -> bool:
+        """Проверить и продвинуться, если текущий токен соответствует типу"""
+        for token_type in types:
+            if self.check(token_type):
+                self.advance()
+                return True
+        return False
+    
+    def check(self, token_type: TokenType) -> bool:
+        """Проверить тип текущего токена"""
+        if self.is_at_end():
+            return False
+        return self.peek().type == token_type
+    
+    def advance(self) -> Token:
+        """Продвинуться к следующему токену"""
+        if not self.is_at_end():
+            self.previous_token = self.current_token
+            self.loaded = False
+        return self.previous()
+    
+    def is_at_end(self) -> bool:
+        """Проверить, достигнут ли конец"""
+        return self.peek().type == TokenType.EOL
+    
+    def peek(self) -> Token:
+        """Посмотреть текущий токен"""
+        if not self.loaded:
+            token = next(self.tokens, None)
+            if token is None:
+                # Последовательность без EOL завершается так же, как с ним
+                position = self.previous_token.position if self.previous_token else 0
+                token = Token(TokenType.EOL, None, position)
+            self.current_token = token
+            self.loaded = True
+        return self.current_token
+    
+    def previous(self) -> Token:
+        """Получить предыдущий токен"""
+        return self.previous_token
+
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--lines", type=int, default=200_000)
+    arg_parser.add_argument("--depth", type=int, default=100_000)
+    args = arg_parser.parse_args()
+
+    lexer = Lexer()
+    corpus = []
+    for line in generate_corpus(args.lines):
+        try:
+            corpus.append(lexer.tokenize_line(line))
+        except LexerException:
+            pass
+    edge_cases = [
+        "", "a <-> b <-> c", "(a <-> b <-> c)", "(a b", "a)", "(a))", "!", "(",
+        "a & & b", "? a", "a (b)", "!(a & b) -> !!c | d <-> e", "a -> b -> c",
+    ]
+    for tokens in corpus[:20_000] + [lexer.tokenize_line(line) for line in edge_cases]:
+        expected = parse_or_error(ReferenceParser, tokens)
+        actual = parse_or_error(Parser, tokens)
+        assert actual == expected, (tokens, actual, expected)
+
+    tokens_count = sum(len(tokens) for tokens in corpus)
+    reference = run(ReferenceParser, corpus)
+    current = run(Parser, corpus)
+    print(f"Выражений: {len(corpus)}, лексем: {tokens_count}")
+    print(f"Рекурсивный спуск: {reference:.2f} с ({tokens_count / reference:,.0f} лексем/с)")
+    print(f"Разбор со стеком операций: {current:.2f} с ({tokens_count / current:,.0f} лексем/с)")
+    print(f"Ускорение: {reference / current:.1f}x")
+
+    deep = "(" * args.depth + "!" * args.depth + "a" + ")" * args.depth
+    started = time.perf_counter()
+    Parser(lexer.iter_tokens(deep)).parse()
+    print(f"Вложенность {args.depth}: {time.perf_counter() - started:.2f} с")
+    try:
+        ReferenceParser(lexer.tokenize_line(deep)).parse()
+        print("Рекурсивный спуск: разобрано")
+    except RecursionError:
+        print("Рекурсивный спуск: RecursionError")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional, Sequence
+
+from lexer import SymbolTable
+from models import Disjunct, Negation, Operation, Predicate, Variable
+
+
+class ClauseArena:
+    """Хранилище дизъюнктов КНФ аксиом в плоских массивах int32
+
+    Литерал - число 2 * номер имени + 1, если литерал отрицательный.
+    Литералы всех дизъюнктов лежат подряд в literals, дизъюнкт i занимает
+    literals[offsets[i]:offsets[i + 1]], kinds[i] = 1, если дизъюнкт -
+    одиночный литерал, а не Disjunct. Дизъюнкты одной аксиомы идут подряд,
+    их границы хранятся в массивах first и end, индексируемых ID аксиомы
+    (-1 - дизъюнктов нет): ID аксиом выдаются подряд, поэтому массивы
+    плотные.
+
+    Если задан index (отсортированные по ID тройки: ID аксиомы, первый
+    дизъюнкт, следующий за последним), хранилище доступно только для
+    чтения: массивы могут быть memoryview над отображённым в память файлом
+    (см. snapshot.py), а границы ищутся двоичным поиском.
+
+    Место дизъюнктов удалённых аксиом освобождается, когда их литералы
+    занимают больше половины массива (и не меньше compact_min литералов):
+    массивы переписываются заново (compact).
+    """
+
+    # Наименьшее число литералов удалённых дизъюнктов, при котором
+    # хранилище уплотняется
+    compact_min = 4096
+
+    def __init__(
+        self,
+        literals: Optional[Sequence[int]] = None,
+        offsets: Optional[Sequence[int]] = None,
+        kinds: Optional[Sequence[int]] = None,
+        index: Optional[Sequence[int]] = None,
+    ):
+        self.literals = array("i") if literals is None else literals
+        self.offsets = array("i", [0]) if offsets is None else offsets
+        self.kinds = bytearray() if kinds is None else kinds
+        self.first = array("i")
+        self.end = array("i")
+        self.count = 0
+        self.index = index
+        self.index_ids = index[0::3] if index is not None else None
+        # Удалённые аксиомы хранилища только для чтения
+        self.removed: set[int] = set()
+        # Литералы дизъюнктов удалённых и заменённых аксиом
+        self.dead = 0
+        # Хранилище - представление другого (view): массивы дизъюнктов общие
+        self.frozen = False
+        # Границы (first, end, removed) общие с представлением или с
+        # исходным хранилищем и копируются перед первым изменением
+        self._shared_bounds = False
+
+    @property
+    def readonly(self) -> bool:
+        return self.index is not None
+
+    @property
+    def clause_count(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """Объём массивов хранилища в байтах"""
+        return (
+            len(self.literals) * 4
+            + len(self.offsets) * 4
+            + len(self.kinds)
+            + len(self.first) * 8
+        )
+
+    def __len__(self):
+        if self.readonly:
+            return len(self.index_ids) - len(self.removed)
+        return self.count
+
+    def __contains__(self, axiom_id: int) -> bool:
+        return self.bounds(axiom_id) is not None
+
+    def bounds(self, axiom_id: int) -> Optional[tuple[int, int]]:
+        """Номера первого и следующего за последним дизъюнктов аксиомы"""
+        if not self.readonly:
+            if 0 <= axiom_id < len(self.first) and self.first[axiom_id] >= 0:
+                return self.first[axiom_id], self.end[axiom_id]
+            return None
+        if axiom_id in self.removed:
+            return None
+        position = bisect_left(self.index_ids, axiom_id)
+        if position == len(self.index_ids) or self.index_ids[position] != axiom_id:
+            return None
+        return self.index[3 * position + 1], self.index[3 * position + 2]
+
+    def owners(self) -> Iterable[int]:
+        """ID аксиом, дизъюнкты которых есть в хранилище"""
+        if not self.readonly:
+            return (
+                axiom_id for axiom_id, first in enumerate(self.first) if first >= 0
+            )
+        return (axiom_id for axiom_id in self.index_ids if axiom_id not in self.removed)
+
+    def add(
+        self,
+        axiom_id: int,
+        clauses: Iterable[Operation | Predicate],
+        symbols: SymbolTable,
+    ):
+        """Сохранить дизъюнкты аксиомы"""
+        self.check_writable()
+        start = self.clause_count
+        for clause in clauses:
+            if type(clause) is Disjunct:
+                self.kinds.append(0)
+                self.literals.extend(
+                    encode_literal(literal, symbols) for literal in clause.children
+                )
+            else:
+                self.kinds.append(1)
+                self.literals.append(encode_literal(clause, symbols))
+            self.offsets.append(len(self.literals))
+        self.set_bounds(axiom_id, start, self.clause_count)
+        self._compact_if_sparse()
+
+    def copy(
+        self, axiom_id: int, other: "ClauseArena", source_id: Optional[int] = None
+    ) -> bool:
+        """Скопировать дизъюнкты аксиомы из другого хранилища без разбора
+
+        Оба хранилища должны использовать одну таблицу имён. source_id -
+        номер аксиомы в other, если он отличается от axiom_id.
+        """
+        self.check_writable()
+        bounds = other.bounds(axiom_id if source_id is None else source_id)
+        if bounds is None:
+            return False
+        first, end = bounds
+        start = self.clause_count
+        shift = len(self.literals) - other.offsets[first]
+        self.literals.extend(other.literals[other.offsets[first]:other.offsets[end]])
+        self.offsets.extend(offset + shift for offset in other.offsets[first + 1:end + 1])
+        self.kinds.extend(other.kinds[first:end])
+        self.set_bounds(axiom_id, start, self.clause_count)
+        self._compact_if_sparse()
+        return True
+
+    def set_bounds(self, axiom_id: int, first: int, end: int):
+        self._own_bounds()
+        if axiom_id >= len(self.first):
+            missing = axiom_id + 1 - len(self.first)
+            self.first.extend([-1] * missing)
+            self.end.extend([-1] * missing)
+        if self.first[axiom_id] < 0:
+            self.count += 1
+        else:
+            # Прежние дизъюнкты аксиомы заменяются
+            self.dead += self._literal_count(axiom_id)
+        self.first[axiom_id] = first
+        self.end[axiom_id] = end
+
+    def get(
+        self, axiom_id: int, names: Sequence[str]
+    ) -> Optional[list[Operation | Predicate]]:
+        """Дизъюнкты аксиомы в виде выражений или None, если их нет"""
+        bounds = self.bounds(axiom_id)
+        if bounds is None:
+            return None
+        clauses = []
+        for i in range(*bounds):
+            literals = [
+                decode_literal(value, names)
+                for value in self.literals[self.offsets[i]:self.offsets[i + 1]]
+            ]
+            clauses.append(literals[0] if self.kinds[i] else Disjunct(predicates=literals))
+        return clauses
+
+    def clause_literals(self, axiom_id: int) -> Optional[list[Sequence[int]]]:
+        """Литералы каждого дизъюнкта аксиомы без построения выражений
+
+        Для хранилища над файлом возвращаются memoryview без копирования.
+        """
+        bounds = self.bounds(axiom_id)
+        if bounds is None:
+            return None
+        return [
+            self.literals[self.offsets[i]:self.offsets[i + 1]] for i in range(*bounds)
+        ]
+
+    def remove(self, axiom_id: int):
+        """Забыть дизъюнкты аксиомы
+
+        Место в массивах освобождается при уплотнении (см. описание класса).
+        """
+        if self.readonly:
+            if axiom_id in self:
+                self._own_bounds()
+                self.removed.add(axiom_id)
+        elif 0 <= axiom_id < len(self.first) and self.first[axiom_id] >= 0:
+            self._own_bounds()
+            self.dead += self._literal_count(axiom_id)
+            self.first[axiom_id] = self.end[axiom_id] = -1
+            self.count -= 1
+            self._compact_if_sparse()
+
+    def view(self) -> "ClauseArena":
+        """Хранилище только для чтения с текущими дизъюнктами
+
+        Ничего не копируется: массивы дизъюнктов общие с исходным
+        хранилищем (в них только дописываются новые дизъюнкты, а уплотнение
+        создаёт новые массивы), границы дизъюнктов аксиом тоже общие и
+        копируются тем из двух хранилищ, которое первым их изменит.
+        Поэтому дальнейшие изменения исходного хранилища в представлении не
+        видны. memoryview здесь не подходит: пока на массив есть
+        memoryview, в него нельзя дописывать.
+        """
+        result = ClauseArena(self.literals, self.offsets, self.kinds, self.index)
+        result.index_ids = self.index_ids
+        result.first = self.first
+        result.end = self.end
+        result.count = self.count
+        result.removed = self.removed
+        result.dead = self.dead
+        result.frozen = True
+        result._shared_bounds = self._shared_bounds = True
+        return result
+
+    def compact(self):
+        """Переписать массивы без дизъюнктов удалённых и заменённых аксиом
+
+        Представления (view) сохраняют прежние массивы.
+        """
+        self.check_writable()
+        literals, offsets, kinds = array("i"), array("i", [0]), bytearray()
+        first = array("i", [-1]) * len(self.first)
+        end = array("i", [-1]) * len(self.first)
+        for axiom_id, start in enumerate(self.first):
+            if start < 0:
+                continue
+            stop = self.end[axiom_id]
+            shift = len(literals) - self.offsets[start]
+            first[axiom_id] = len(offsets) - 1
+            literals.extend(self.literals[self.offsets[start]:self.offsets[stop]])
+            offsets.extend(offset + shift for offset in self.offsets[start + 1:stop + 1])
+            kinds.extend(self.kinds[start:stop])
+            end[axiom_id] = len(offsets) - 1
+        self.literals, self.offsets, self.kinds = literals, offsets, kinds
+        self.first, self.end = first, end
+        self.dead = 0
+        self._shared_bounds = False
+
+    def _compact_if_sparse(self):
+        if (
+            not self.readonly
+            and not self.frozen
+            and self.dead >= self.compact_min
+            and 2 * self.dead > len(self.literals)
+        ):
+            self.compact()
+
+    def _literal_count(self, axiom_id: int) -> int:
+        return self.offsets[self.end[axiom_id]] - self.offsets[self.first[axiom_id]]
+
+    def _own_bounds(self):
+        """Скопировать общие с представлением границы перед изменением"""
+        if self._shared_bounds:
+            self.first = array("i", self.first)
+            self.end = array("i", self.end)
+            self.removed = set(self.removed)
+            self._shared_bounds = False
+
+    def compacted(self, axiom_ids: Iterable[int]) -> "ClauseArena":
+        """Новое хранилище только с дизъюнктами данных аксиом, по порядку"""
+        result = ClauseArena()
+        for axiom_id in axiom_ids:
+            result.copy(axiom_id, self)
+        return result
+
+    def check_writable(self):
+        if self.readonly or self.frozen:
+            raise ValueError("Хранилище дизъюнктов доступно только для чтения")
+
+
+def encode_literal(literal: Operation | Predicate, symbols: SymbolTable) -> int:
+    if type(literal) is Variable:
+        return 2 * symbols.add(literal.name)
+    if type(literal) is Negation and type(literal.child) is Variable:
+        return 2 * symbols.add(literal.child.name) + 1
+    raise ValueError(f"Дизъюнкт содержит не литерал: {literal!r}")
+
+
+def decode_literal(value: int, names: Sequence[str]) -> Operation | Predicate:
+    variable = Variable(names[value >> 1])
+    return Negation(variable) if value & 1 else variable
@@ -1,5 +1,11 @@
-import os
-import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Iterable
 
 from models import (
     Predicate,
@@ -15,161 +21,822 @@ from models import (
 )
 
 # Импортируем базу знаний
-from knowledge_base import KnowledgeBase
+from knowledge_base import Axiom, KnowledgeBase, Statement
+from proof import ProofTrace, clause_key, is_empty, is_tautology
+
+
+# Сообщения о результате, взятом из кэша, по вердикту resolution_method
+CACHED_VERDICTS = {
+    True: "теорема доказана",
+    False: "теорема не доказана",
+    None: "система противоречива",
+}
 
 
 class EngineError(Exception): ...
 
 
+class QueryTimeout(EngineError):
+    """Доказательство прервано: истёк срок QueryContext.deadline"""
+
+
+@dataclass
+class QueryContext:
+    """Состояние одного доказательства
+
+    Движок хранит только базу знаний и общие кэши; всё, что относится к
+    конкретному запросу, находится в контексте. Запросы с разными
+    контекстами можно выполнять на одном движке одновременно.
+    """
+    # Загруженные из базы знаний дизъюнкты
+    axioms: list[Disjunct] = field(default_factory=list)
+    # ID аксиомы, из которой получен каждый дизъюнкт axioms
+    # (0 - высказывание алфавита или теорема)
+    axiom_ids: array = field(default_factory=lambda: array("i"))
+    # Граф вывода доказательства
+    trace: ProofTrace = field(default_factory=ProofTrace)
+    # ID аксиом исходных дизъюнктов графа вывода (как axiom_ids)
+    trace_axiom_ids: array = field(default_factory=lambda: array("i"))
+    # Длительность этапов доказательства в секундах
+    timings: dict[str, float] = field(default_factory=dict)
+    # Момент (по time.perf_counter), после которого построение резольвент
+    # прерывается исключением QueryTimeout; None - без ограничения
+    deadline: float | None = None
+    # Результат взят из кэша результатов (ResultCache)
+    cached: bool = False
+    # Число лемм (LemmaStore), добавленных в граф вывода
+    lemmas: int = 0
+    # Число резольвент, удалённых из-за предела LogicalEngine.max_clauses
+    deleted: int = 0
+    # Поиск был полным: резольвенты не удалялись; иначе отрицательный
+    # ответ означает «неизвестно»
+    complete: bool = True
+
+
+class ResultCache:
+    """Кэш результатов доказательства с вытеснением давно не использованных (LRU)
+
+    Ключ - (версия базы знаний, её линия изменений KnowledgeBase.lineage,
+    relevance_depth, каноническая КНФ теоремы, см. LogicalEngine.goal_key):
+    версии базы и её изменённой копии с одним номером различаются линией.
+    Теоремы, совпадающие с точностью до порядка и повторов операндов
+    (a & b и b & a), дают одну запись. Когда
+    встречается более новая версия базы, записи прежних версий удаляются,
+    а результаты для более старых версий не запоминаются. Из графа вывода
+    хранится только вывод пустого дизъюнкта, поэтому объём записи не
+    зависит от числа построенных резольвент. Кэш может быть
+    общим для движков над версиями одной базы (LogicalEngine.snapshot); при
+    замене базы знаний движка его нужно очистить.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self.entries: OrderedDict[tuple, tuple] = OrderedDict()
+        # Самая новая встреченная версия базы знаний
+        self.version: int | None = None
+        self.hits = 0
+        self.misses = 0
+        # Сколько раз записи удалялись из-за изменения базы знаний
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: tuple) -> tuple | None:
+        """Найти результат (вердикт, вывод пустого дизъюнкта, ID аксиом его
+        исходных дизъюнктов)"""
+        with self._lock:
+            self._observe(key[0])
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: tuple, result: tuple):
+        """Запомнить результат доказательства"""
+        with self._lock:
+            self._observe(key[0])
+            if key[0] != self.version:
+                return
+            self.entries[key] = result
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def _observe(self, version: int):
+        if self.version is None or version > self.version:
+            if self.entries:
+                self.entries.clear()
+                self.invalidations += 1
+            self.version = version
+
+    @property
+    def hit_rate(self) -> float:
+        """Доля запросов, найденных в кэше"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "invalidations": self.invalidations,
+        }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.version = None
+
+
+class LemmaStore:
+    """Леммы - дизъюнкты, следующие из базы знаний, для следующих доказательств
+
+    Леммами становятся резольвенты, полученные при проверке
+    непротиворечивости только из аксиом и высказываний, и дизъюнкты КНФ
+    доказанных теорем - не длиннее max_length литералов. Леммы относятся к
+    одной версии базы знаний (номеру версии и линии изменений
+    KnowledgeBase.lineage): когда встречается более новая версия, они
+    удаляются, а леммы версии с тем же номером из другой линии (изменённой
+    копии базы) не запоминаются и не выдаются. При переполнении вытесняется самая старая из самых длинных
+    лемм, а лемма не короче всех хранимых не добавляется, поэтому при
+    ограничении размера сохраняются прежде всего единичные и короткие
+    дизъюнкты.
+    """
+
+    def __init__(self, maxsize: int = 10_000, max_length: int = 2):
+        self.maxsize = maxsize
+        self.max_length = max_length
+        # Ключ дизъюнкта (proof.clause_key) -> (порядковый номер, дизъюнкт)
+        self.entries: dict[frozenset, tuple[int, Operation | Predicate]] = {}
+        # Ключи лемм по длине (в порядке добавления) и по высказываниям
+        self.by_length: dict[int, dict[frozenset, None]] = {}
+        self.by_symbol: dict[str, set[frozenset]] = {}
+        self.version: int | None = None
+        self.lineage: object = None
+        self._serial = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(
+        self,
+        version: int,
+        clauses: Iterable[Operation | Predicate],
+        lineage: object = None,
+    ) -> int:
+        """Запомнить дизъюнкты, следующие из версии version линии lineage
+        базы знаний
+
+        Возвращает число добавленных лемм.
+        """
+        added = 0
+        with self._lock:
+            self._observe(version, lineage)
+            if version != self.version or lineage is not self.lineage:
+                return 0
+            for clause in clauses:
+                key = clause_key(clause)
+                if (
+                    not key
+                    or len(key) > self.max_length
+                    or key in self.entries
+                    or is_tautology(key)
+                ):
+                    continue
+                if len(self.entries) >= self.maxsize and not self._evict(len(key)):
+                    continue
+                self._serial += 1
+                self.entries[key] = (self._serial, clause)
+                self.by_length.setdefault(len(key), {})[key] = None
+                for name, _ in key:
+                    self.by_symbol.setdefault(name, set()).add(key)
+                added += 1
+        return added
+
+    def select(
+        self, version: int, symbols: Iterable[str], lineage: object = None
+    ) -> list[Operation | Predicate]:
+        """Леммы версии version линии lineage, в которые входит хотя бы одно
+        из высказываний
+
+        Сначала идут единичные дизъюнкты, затем более длинные.
+        """
+        with self._lock:
+            if version != self.version or lineage is not self.lineage:
+                return []
+            keys = set()
+            for symbol in symbols:
+                keys.update(self.by_symbol.get(symbol, ()))
+            found = [(len(key), *self.entries[key]) for key in keys]
+        found.sort(key=lambda entry: entry[:2])
+        return [clause for _, _, clause in found]
+
+    def _evict(self, length: int) -> bool:
+        """Освободить место для леммы длины length, если есть лемма длиннее"""
+        longest = max(self.by_length, default=0)
+        if longest <= length:
+            return False
+        bucket = self.by_length[longest]
+        key = next(iter(bucket))
+        del bucket[key]
+        if not bucket:
+            del self.by_length[longest]
+        del self.entries[key]
+        for name, _ in key:
+            keys = self.by_symbol[name]
+            keys.discard(key)
+            if not keys:
+                del self.by_symbol[name]
+        return True
+
+    def _observe(self, version: int, lineage: object):
+        if self.version is None or version > self.version:
+            self.entries.clear()
+            self.by_length.clear()
+            self.by_symbol.clear()
+            self.version = version
+            self.lineage = lineage
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "units": len(self.by_length.get(1, ())),
+            "version": self.version,
+        }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.by_length.clear()
+            self.by_symbol.clear()
+            self.version = None
+            self.lineage = None
+
+
 class LogicalEngine:
-    def __init__(self, knowledge_base: KnowledgeBase = None):
+    def __init__(
+        self, knowledge_base: KnowledgeBase = None, full_trace: bool = False
+    ):
         self.kb = knowledge_base or KnowledgeBase()
-        self.axioms: list[Disjunct] = []
-
-    def load_axioms_from_kb(self):
-        """Загрузить аксиомы из базы знаний в движок"""
-        self.axioms.clear()
-        for axiom in self.kb.get_all_axioms():
-            cnf = self.to_cnf(axiom.expression, output=False)
-            if cnf.children:
-                self.axioms.extend(cnf.children)
-
-    def load_statements_from_kb(self):
-        """Загрузить высказывания из базы знаний в движок как единичные дизъюнкты"""
-        for statement in self.kb.get_all_statements():
-            # Создаем единичный дизъюнкт из высказывания
-            variable = Variable(statement.name)
-            disjunct = Disjunct(predicates=[variable])
-            self.axioms.append(disjunct)
-
-    def add_axiom(self, operation: Operation) -> list[Disjunct]:
+        # Выводить каждый шаг резолюции, а не только итоговый вывод
+        self.full_trace = full_trace
+        # Контекст запросов, для которых контекст не передан явно
+        self.context = QueryContext()
+        # Вердикты непротиворечивости независимых частей базы знаний
+        self._component_verdicts: dict[object, bool] = {}
+        # КНФ аксиом строится при первом обращении; запись в базу знаний
+        # из нескольких потоков выполняется по очереди
+        self._compile_lock = threading.Lock()
+        # Результаты доказательств для неизменившейся базы знаний
+        self.result_cache = ResultCache()
+        # Дизъюнкты, выведенные из базы знаний при прежних доказательствах
+        self.lemmas = LemmaStore()
+        # Сколько резольвент хранить в графе вывода (см. saturate);
+        # None - без ограничения
+        self.max_clauses: int | None = 500_000
+
+    # Состояние контекста по умолчанию (последнего запроса без явного контекста)
+    axioms = property(lambda self: self.context.axioms)
+    axiom_ids = property(lambda self: self.context.axiom_ids)
+    trace = property(lambda self: self.context.trace)
+    trace_axiom_ids = property(lambda self: self.context.trace_axiom_ids)
+    timings = property(lambda self: self.context.timings)
+
+    def load_axioms_from_kb(
+        self, symbols: set[str] | None = None, context: QueryContext | None = None
+    ):
+        """Загрузить аксиомы из базы знаний в контекст запроса
+
+        Если задано множество высказываний symbols, загружаются только
+        аксиомы, в которые входит хотя бы одно из них.
+        """
+        context = context or self.context
+        # Новые списки вместо очистки прежних: их могли сохранить читатели
+        context.axiom_ids = array("i")
+        if symbols is None:
+            axioms = self.kb.get_all_axioms()
+        else:
+            axioms = self.kb.get_axioms_with_symbols(symbols)
+        context.axioms = self.axioms_to_clauses(axioms, context.axiom_ids)
+
+    def load_statements_from_kb(
+        self, symbols: set[str] | None = None, context: QueryContext | None = None
+    ):
+        """Загрузить высказывания из базы знаний как единичные дизъюнкты"""
+        context = context or self.context
+        if symbols is None:
+            statements = self.kb.get_all_statements()
+        else:
+            statements = self.kb.get_statements_with_symbols(symbols)
+        context.axioms.extend(self.statements_to_clauses(statements))
+        context.axiom_ids.extend([0] * len(statements))
+
+    def axioms_to_clauses(
+        self, axioms: list[Axiom], axiom_ids: array | None = None
+    ) -> list[Disjunct]:
+        """Преобразовать аксиомы в список дизъюнктов
+
+        КНФ каждой аксиомы строится один раз и хранится в базе знаний. Если
+        задан axiom_ids, в него добавляется ID аксиомы каждого дизъюнкта.
+        """
+        clauses = []
+        for axiom in axioms:
+            axiom_clauses = self.kb.get_clauses(axiom.id)
+            if axiom_clauses is None:
+                with self._compile_lock:
+                    axiom_clauses = self.kb.get_clauses(axiom.id)
+                    if axiom_clauses is None:
+                        axiom_clauses = self.to_clauses(axiom.expression)
+                        self.kb.set_clauses(axiom.id, axiom_clauses)
+            clauses.extend(axiom_clauses)
+            if axiom_ids is not None:
+                axiom_ids.extend([axiom.id] * len(axiom_clauses))
+        return clauses
+
+    def compile(
+        self, workers: int | None = None, axiom_ids: Iterable[int] | None = None
+    ) -> int:
+        """Построить КНФ аксиом базы знаний, для которых её ещё нет
+
+        Используется после массовой загрузки (KnowledgeBase.bulk_load): все
+        преобразования выполняются одним проходом, при workers > 1 - в
+        нескольких процессах. Если задан axiom_ids, рассматриваются только
+        эти аксиомы (например, только что добавленные), иначе - все.
+        Возвращает число обработанных аксиом.
+        """
+        if axiom_ids is None:
+            axiom_ids = self.kb.axioms
+        pending = [
+            self.kb.get_axiom(axiom_id)
+            for axiom_id in axiom_ids
+            if not self.kb.is_compiled(axiom_id)
+        ]
+        expressions = [axiom.expression for axiom in pending]
+        if workers is not None and workers > 1 and len(pending) > 1:
+            chunksize = max(1, len(pending) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(
+                        LogicalEngine.to_clauses, expressions, chunksize=chunksize
+                    )
+                )
+        else:
+            results = [self.to_clauses(expression) for expression in expressions]
+        with self.kb.batch():
+            for axiom, clauses in zip(pending, results):
+                self.kb.set_clauses(axiom.id, clauses)
+        return len(pending)
+
+    @staticmethod
+    def statements_to_clauses(statements: list[Statement]) -> list[Disjunct]:
+        """Представить высказывания алфавита единичными дизъюнктами"""
+        return [
+            Disjunct(predicates=[Variable(statement.name)]) for statement in statements
+        ]
+
+    def add_axiom(
+        self, operation: Operation, axiom_id: int | None = None
+    ) -> list[Disjunct]:
+        """Построить КНФ аксиомы с выводом этапов преобразования
+
+        Если задан axiom_id, полученные дизъюнкты сохраняются в базе знаний
+        и при доказательстве не строятся заново.
+        """
         cnf = self.to_cnf(operation, output=True)
         if cnf.children:
-            self.axioms.extend(cnf.children)
+            self.context.axioms.extend(cnf.children)
+            self.context.axiom_ids.extend([axiom_id or 0] * len(cnf.children))
+        if axiom_id is not None:
+            with self._compile_lock:
+                self.kb.set_clauses(axiom_id, cnf.children or [])
         return cnf.children
     
-    def check_correctness(self):
+    def retract_axiom(self, axiom_id: int) -> bool:
+        """Удалить аксиому из базы знаний и её дизъюнкты из движка
+
+        Остальные аксиомы в КНФ заново не преобразуются: из дизъюнктов
+        контекста убираются только дизъюнкты удалённой аксиомы, из графа
+        вывода - они, леммы и все выведенные из них резольвенты. Возвращает
+        False, если аксиомы с таким ID нет.
+        """
+        if not self.kb.remove_axiom(axiom_id):
+            return False
+        context = self.context
+        # Дизъюнкты одной аксиомы всегда идут подряд
+        bounds = self.clause_bounds(context.axiom_ids, axiom_id)
+        if bounds is not None:
+            del context.axioms[bounds[0]:bounds[1]]
+            del context.axiom_ids[bounds[0]:bounds[1]]
+        # Леммы (ID -1) могли быть выведены из удалённой аксиомы
+        removed = set()
+        for source_id in (axiom_id, -1):
+            bounds = self.clause_bounds(context.trace_axiom_ids, source_id)
+            if bounds is not None:
+                removed.update(range(*bounds))
+        if removed:
+            context.trace = context.trace.without(removed)
+            context.trace_axiom_ids = array(
+                "i",
+                (
+                    source_id
+                    for i, source_id in enumerate(context.trace_axiom_ids)
+                    if i not in removed
+                ),
+            )
+        return True
+
+    def snapshot(self) -> "LogicalEngine":
+        """Движок над версией базы знаний, не меняющейся при её изменениях
+
+        Копия (KnowledgeBase.snapshot) начинает с вердиктов
+        непротиворечивости этого движка; перенять вердикты, полученные
+        копией, можно методом adopt_verdicts. Кэш результатов и леммы у них
+        общие: их записи относятся к линии изменений базы
+        (KnowledgeBase.lineage), поэтому изменённая копия не смешивает свои
+        записи с записями базы.
+        """
+        engine = LogicalEngine(self.kb.snapshot(), self.full_trace)
+        engine._component_verdicts = self._component_verdicts
+        engine.result_cache = self.result_cache
+        engine.lemmas = self.lemmas
+        engine.max_clauses = self.max_clauses
+        return engine
+
+    def adopt_verdicts(self, other: "LogicalEngine"):
+        """Перенять вердикты непротиворечивости частей базы у другого движка
+
+        Ключ части (Component.key) меняется при любом изменении её
+        содержимого и общий у версий базы знаний, поэтому вердикты верны и
+        для движка над другой версией.
+        """
+        self._component_verdicts = other._component_verdicts
+
+    @staticmethod
+    def clause_bounds(axiom_ids: array, axiom_id: int) -> tuple[int, int] | None:
+        """Номера первого и следующего за последним дизъюнктов аксиомы"""
+        try:
+            start = axiom_ids.index(axiom_id)
+        except ValueError:
+            return None
+        end = start + 1
+        while end < len(axiom_ids) and axiom_ids[end] == axiom_id:
+            end += 1
+        return start, end
+
+    def check_correctness(
+        self, workers: int | None = None, context: QueryContext | None = None
+    ) -> bool | None:
+        """Проверить непротиворечивость базы знаний
+
+        База знаний разбивается на независимые части (компоненты связности
+        графа совместной встречаемости высказываний): вся система
+        противоречива тогда и только тогда, когда противоречива одна из
+        частей. Части поддерживает сама база знаний, а вердикт по каждой
+        запоминается по ключу части (Component.key), поэтому после изменения
+        базы заново проверяются только затронутые части. При
+        workers > 1 непроверенные части обрабатываются параллельно в
+        отдельных процессах, без вывода шагов резолюции. Граф вывода
+        противоречия сохраняется в context (по умолчанию - self.context).
+
+        Возвращает True, если система непротиворечива, False - если
+        противоречива, и None, если противоречие не найдено, но из-за
+        предела max_clauses часть резольвент была удалена: такой вердикт не
+        запоминается, а context.complete = False.
+        """
+        context = context or self.context
+        version, lineage = self.kb.version, self.kb.lineage
         print("Проверка непротиворечивости системы")
-        self.load_axioms_from_kb()
-        self.load_statements_from_kb()
-        for i in range(len(self.axioms)):
-            print(f"({i + 1}) {self.axioms[i]}")
-        
-        i = 0
-        visited = []
-        new_axioms = []
-        while i < len(self.axioms) + len(new_axioms):
-            j = 0
-            while j < len(self.axioms) + len(new_axioms):
-                if (i, j) in visited:
-                    j += 1
-                    continue
-                visited.append((i, j))
-                if i >= len(self.axioms):
-                    i_axiom = new_axioms[i - len(self.axioms)]
-                else:
-                    i_axiom = self.axioms[i]
-                if j >= len(self.axioms):
-                    j_axiom = new_axioms[j - len(self.axioms)]
-                else:
-                    j_axiom = self.axioms[j]
-                resolve, has_contrary = i_axiom.add_predicate(j_axiom)
-                if has_contrary:
-                    first_str = f"({i + 1}) {i_axiom}"
-                    second_str = f"({len(self.axioms) + j + 1}) {j_axiom}"
-                    max_len = max(len(first_str), len(second_str))
-                    if len(first_str) == max_len:
-                        first_str += " |"
-                        second_str += " " * (max_len - len(second_str)) + " |"
+        known = self._component_verdicts
+        verdicts = {}
+        # Части, проверка которых была неполной
+        unknown = 0
+        pending = []
+        for component in self.kb.components():
+            key = component.key
+            if key in known:
+                verdicts[key] = known[key]
+            else:
+                pending.append(
+                    (
+                        key,
+                        self.kb.component_axioms(component),
+                        self.kb.component_statements(component),
+                    )
+                )
+
+        if workers is not None and workers > 1 and len(pending) > 1:
+            clause_sets = [
+                self.axioms_to_clauses(axioms) + self.statements_to_clauses(statements)
+                for _, axioms, statements in pending
+            ]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(
+                    LogicalEngine.is_consistent,
+                    clause_sets,
+                    repeat(self.max_clauses),
+                )
+                for (key, _, _), consistent in zip(pending, results):
+                    if consistent is None:
+                        unknown += 1
                     else:
-                        second_str += " |"
-                        first_str += " " * (max_len - len(first_str)) + " |"
-                    print(first_str)
-                    if len(resolve.children) == 0:
-                        print(
-                            " " * max_len
-                            + f" |--> Пустой дизъюнкт - система противоречива."
-                        )
+                        verdicts[key] = consistent
+        else:
+            for number, (key, axioms, statements) in enumerate(pending, 1):
+                if len(pending) > 1:
+                    print(f"Независимая часть базы знаний {number}/{len(pending)}")
+                trace_axiom_ids = array("i")
+                trace = ProofTrace(
+                    self.axioms_to_clauses(axioms, trace_axiom_ids)
+                    + self.statements_to_clauses(statements)
+                )
+                conclusion = "система противоречива"
+                if self.full_trace:
+                    for i in range(len(trace)):
+                        print(trace.format_clause(i))
+                    contradiction = self.saturate(
+                        trace,
+                        conclusion=conclusion,
+                        deadline=context.deadline,
+                        max_clauses=self.max_clauses,
+                    )
+                else:
+                    contradiction = self.saturate(
+                        trace, deadline=context.deadline, max_clauses=self.max_clauses
+                    )
+                context.deleted += trace.deleted
+                if contradiction is None:
+                    if trace.deleted:
+                        unknown += 1
                     else:
-                        new_axioms.append(resolve)
-                        visited.append((i, len(new_axioms) - 1))
-                        print(
-                            " " * max_len
-                            + f" |--> ({len(self.axioms) + len(new_axioms)}) {resolve}"
-                        )
+                        verdicts[key] = True
+                    # Все резольвенты выведены только из базы знаний
+                    self.lemmas.add(
+                        version,
+                        [
+                            clause
+                            for clause in trace.clauses[trace.input_count:]
+                            if clause is not None
+                        ],
+                        lineage,
+                    )
+                else:
+                    verdicts[key] = False
+                    if not self.full_trace:
+                        print(trace.format_derivation(contradiction, conclusion))
+                    context.trace = trace
+                    context.trace_axiom_ids = trace_axiom_ids
+                    break
 
-                    print(second_str)
-                    print("\n\n")
-                    if len(resolve.children) == 0:
-                        return False
-                j += 1
-            i += 1
-        self.axioms.clear()
+        # Вердикты частей, которых больше нет в базе знаний, не нужны.
+        # Словарь заменяется целиком, поэтому другие потоки видят либо
+        # прежние вердикты, либо новые
+        self._component_verdicts = verdicts
+        if not all(verdicts.values()):
+            print("Система противоречива")
+            return False
+        if unknown:
+            context.complete = False
+            print(
+                f"Непротиворечивость не установлена: при проверке частей базы "
+                f"({unknown}) удалены резольвенты (предел {self.max_clauses})"
+            )
+            return None
         print("Система непротиворечива")
         return True
 
-    def resolution_method(self, operation: Operation):
-        # Загружаем аксиомы и высказывания из базы знаний перед началом
-        if not self.check_correctness():
-            return
-        self.load_axioms_from_kb()
-        self.load_statements_from_kb()
+    @staticmethod
+    def is_consistent(
+        axioms: list[Disjunct], max_clauses: int | None = None
+    ) -> bool | None:
+        """Проверить непротиворечивость набора дизъюнктов методом резолюций
 
-        cnf = self.to_cnf(Negation(operation), output=True)
+        None - противоречие не найдено, но часть резольвент удалена.
+        """
+        trace = ProofTrace(axioms)
+        if LogicalEngine.saturate(trace, max_clauses=max_clauses) is not None:
+            return False
+        return None if trace.deleted else True
 
-        if cnf.children:
-            print("Новые дизъюнкты")
-            for i in range(len(cnf.children)):
-                print(f"({len(self.axioms) + i + 1}) {cnf.children[i]}")
-            print()
-
-            i = 0
-            new_axioms = cnf.children
-            visited = []
-            while i < len(self.axioms) + len(new_axioms):
-                if i >= len(self.axioms):
-                    i_axiom = new_axioms[i - len(self.axioms)]
-                else:
-                    i_axiom = self.axioms[i]
-                j = 0
-                while j < len(new_axioms):
-                    if (i, j) in visited:
-                        j += 1
-                        continue
-                    visited.append((i, j))
-                    j_axiom = new_axioms[j]
-                    resolve, has_contrary = i_axiom.add_predicate(j_axiom)
-                    if has_contrary:
-                        first_str = f"({i + 1}) {i_axiom}"
-                        second_str = f"({len(self.axioms) + j + 1}) {j_axiom}"
-                        max_len = max(len(first_str), len(second_str))
-                        if len(first_str) == max_len:
-                            first_str += " |"
-                            second_str += " " * (max_len - len(second_str)) + " |"
-                        else:
-                            second_str += " |"
-                            first_str += " " * (max_len - len(first_str)) + " |"
-                        print(first_str)
-                        if len(resolve.children) == 0:
-                            print(
-                                " " * max_len
-                                + f" |--> Пустой дизъюнкт - теорема доказана."
-                            )
-                        else:
-                            new_axioms.append(resolve)
-                            visited.append((i, len(new_axioms) - 1))
-                            print(
-                                " " * max_len
-                                + f" |--> ({len(self.axioms) + len(new_axioms)}) {resolve}"
-                            )
-
-                        print(second_str)
-                        print("\n\n")
+    @staticmethod
+    def saturate(
+        trace: ProofTrace,
+        support: int = 0,
+        conclusion: str | None = None,
+        deadline: float | None = None,
+        max_clauses: int | None = None,
+    ) -> int | None:
+        """Строить резольвенты, пока не будет получен пустой дизъюнкт
+
+        Дизъюнкты опорного множества - с номерами начиная с support (при
+        support=0 - все) и все полученные резольвенты - по очереди
+        сопоставляются с каждым дизъюнктом, стоящим не дальше них. Так каждая
+        пара, в которой есть хотя бы один дизъюнкт опорного множества,
+        рассматривается ровно один раз.
+        Возвращает номер пустого дизъюнкта или None, если новых резольвент
+        больше нет. Если задан conclusion, каждый шаг выводится на экран.
+        Если задан deadline (по time.perf_counter) и он прошёл, выбрасывается
+        QueryTimeout.
+        Если задан max_clauses и резольвент стало больше, часть из них
+        удаляется (ProofTrace.reduce), пока не останется половина предела.
+        Память при этом ограничена, но метод становится неполным: пустой
+        дизъюнкт может не найтись, хотя он выводим.
+        """
+        inputs = trace.input_count
+        given = support
+        while given < len(trace):
+            if deadline is not None and time.perf_counter() > deadline:
+                raise QueryTimeout("Превышено время доказательства")
+            given_clause = trace.clauses[given]
+            if given_clause is None:
+                given += 1
+                continue
+            for i in range(given + 1):
+                clause = trace.clauses[i]
+                if clause is None:
+                    continue
+                resolve, has_contrary = clause.add_predicate(given_clause)
+                if has_contrary:
+                    index = trace.add_resolvent(resolve, i, given)
+                    if index is not None:
+                        if conclusion is not None:
+                            print(trace.format_step(index, conclusion))
                         if len(resolve.children) == 0:
-                            return
-                    j += 1
-                i += 1
+                            return index
+            given += 1
+            if (
+                max_clauses is not None
+                and len(trace) - inputs - trace.deleted > max_clauses
+            ):
+                trace.reduce(max_clauses // 2)
+        return None
+
+    def resolution_method(
+        self,
+        operation: Operation,
+        relevance_depth: int | None = None,
+        context: QueryContext | None = None,
+    ) -> bool | None:
+        """Доказать теорему методом резолюций
+
+        В доказательстве участвуют только аксиомы и высказывания, связанные
+        с высказываниями теоремы в графе совместной встречаемости: по
+        умолчанию вся компонента связности цели (это не влияет на полноту),
+        а при заданном relevance_depth - только окрестность цели радиуса
+        relevance_depth (эвристика в духе SInE, полнота не гарантируется).
+
+        Возвращает True, если теорема доказана, False - если нет, и None,
+        если база знаний противоречива. Если из-за предела max_clauses поиск
+        был неполным (context.complete = False), False означает, что
+        результат неизвестен; такой результат не запоминается. Загруженные дизъюнкты, граф вывода и
+        длительность этапов (в секундах) сохраняются в context; без него - в
+        self.context, поэтому одновременные запросы к одному движку должны
+        передавать каждый свой контекст. Сам движок запрос не изменяет
+        (кроме общих кэшей).
+        На экран выводятся только шаги, ведущие к пустому дизъюнкту, а при
+        full_trace - все построенные резольвенты.
+
+        Пока база знаний не меняется, результат для равносильной по КНФ
+        теоремы берётся из result_cache: доказательство не повторяется,
+        context.cached = True, а граф вывода содержит только вывод пустого
+        дизъюнкта исходного доказательства (пуст, если его не было).
+        """
+        context = context or self.context
+        started = time.perf_counter()
+        version, lineage = self.kb.version, self.kb.lineage
+        key = (version, lineage, relevance_depth, self.goal_key(operation))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            verdict, context.trace, context.trace_axiom_ids = cached
+            context.timings = {"cache": time.perf_counter() - started}
+            context.cached = True
+            context.lemmas = context.trace_axiom_ids.count(-1)
+            context.deleted = 0
+            context.complete = True
+            print(f"Результат взят из кэша: {CACHED_VERDICTS[verdict]}")
+            return verdict
+        context.cached = False
+        verdict = self._prove(operation, relevance_depth, context, version, lineage)
+        if verdict is False and not context.complete:
+            # Отрицательный ответ неполного поиска не окончателен
+            return verdict
+        self.result_cache.put(key, (verdict, *self.proof_of(context)))
+        return verdict
+
+    @staticmethod
+    def proof_of(context: QueryContext) -> tuple[ProofTrace, array]:
+        """Вывод пустого дизъюнкта из графа вывода контекста и ID аксиом
+        его исходных дизъюнктов (пустой граф, если пустого дизъюнкта нет)"""
+        trace = context.trace
+        if not len(trace) or trace.clauses[-1] is None or not is_empty(trace.clauses[-1]):
+            return ProofTrace(), array("i")
+        proof, used = trace.proof_trace(len(trace) - 1)
+        axiom_ids = context.trace_axiom_ids
+        return proof, array("i", (axiom_ids[i] for i in used if i < len(axiom_ids)))
+
+    def _prove(
+        self,
+        operation: Operation,
+        relevance_depth: int | None,
+        context: QueryContext,
+        version: int,
+        lineage: object,
+    ) -> bool | None:
+        context.timings = timings = {}
+        context.deleted = 0
+        context.complete = True
+        started = time.perf_counter()
+        consistent = self.check_correctness(context=context)
+        timings["consistency"] = time.perf_counter() - started
+        # При неизвестной непротиворечивости (None) найденное доказательство
+        # всё равно верно: теорема выводится из базы знаний
+        if consistent is False:
+            return None
+
+        started = time.perf_counter()
+        # Загружаем из базы знаний только то, что относится к цели
+        relevant = self.kb.relevant_symbols(operation.variables(), relevance_depth)
+        self.load_axioms_from_kb(relevant, context)
+        self.load_statements_from_kb(relevant, context)
+        cnf = self.to_cnf(Negation(operation), output=True)
+        timings["cnf"] = time.perf_counter() - started
+
+        context.trace = trace = ProofTrace(context.axioms)
+        context.trace_axiom_ids = array("i", context.axiom_ids)
+        # Леммы прежних доказательств - исходные дизъюнкты, как аксиомы
+        # (ID аксиомы -1); они следуют из базы знаний, поэтому полнота
+        # метода опорного множества сохраняется
+        lemmas = self.lemmas.select(version, relevant, lineage)
+        for lemma in lemmas:
+            if trace.add_lemma(lemma) is not None:
+                context.trace_axiom_ids.append(-1)
+        context.lemmas = len(trace) - len(context.axioms)
+        if context.lemmas:
+            print(f"Леммы прежних доказательств: {context.lemmas}")
+        support = len(trace)
+        if cnf.children is None:
+            # Отрицание теоремы невыполнимо само по себе
+            print("Отрицание теоремы невыполнимо - теорема общезначима")
+            return True
+        if not cnf.children:
+            print("Отрицание теоремы общезначимо - теорема не доказана")
+            return False
+
+        for clause in cnf.children:
+            trace.add_input(clause)
+        print("Новые дизъюнкты")
+        for i in range(support, len(trace)):
+            print(trace.format_clause(i))
+        print()
+
+        conclusion = "теорема доказана"
+        started = time.perf_counter()
+        if self.full_trace:
+            empty = self.saturate(
+                trace, support, conclusion, context.deadline, self.max_clauses
+            )
+        else:
+            empty = self.saturate(
+                trace, support, deadline=context.deadline, max_clauses=self.max_clauses
+            )
+        timings["resolution"] = time.perf_counter() - started
+        context.deleted += trace.deleted
+        if trace.deleted:
+            context.complete = False
+            print(
+                f"Удалено резольвент: {trace.deleted} "
+                f"(предел {self.max_clauses}), поиск неполон"
+            )
+        if empty is not None:
+            if not self.full_trace:
+                print(trace.format_derivation(empty, conclusion))
+            # Доказанная теорема следует из базы знаний
+            self.lemmas.add(version, self.to_clauses(operation), lineage)
+            return True
+        if not context.complete:
+            print("Пустой дизъюнкт не найден, но поиск был неполон - результат неизвестен")
+        else:
             print("Не удалось образовать пустой дизъюнкт, теорема не доказана")
+        return False
+
+    @staticmethod
+    def goal_key(operation: Operation | Predicate) -> frozenset | None:
+        """Каноническая КНФ теоремы: множество дизъюнктов без тавтологий
+
+        Дизъюнкты - множества литералов, поэтому ключ не зависит от порядка
+        и повторов операндов. None - КНФ невыполнима.
+        """
+        clauses = LogicalEngine.to_cnf(operation).children
+        if clauses is None:
+            return None
+        keys = (clause_key(clause) for clause in clauses)
+        return frozenset(key for key in keys if not is_tautology(key))
 
     @staticmethod
     def remove_equivalences(operation: Operation | Predicate) -> Operation | Predicate:
@@ -251,67 +918,36 @@ class LogicalEngine:
     @staticmethod
     def group_conjunctions(operation: Operation | Predicate) -> Operation | Predicate:
         if type(operation) is Disjunction:
-            first_child, second_child = operation.children
-            if type(first_child) is Conjunction:
-                return Conjunction(
-                    (
-                        LogicalEngine.group_conjunctions(
-                            Disjunction(
-                                (
-                                    LogicalEngine.group_conjunctions(second_child),
-                                    LogicalEngine.group_conjunctions(
-                                        first_child.children[0]
-                                    ),
-                                )
-                            )
-                        ),
-                        LogicalEngine.group_conjunctions(
-                            Disjunction(
-                                (
-                                    LogicalEngine.group_conjunctions(second_child),
-                                    LogicalEngine.group_conjunctions(
-                                        first_child.children[1]
-                                    ),
-                                )
-                            )
-                        ),
-                    )
-                )
-            elif type(second_child) is Conjunction:
-                return Conjunction(
-                    (
-                        LogicalEngine.group_conjunctions(
-                            Disjunction(
-                                (
-                                    LogicalEngine.group_conjunctions(first_child),
-                                    LogicalEngine.group_conjunctions(
-                                        second_child.children[0]
-                                    ),
-                                )
-                            )
-                        ),
-                        LogicalEngine.group_conjunctions(
-                            Disjunction(
-                                (
-                                    LogicalEngine.group_conjunctions(first_child),
-                                    LogicalEngine.group_conjunctions(
-                                        second_child.children[1]
-                                    ),
-                                )
-                            )
-                        ),
-                    )
+            # Дизъюнкция может быть n-арной: раскрывается первая конъюнкция
+            children = operation.children
+            index = next(
+                (i for i, child in enumerate(children) if type(child) is Conjunction),
+                None,
+            )
+            if index is None:
+                processed = tuple(
+                    LogicalEngine.group_conjunctions(child) for child in children
                 )
-            else:
-                processed_first = LogicalEngine.group_conjunctions(first_child)
-                processed_second = LogicalEngine.group_conjunctions(second_child)
-                disjunction = Disjunction((processed_first, processed_second))
-                if (
-                    type(processed_first) is Conjunction
-                    or type(processed_second) is Conjunction
-                ):
+                disjunction = Disjunction(processed)
+                if any(type(child) is Conjunction for child in processed):
                     return LogicalEngine.group_conjunctions(disjunction)
                 return disjunction
+
+            others = tuple(
+                LogicalEngine.group_conjunctions(child)
+                for i, child in enumerate(children)
+                if i != index
+            )
+            return Conjunction(
+                tuple(
+                    LogicalEngine.group_conjunctions(
+                        Disjunction(
+                            others + (LogicalEngine.group_conjunctions(part),)
+                        )
+                    )
+                    for part in children[index].children
+                )
+            )
         elif isinstance(operation, Operation):
             new_children = tuple(
                 LogicalEngine.group_conjunctions(child) for child in operation.children
@@ -324,30 +960,33 @@ class LogicalEngine:
     def to_cnf(
         operation: Operation | Predicate, output: bool = False
     ) -> CNF | Predicate:
-        if not output:
-            devnull = open(os.devnull, "w")
-            stdout = devnull
-        else:
-            stdout = sys.stdout
-        print("============", file=stdout)
-        print(f"Исходное выражение: {operation}", file=stdout)
+        if output:
+            print("============")
+            print(f"Исходное выражение: {operation}")
         operation = LogicalEngine.remove_equivalences(operation)
         operation = LogicalEngine.remove_implications(operation)
         operation = LogicalEngine.remove_double_negations(operation)
-        print(
-            f"После избавления от эквиваленций, импликаций и двойных отрицаний: {operation}",
-            file=stdout,
-        )
+        if output:
+            print(
+                "После избавления от эквиваленций, импликаций и двойных отрицаний: "
+                f"{operation}"
+            )
         operation = LogicalEngine.apply_de_morgan(operation)
-        print(f"После применения законов де Моргана: {operation}", file=stdout)
+        if output:
+            print(f"После применения законов де Моргана: {operation}")
         operation = LogicalEngine.group_conjunctions(operation)
-        print(f"После группировки конъюнкций: {operation}", file=stdout)
+        if output:
+            print(f"После группировки конъюнкций: {operation}")
         cnf = CNF(operation)
-        print(f"КНФ: {cnf}", file=stdout)
+        if output:
+            print(f"КНФ: {cnf}")
         cnf.simplify()
-        print(f"Упрощённая КНФ: {cnf}", file=stdout)
-        print("============\n", file=stdout)
-
-        if not output:
-            devnull.close()
+        if output:
+            print(f"Упрощённая КНФ: {cnf}")
+            print("============\n")
         return cnf
+
+    @staticmethod
+    def to_clauses(operation: Operation | Predicate) -> list[Disjunct]:
+        """Дизъюнкты КНФ выражения (без вывода этапов преобразования)"""
+        return LogicalEngine.to_cnf(operation).children or []
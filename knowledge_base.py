@@ -1,6 +1,14 @@
+from collections import deque
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import Optional
-from models import Operation, Predicate
+from itertools import count
+from operator import attrgetter
+from typing import Collection, Iterable, Iterator, Optional
+from clause_arena import ClauseArena
+from lexer import SymbolTable
+from models import NEGATIVE, POSITIVE, Operation, Predicate, Variable
+from persistent import PersistentMap
+from snapshot import decode_expression, read_snapshot, write_snapshot
 
 
 @dataclass
@@ -25,14 +33,99 @@ class Axiom:
         return f"({self.id}) {self.expression}"
 
 
+class StoredAxiom(Axiom):
+    """Аксиома из снимка: выражение восстанавливается при первом обращении"""
+    
+    def __init__(
+        self,
+        id: int,
+        encoded: memoryview,
+        names: list[str],
+        description: Optional[str] = None,
+    ):
+        self.id = id
+        self.description = description
+        self._encoded = encoded
+        self._names = names
+        self._expression = None
+    
+    @property
+    def expression(self) -> Operation:
+        if self._expression is None:
+            self._expression = decode_expression(self._encoded, self._names)
+            self._encoded = None
+        return self._expression
+
+
+# Номера частей базы знаний и их содержимого: общие для всех баз, поэтому
+# не повторяются ни после clear, ни в изменённых версиях (snapshot)
+_component_ids = count(1)
+
+
+@dataclass(frozen=True, eq=False)
+class Component:
+    """Независимая часть базы знаний (компонента связности графа
+    совместной встречаемости высказываний)
+
+    key меняется при любом изменении содержимого части, поэтому по нему
+    можно запоминать вердикты, относящиеся ко всей части.
+    """
+    id: int
+    key: object
+    # Высказывания части (и аксиом, и алфавита)
+    symbols: Collection[str]
+    # ID аксиом части
+    axiom_ids: Collection[int]
+
+
 class KnowledgeBase:
-    """База знаний - хранилище высказываний и аксиом"""
+    """База знаний - хранилище высказываний и аксиом
+
+    Высказывания, аксиомы и индексы хранятся в неизменяемых отображениях
+    (persistent.PersistentMap), поэтому версию базы для читателей можно
+    получить без копирования (snapshot). Множества ID аксиом в индексах -
+    отображения ID -> None.
+    """
     
     def __init__(self):
-        self.statements: dict[str, Statement] = {}
-        self.axioms: list[Axiom] = []
+        self.statements: PersistentMap = PersistentMap()
+        # Аксиомы по ID
+        self.axioms: PersistentMap = PersistentMap()
         self._next_statement_id = 1
         self._next_axiom_id = 1
+        # Высказывания каждой аксиомы: ID аксиомы -> кортеж имён; вместе с
+        # обратным индексом задаёт граф совместной встречаемости
+        self._axiom_symbols: PersistentMap = PersistentMap()
+        # Обратный индекс по полярности: высказывание -> ID аксиом, в
+        # которые оно входит положительно (без отрицания) или отрицательно;
+        # каждое высказывание аксиомы есть хотя бы в одном из них
+        self._positive_axioms: PersistentMap = PersistentMap()
+        self._negative_axioms: PersistentMap = PersistentMap()
+        # Независимые части базы: номер части -> Component, высказывание ->
+        # номер его части; поддерживаются при каждом изменении. Части,
+        # которые после удаления аксиом могли распасться, хранятся до
+        # следующего перечисления частей в _dirty_components: номер части ->
+        # высказывания удалённых аксиом
+        self._components: PersistentMap = PersistentMap()
+        self._symbol_component: PersistentMap = PersistentMap()
+        self._dirty_components: PersistentMap = PersistentMap()
+        # Номер версии: увеличивается при каждом изменении высказываний и аксиом
+        self.version = 0
+        # Линия изменений: версии с одним номером и одной линией совпадают
+        # по содержимому. Копия (snapshot) продолжает линию базы, пока не
+        # изменена, а при первом изменении начинает свою (см. _changed)
+        self.lineage = object()
+        self._fork_on_change = False
+        # Метка изменений на месте (см. persistent.py); меняется, когда
+        # текущие отображения публикуются в snapshot
+        self._owner = object()
+        # Скомпилированные аксиомы: дизъюнкты КНФ по ID аксиомы в виде
+        # номеров имён из таблицы symbols
+        self.symbols = SymbolTable()
+        self.clauses = ClauseArena()
+        # Хранилища только для чтения, в которых ищутся дизъюнкты, если их
+        # нет в clauses: загруженный снимок и хранилища исходной версии
+        self._shared_clauses: list[ClauseArena] = []
     
     def add_statement(self, name: str, description: str = None) -> Statement:
         """Добавить высказывание в алфавит"""
@@ -44,8 +137,10 @@ class KnowledgeBase:
             name=name,
             description=description
         )
-        self.statements[name] = statement
+        self.statements = self.statements.set(name, statement, self._owner)
         self._next_statement_id += 1
+        self._changed()
+        self._join_component((name,))
         return statement
     
     def add_axiom(self, expression: Operation, description: str = None) -> Axiom:
@@ -55,17 +150,584 @@ class KnowledgeBase:
             expression=expression,
             description=description
         )
-        self.axioms.append(axiom)
+        self.axioms = self.axioms.set(axiom.id, axiom, self._owner)
         self._next_axiom_id += 1
+        self._changed()
+        self._link_axiom(axiom)
         return axiom
     
     def remove_axiom(self, axiom_id: int) -> bool:
         """Удалить аксиому по ID"""
-        for i, axiom in enumerate(self.axioms):
-            if axiom.id == axiom_id:
-                self.axioms.pop(i)
-                return True
-        return False
+        axiom = self.axioms.get(axiom_id)
+        if axiom is None:
+            return False
+        self.axioms = self.axioms.delete(axiom_id, self._owner)
+        self._changed()
+        self.clauses.remove(axiom_id)
+        for arena in self._shared_clauses:
+            arena.remove(axiom_id)
+        self._unlink_symbols(axiom)
+        return True
+
+    def _changed(self):
+        """Отметить изменение базы: новая версия, а у копии - новая линия"""
+        if self._fork_on_change:
+            self.lineage = object()
+            self._fork_on_change = False
+        self.version += 1
+
+    def bulk_load(
+        self, expressions: Iterable[Operation | Predicate]
+    ) -> list[Statement | Axiom]:
+        """Добавить набор высказываний и аксиом без их компиляции
+
+        Переменная добавляется как высказывание, любое другое выражение - как
+        аксиома. КНФ аксиом строится позже одним проходом
+        (LogicalEngine.compile) или при первом доказательстве. Индексы и
+        части базы обновляются один раз на весь набор: ID аксиом каждого
+        высказывания и связи между высказываниями сначала собираются в
+        обычных словарях.
+        """
+        owner = self._owner
+        entries = []
+        statements = {}
+        axioms = []
+        for expression in expressions:
+            if isinstance(expression, Variable):
+                name = expression.name
+                statement = statements.get(name) or self.statements.get(name)
+                if statement is None:
+                    statement = Statement(self._next_statement_id, name)
+                    self._next_statement_id += 1
+                    self._changed()
+                    statements[name] = statement
+                entries.append(statement)
+            else:
+                axiom = Axiom(self._next_axiom_id, expression)
+                self._next_axiom_id += 1
+                self._changed()
+                axioms.append(axiom)
+                entries.append(axiom)
+        self.statements = self.statements.update(statements, owner)
+        self.axioms = self.axioms.update(
+            ((axiom.id, axiom) for axiom in axioms), owner
+        )
+        self._link_axioms(axioms, statements)
+        return entries
+
+    def batch(self):
+        """Выполнить серию изменений как одно (для базы в памяти - ничего не делает)"""
+        return nullcontext()
+
+    def get_clauses(self, axiom_id: int) -> Optional[list[Operation | Predicate]]:
+        """Дизъюнкты КНФ аксиомы или None, если аксиома ещё не скомпилирована
+
+        Выражения дизъюнктов строятся заново при каждом вызове.
+        """
+        return self._clause_arena(axiom_id).get(axiom_id, self.symbols.names)
+
+    def get_clause_literals(self, axiom_id: int) -> Optional[list]:
+        """Дизъюнкты КНФ аксиомы в виде номеров литералов (см. ClauseArena)"""
+        return self._clause_arena(axiom_id).clause_literals(axiom_id)
+
+    def is_compiled(self, axiom_id: int) -> bool:
+        """Построена ли КНФ аксиомы (без восстановления дизъюнктов)"""
+        return axiom_id in self._clause_arena(axiom_id)
+
+    def set_clauses(self, axiom_id: int, clauses: list[Operation | Predicate]):
+        """Сохранить дизъюнкты КНФ аксиомы"""
+        self.clauses.remove(axiom_id)
+        self.clauses.add(axiom_id, clauses, self.symbols)
+
+    def _clause_arena(self, axiom_id: int) -> ClauseArena:
+        """Хранилище, в котором находятся дизъюнкты аксиомы"""
+        if axiom_id not in self.clauses:
+            for arena in self._shared_clauses:
+                if axiom_id in arena:
+                    return arena
+        return self.clauses
+
+    def snapshot(self) -> "KnowledgeBase":
+        """Версия базы знаний, не меняющаяся при дальнейших изменениях базы
+
+        Копия разделяет с базой все отображения и массивы дизъюнктов
+        (ClauseArena.view), ничего не копируя: база после этого копирует
+        узлы отображений по мере их изменения, а границы дизъюнктов - при
+        первом изменении.
+        Копию можно читать из другого потока, пока база изменяется, и
+        передать своему LogicalEngine; построенная в ней КНФ хранится в
+        самой копии. Копия продолжает линию изменений базы (lineage), пока её
+        саму не изменят: версии с одним номером у базы и у изменённой копии
+        различаются по lineage.
+        """
+        copy = object.__new__(type(self))
+        copy.__dict__.update(self.__dict__)
+        copy.clauses = ClauseArena()
+        copy._shared_clauses = [
+            arena.view() for arena in (self.clauses, *self._shared_clauses)
+        ]
+        copy._owner = object()
+        copy._fork_on_change = True
+        self._owner = object()
+        return copy
+
+    def save(self, path: str):
+        """Сохранить базу знаний и КНФ скомпилированных аксиом в снимок"""
+        clauses = ClauseArena()
+        for axiom_id in sorted(self.axioms):
+            clauses.copy(axiom_id, self._clause_arena(axiom_id))
+        write_snapshot(
+            path,
+            self.get_all_statements(),
+            self.get_all_axioms(),
+            self._axiom_symbols,
+            self._positive_axioms,
+            self._negative_axioms,
+            clauses,
+            self.symbols.names,
+            self._next_statement_id,
+            self._next_axiom_id,
+        )
+
+    @classmethod
+    def load(cls, path: str, symbols: Optional[SymbolTable] = None) -> "KnowledgeBase":
+        """Загрузить базу знаний из снимка
+
+        Файл отображается в память; КНФ аксиом не строится заново, а
+        читается из снимка при первом обращении.
+        """
+        data = read_snapshot(path, symbols)
+        kb = cls()
+        kb.statements = PersistentMap(
+            (name, Statement(statement_id, name, description))
+            for statement_id, name, description in data.statements
+        )
+        kb.axioms = PersistentMap(
+            (axiom_id, StoredAxiom(axiom_id, encoded, data.names, description))
+            for axiom_id, encoded, description, _ in data.axioms
+        )
+        kb._axiom_symbols = PersistentMap(
+            (axiom_id, symbols) for axiom_id, _, _, symbols in data.axioms
+        )
+        kb._positive_axioms = id_index(data.positive_axioms)
+        kb._negative_axioms = id_index(data.negative_axioms)
+        kb._next_statement_id = data.next_statement_id
+        kb._next_axiom_id = data.next_axiom_id
+        kb.symbols = SymbolTable.from_names(data.names)
+        kb._shared_clauses = [data.clauses]
+        kb._join_components(kb._axiom_symbols.items(), kb.statements)
+        return kb
+
+    def _link_axiom(self, axiom: Axiom):
+        """Учесть одну аксиому в обратном индексе и в частях базы"""
+        owner = self._owner
+        polarities = axiom.expression.polarities()
+        symbols = tuple(polarities)
+        self._axiom_symbols = self._axiom_symbols.set(axiom.id, symbols, owner)
+        for symbol, polarity in polarities.items():
+            self.symbols.add(symbol)
+            if polarity & POSITIVE:
+                self._positive_axioms = index_add(
+                    self._positive_axioms, symbol, axiom.id, owner
+                )
+            if polarity & NEGATIVE:
+                self._negative_axioms = index_add(
+                    self._negative_axioms, symbol, axiom.id, owner
+                )
+        self._join_component(symbols, (axiom.id,))
+
+    def _link_axioms(self, axioms: list[Axiom], names: Iterable[str] = ()):
+        """Учесть аксиомы в обратном индексе и в частях базы вместе с
+        высказываниями алфавита names"""
+        owner = self._owner
+        positive: dict[str, list[int]] = {}
+        negative: dict[str, list[int]] = {}
+        axiom_symbols = []
+        for axiom in axioms:
+            polarities = axiom.expression.polarities()
+            axiom_symbols.append((axiom.id, tuple(polarities)))
+            for symbol, polarity in polarities.items():
+                # Имена интернируются сразу, чтобы версии базы, строящие КНФ
+                # в других потоках, не изменяли общую таблицу имён
+                self.symbols.add(symbol)
+                if polarity & POSITIVE:
+                    positive.setdefault(symbol, []).append(axiom.id)
+                if polarity & NEGATIVE:
+                    negative.setdefault(symbol, []).append(axiom.id)
+        self._axiom_symbols = self._axiom_symbols.update(axiom_symbols, owner)
+        self._positive_axioms = index_extend(self._positive_axioms, positive, owner)
+        self._negative_axioms = index_extend(self._negative_axioms, negative, owner)
+        self._join_components(axiom_symbols, names)
+
+    def _unlink_symbols(self, axiom: Axiom):
+        """Убрать аксиому из обратного индекса"""
+        owner = self._owner
+        symbols = self._axiom_symbols[axiom.id]
+        self._axiom_symbols = self._axiom_symbols.delete(axiom.id, owner)
+        for symbol in symbols:
+            self._positive_axioms = index_remove(
+                self._positive_axioms, symbol, axiom.id, owner
+            )
+            self._negative_axioms = index_remove(
+                self._negative_axioms, symbol, axiom.id, owner
+            )
+        self._detach_component(axiom.id, symbols)
+
+    def _join_components(
+        self,
+        axiom_symbols: Iterable[tuple[int, tuple[str, ...]]],
+        names: Iterable[str] = (),
+    ):
+        """Добавить в части базы аксиомы (пары ID - высказывания) и
+        высказывания алфавита
+
+        Новые связи сначала объединяются в обычном словаре (система
+        непересекающихся множеств), затем каждая группа присоединяется к
+        частям базы одним вызовом _join_component.
+        """
+        parent: dict[str, str] = {}
+
+        def find(name: str) -> str:
+            root = name
+            while parent.setdefault(root, root) != root:
+                root = parent[root]
+            while parent[name] != root:
+                parent[name], name = root, parent[name]
+            return root
+
+        firsts = []
+        for axiom_id, symbols in axiom_symbols:
+            root = find(symbols[0])
+            for name in symbols[1:]:
+                other = find(name)
+                if other != root:
+                    parent[other] = root
+            firsts.append((axiom_id, symbols[0]))
+        for name in names:
+            find(name)
+        groups: dict[str, tuple[list[str], list[int]]] = {}
+        for name in parent:
+            groups.setdefault(find(name), ([], []))[0].append(name)
+        for axiom_id, name in firsts:
+            groups[find(name)][1].append(axiom_id)
+        for group_names, axiom_ids in groups.values():
+            self._join_component(group_names, axiom_ids)
+
+    def _join_component(self, symbols: Collection[str], new_axiom_ids: Iterable[int] = ()):
+        """Объединить части с данными высказываниями и добавить в них аксиомы
+
+        Номер сохраняет самая большая из частей: номера части меняются
+        только у высказываний меньших частей.
+        """
+        owner = self._owner
+        component_ids = list(map(self._symbol_component.get, symbols))
+        parts = {
+            self._components[component_id]
+            for component_id in component_ids
+            if component_id is not None
+        }
+        largest = max(parts, key=lambda part: len(part.symbols), default=None)
+        if largest is None:
+            component_id = next(_component_ids)
+            names, axiom_ids = PersistentMap(), PersistentMap()
+        else:
+            component_id, names, axiom_ids = largest.id, largest.symbols, largest.axiom_ids
+        for part in parts:
+            if part is largest:
+                continue
+            self._components = self._components.delete(part.id, owner)
+            seeds = self._dirty_components.get(part.id)
+            if seeds is not None:
+                # Объединённая часть тоже может состоять из нескольких
+                self._dirty_components = self._dirty_components.delete(part.id, owner)
+                self._mark_dirty(component_id, seeds)
+        # Высказывания, номер части которых меняется, и добавляемые ID аксиом
+        moved = [
+            name
+            for name, known_id in zip(symbols, component_ids)
+            if known_id is None
+        ]
+        added = list(new_axiom_ids)
+        for part in parts:
+            if part is not largest:
+                moved.extend(part.symbols)
+                added.extend(part.axiom_ids)
+        names = names.update(((name, None) for name in moved), owner)
+        self._symbol_component = self._symbol_component.update(
+            ((name, component_id) for name in moved), owner
+        )
+        axiom_ids = axiom_ids.update(((axiom_id, None) for axiom_id in added), owner)
+        self._components = self._components.set(
+            component_id,
+            Component(component_id, next(_component_ids), names, axiom_ids),
+            owner,
+        )
+
+    def _detach_component(self, axiom_id: int, symbols: tuple[str, ...]):
+        """Убрать удалённую аксиому с данными высказываниями из её части
+
+        Часть при этом не обходится: если она могла распасться, оставшиеся в
+        ней высказывания аксиомы запоминаются в _dirty_components, а
+        разбиение выполняет components (см. _split_components).
+        """
+        owner = self._owner
+        component = self._components[self._symbol_component[symbols[0]]]
+        names = component.symbols
+        axiom_ids = component.axiom_ids.delete(axiom_id, owner)
+        remaining = []
+        for name in symbols:
+            if (
+                name in self.statements
+                or name in self._positive_axioms
+                or name in self._negative_axioms
+            ):
+                remaining.append(name)
+            else:
+                # Высказывание больше нигде не встречается
+                names = names.delete(name, owner)
+                self._symbol_component = self._symbol_component.delete(name, owner)
+        if not names:
+            self._components = self._components.delete(component.id, owner)
+            self._dirty_components = self._dirty_components.delete(component.id, owner)
+            return
+        self._components = self._components.set(
+            component.id,
+            Component(component.id, next(_component_ids), names, axiom_ids),
+            owner,
+        )
+        # Часть может распасться, только если аксиома связывала хотя бы два
+        # оставшихся в ней высказывания. Если часть уже могла распасться,
+        # высказывания запоминаются в любом случае: удалённая аксиома могла
+        # связывать с остальной частью запомненное ранее высказывание
+        if len(remaining) > 1 or component.id in self._dirty_components:
+            self._mark_dirty(component.id, remaining)
+
+    def _mark_dirty(self, component_id: int, seeds: Iterable[str]):
+        """Запомнить, что часть могла распасться; каждая новая часть
+        содержит хотя бы одно из высказываний seeds"""
+        owner = self._owner
+        known = self._dirty_components.get(component_id, PersistentMap())
+        for name in seeds:
+            known = known.set(name, None, owner)
+        self._dirty_components = self._dirty_components.set(component_id, known, owner)
+
+    def _split_components(self):
+        """Разбить части, из которых удалялись аксиомы, на компоненты связности
+
+        Из высказываний удалённых аксиом одновременно, по одному шагу,
+        выполняются поиски в ширину; встретившиеся поиски объединяются.
+        Закончившийся поиск обошёл отдельную часть, а когда незакончен
+        только один, всё остальное - одна часть, которая сохраняет номер.
+        Поэтому обходятся только отделившиеся части (и часть, если она не
+        распалась), а не вся исходная часть. Если часть не распалась, её
+        ключ не меняется.
+        """
+        owner = self._owner
+        for component_id, seeds in self._dirty_components.items():
+            component = self._components[component_id]
+            seeds = [name for name in seeds if name in component.symbols]
+            for part in self._separated_parts(seeds):
+                part_id = next(_component_ids)
+                names, axiom_ids = component.symbols, component.axiom_ids
+                part_axioms = set()
+                for name in part:
+                    names = names.delete(name, owner)
+                    self._symbol_component = self._symbol_component.set(
+                        name, part_id, owner
+                    )
+                    part_axioms.update(self._positive_axioms.get(name, ()))
+                    part_axioms.update(self._negative_axioms.get(name, ()))
+                for axiom_id in part_axioms:
+                    axiom_ids = axiom_ids.delete(axiom_id, owner)
+                component = Component(component_id, next(_component_ids), names, axiom_ids)
+                self._components = self._components.set(component_id, component, owner)
+                self._components = self._components.set(
+                    part_id,
+                    Component(
+                        part_id,
+                        next(_component_ids),
+                        PersistentMap.fromkeys(part),
+                        PersistentMap.fromkeys(part_axioms),
+                    ),
+                    owner,
+                )
+        self._dirty_components = PersistentMap()
+
+    def _separated_parts(self, seeds: list[str]) -> list[set[str]]:
+        """Компоненты связности, отделившиеся от остальной части
+
+        Каждая компонента части содержит одно из высказываний seeds.
+        Возвращаются все компоненты, кроме одной (самой большой из
+        обойденных целиком или единственной необойденной).
+        """
+        # Номер поиска каждого достигнутого высказывания; поиски, которые
+        # встретились, объединяются (parent - система непересекающихся множеств)
+        label: dict[str, int] = {}
+        parent = list(range(len(seeds)))
+        frontiers = [deque([name]) for name in seeds]
+        visited_axioms = set()
+
+        def find(search: int) -> int:
+            while parent[search] != search:
+                parent[search] = parent[parent[search]]
+                search = parent[search]
+            return search
+
+        for search, name in enumerate(seeds):
+            if name in label:
+                parent[search] = find(label[name])
+            else:
+                label[name] = search
+        active = {find(search) for search in range(len(seeds))}
+        finished = []
+        while len(active) > 1:
+            for search in list(active):
+                if find(search) != search:
+                    continue
+                frontier = frontiers[search]
+                if not frontier:
+                    active.discard(search)
+                    finished.append(search)
+                    if len(active) == 1:
+                        break
+                    continue
+                symbol = frontier.popleft()
+                for index in (self._positive_axioms, self._negative_axioms):
+                    for axiom_id in index.get(symbol, ()):
+                        if axiom_id in visited_axioms:
+                            continue
+                        visited_axioms.add(axiom_id)
+                        for neighbour in self._axiom_symbols[axiom_id]:
+                            other = label.get(neighbour)
+                            if other is None:
+                                label[neighbour] = search
+                                frontier.append(neighbour)
+                                continue
+                            other = find(other)
+                            if other != search:
+                                # Поиски встретились: часть у них общая
+                                parent[other] = search
+                                frontier.extend(frontiers[other])
+                                frontiers[other] = deque()
+                                active.discard(other)
+        parts: dict[int, set[str]] = {search: set() for search in finished}
+        if parts:
+            for name, search in label.items():
+                part = parts.get(find(search))
+                if part is not None:
+                    part.add(name)
+        result = list(parts.values())
+        if not active and result:
+            # Обойдены все компоненты: самая большая остаётся на месте
+            result.remove(max(result, key=len))
+        return result
+
+    def get_neighbours(self, name: str) -> set[str]:
+        """Высказывания, встречающиеся в одной аксиоме с данным"""
+        neighbours = set()
+        for axiom_id in self.get_axiom_ids(name):
+            neighbours.update(self._axiom_symbols[axiom_id])
+        neighbours.discard(name)
+        return neighbours
+
+    def relevant_symbols(
+        self, symbols: Iterable[str], depth: Optional[int] = None
+    ) -> set[str]:
+        """Высказывания, достижимые из данных не более чем за depth шагов
+
+        При depth=None возвращается вся компонента связности графа
+        совместной встречаемости.
+        """
+        reached = set(symbols)
+        visited_axioms = set()
+        frontier = deque((symbol, 0) for symbol in reached)
+        while frontier:
+            symbol, distance = frontier.popleft()
+            if depth is not None and distance >= depth:
+                continue
+            for index in (self._positive_axioms, self._negative_axioms):
+                for axiom_id in index.get(symbol, ()):
+                    if axiom_id in visited_axioms:
+                        continue
+                    visited_axioms.add(axiom_id)
+                    for neighbour in self._axiom_symbols[axiom_id]:
+                        if neighbour not in reached:
+                            reached.add(neighbour)
+                            frontier.append((neighbour, distance + 1))
+        return reached
+
+    def get_axiom_ids(self, name: str, positive: Optional[bool] = None) -> set[int]:
+        """ID аксиом, в которые входит высказывание
+
+        При positive=True - только аксиомы, где оно входит без отрицания
+        (после переноса отрицаний к переменным), при positive=False - с
+        отрицанием, при None - любые.
+        """
+        if positive is None:
+            return set(self._positive_axioms.get(name, ())).union(
+                self._negative_axioms.get(name, ())
+            )
+        index = self._positive_axioms if positive else self._negative_axioms
+        return set(index.get(name, ()))
+
+    def get_occurrences(self, name: str) -> tuple[list[Axiom], list[Axiom]]:
+        """Аксиомы с положительными и с отрицательными вхождениями высказывания"""
+        return (
+            [self.axioms[i] for i in sorted(self._positive_axioms.get(name, ()))],
+            [self.axioms[i] for i in sorted(self._negative_axioms.get(name, ()))],
+        )
+
+    def get_axioms_with_symbols(self, symbols: Iterable[str]) -> list[Axiom]:
+        """Аксиомы, в которые входит хотя бы одно из высказываний"""
+        axiom_ids = set()
+        for symbol in symbols:
+            axiom_ids.update(self._positive_axioms.get(symbol, ()))
+            axiom_ids.update(self._negative_axioms.get(symbol, ()))
+        return [self.axioms[axiom_id] for axiom_id in sorted(axiom_ids)]
+
+    def components(self) -> Iterator[Component]:
+        """Независимые части базы знаний
+
+        Части - компоненты связности графа совместной встречаемости: никакие
+        две части не имеют общих высказываний. Они поддерживаются при
+        изменениях базы, поэтому перечисление не требует её обхода: заново
+        обходятся только части, из которых с прошлого перечисления удалялись
+        аксиомы (см. _split_components).
+        """
+        if self._dirty_components:
+            self._split_components()
+        return self._components.values()
+
+    def component_axioms(self, component: Component) -> list[Axiom]:
+        """Аксиомы части базы знаний"""
+        return [self.axioms[axiom_id] for axiom_id in sorted(component.axiom_ids)]
+
+    def component_statements(self, component: Component) -> list[Statement]:
+        """Высказывания алфавита, входящие в часть базы знаний"""
+        return sorted(
+            (
+                self.statements[name]
+                for name in component.symbols
+                if name in self.statements
+            ),
+            key=attrgetter("id"),
+        )
+
+    def get_components(self) -> list[tuple[list[Axiom], list[Statement]]]:
+        """Независимые части базы знаний: аксиомы и высказывания каждой"""
+        return [
+            (self.component_axioms(component), self.component_statements(component))
+            for component in self.components()
+        ]
+
+    def get_statements_with_symbols(self, symbols: Iterable[str]) -> list[Statement]:
+        """Высказывания алфавита из заданного множества имён
+
+        Высказывания ищутся по имени, поэтому остальной алфавит не
+        просматривается.
+        """
+        found = filter(None, map(self.statements.get, set(symbols)))
+        return sorted(found, key=attrgetter("id"))
     
     def get_statement(self, name: str) -> Optional[Statement]:
         """Получить высказывание по имени"""
@@ -73,10 +735,7 @@ class KnowledgeBase:
     
     def get_axiom(self, axiom_id: int) -> Optional[Axiom]:
         """Получить аксиому по ID"""
-        for axiom in self.axioms:
-            if axiom.id == axiom_id:
-                return axiom
-        return None
+        return self.axioms.get(axiom_id)
     
     def get_all_statements(self) -> list[Statement]:
         """Получить все высказывания"""
@@ -84,14 +743,23 @@ class KnowledgeBase:
     
     def get_all_axioms(self) -> list[Axiom]:
         """Получить все аксиомы"""
-        return self.axioms.copy()
+        return sorted(self.axioms.values(), key=attrgetter("id"))
     
     def clear(self):
         """Очистить базу знаний"""
-        self.statements.clear()
-        self.axioms.clear()
+        self.statements = PersistentMap()
+        self.axioms = PersistentMap()
+        self._axiom_symbols = PersistentMap()
+        self._positive_axioms = PersistentMap()
+        self._negative_axioms = PersistentMap()
+        self._components = PersistentMap()
+        self._symbol_component = PersistentMap()
+        self._dirty_components = PersistentMap()
+        self.clauses = ClauseArena()
+        self._shared_clauses = []
         self._next_statement_id = 1
         self._next_axiom_id = 1
+        self._changed()
     
     def __str__(self):
         result = ["=== БАЗА ЗНАНИЙ ==="]
@@ -99,6 +767,49 @@ class KnowledgeBase:
         for stmt in self.get_all_statements():
             result.append(f"  {stmt}")
         result.append(f"\nАксиомы ({len(self.axioms)}):")
-        for axiom in self.axioms:
+        for axiom in self.get_all_axioms():
             result.append(f"  {axiom}")
-        return "\n".join(result)
\ No newline at end of file
+        return "\n".join(result)
+
+
+def index_add(index: PersistentMap, name: str, axiom_id: int, owner: object) -> PersistentMap:
+    """Индекс, в котором к ID аксиом высказывания name добавлен axiom_id"""
+    axiom_ids = index.get(name)
+    updated = (PersistentMap() if axiom_ids is None else axiom_ids).set(axiom_id, None, owner)
+    return index if updated is axiom_ids else index.set(name, updated, owner)
+
+
+def index_extend(
+    index: PersistentMap, additions: dict[str, list[int]], owner: object
+) -> PersistentMap:
+    """Индекс, в котором к ID аксиом высказываний добавлены ID из additions"""
+    changed = []
+    for name, axiom_ids in additions.items():
+        known = index.get(name)
+        if known is None:
+            changed.append((name, PersistentMap.fromkeys(axiom_ids)))
+        else:
+            updated = known.update(((axiom_id, None) for axiom_id in axiom_ids), owner)
+            if updated is not known:
+                changed.append((name, updated))
+    return index.update(changed, owner)
+
+
+def index_remove(
+    index: PersistentMap, name: str, axiom_id: int, owner: object
+) -> PersistentMap:
+    """Индекс, в котором из ID аксиом высказывания name убран axiom_id"""
+    axiom_ids = index.get(name)
+    if axiom_ids is None:
+        return index
+    updated = axiom_ids.delete(axiom_id, owner)
+    if not updated:
+        return index.delete(name, owner)
+    return index if updated is axiom_ids else index.set(name, updated, owner)
+
+
+def id_index(index: dict[str, set[int]]) -> PersistentMap:
+    """Индекс высказывание -> множество ID в виде неизменяемых отображений"""
+    return PersistentMap(
+        (name, PersistentMap.fromkeys(axiom_ids)) for name, axiom_ids in index.items()
+    )
@@ -1,16 +1,22 @@
+import re
 from enum import Enum
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, Optional
 
 
 class LexerException(Exception):
     """Custom exception"""
     def __init__(self, message: str, position: Optional[int] = None):
+        self.message = message
         self.position = position
         if position is not None:
             super().__init__(f"Ошибка на позиции {position}: {message}")
         else:
             super().__init__(message)
+    
+    def __reduce__(self):
+        # Для передачи между процессами вместе с позицией
+        return type(self), (self.message, self.position)
 
 
 class TokenType(str, Enum):
@@ -32,150 +38,197 @@ class TokenType(str, Enum):
     QUESTION = "QUESTION"  # ?
 
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     type: TokenType
     value: Any
     position: int
 
 
-class Lexer:
+class SymbolTable:
+    """Таблица имён высказываний
+
+    Каждое имя хранится в единственном экземпляре и получает номер, поэтому
+    повторяющиеся в тысячах строк идентификаторы не занимают память заново,
+    а сравнение одинаковых имён сводится к сравнению ссылок.
+    """
+    
     def __init__(self):
-        pass
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
     
-    def advance(self, step: int = 1):
-        self.current_pos += step
-        if self.current_pos < len(self.text):
-            self.current_char = self.text[self.current_pos]
-        else:
-            self.current_char = None
-    
-    def peek(self, offset=1):
-        """Посмотреть на следующий символ без продвижения"""
-        pos = self.current_pos + offset
-        if pos < len(self.text):
-            return self.text[pos]
-        return None
-    
-    def skip_multiline_comment(self):
-        """Пропустить многострочный комментарий"""
-        self.advance(2)  # Пропустить /*
-        while self.current_char is not None:
-            if self.current_char == '*' and self.peek() == '/':
-                self.advance(2)
-                break
-            self.advance()
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> "SymbolTable":
+        """Таблица с заданными именами под номерами 0, 1, ..."""
+        table = cls()
+        for name in names:
+            table.add(name)
+        return table
     
-    def tokenize_line(self, text: str):
-        self.current_pos = 0
-        self.text = text
-        self.current_char = self.text[0] if text else None
-        self.tokens = []
-        
-        while self.current_char is not None:
-            self.token_pos = self.current_pos
-            
-            # Пропуск пробелов
-            if self.current_char.isspace():
-                self.advance()
-                continue
-            
-            # Комментарии
-            if self.current_char == '/' and self.peek() == '/':
-                break  # Остаток строки - комментарий
-            
-            if self.current_char == '/' and self.peek() == '*':
-                self.skip_multiline_comment()
-                continue
-            
-            # Операторы из двух символов
-            if self.current_char == '-' and self.peek() == '>':
-                self.tokens.append(Token(TokenType.IMPLIES, '->', self.token_pos))
-                self.advance(2)
-                continue
-            
-            if self.current_char == '<' and self.peek() == '-' and self.peek(2) == '>':
-                self.tokens.append(Token(TokenType.EQUIVALENCE, '<->', self.token_pos))
-                self.advance(3)
-                continue
-            
-            # Одиночные операторы
-            if self.current_char in '&*':
-                self.tokens.append(Token(TokenType.AND, self.current_char, self.token_pos))
-                self.advance()
-                continue
-            
-            if self.current_char in '|+':
-                self.tokens.append(Token(TokenType.OR, self.current_char, self.token_pos))
-                self.advance()
+    def __len__(self):
+        return len(self.names)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+    
+    def intern(self, name: str) -> str:
+        """Вернуть единственный экземпляр строки name"""
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            return self.names[self.add(name)]
+        return self.names[symbol_id]
+    
+    def add(self, name: str) -> int:
+        """Получить номер имени, добавив его при необходимости"""
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol_id
+    
+    def name(self, symbol_id: int) -> str:
+        """Имя по номеру"""
+        return self.names[symbol_id]
+
+
+# Основное регулярное выражение лексера: пробелы перед лексемой пропускаются,
+# имя совпавшей именованной группы определяет вид лексемы
+TOKEN_PATTERN = re.compile(
+    r"""
+    \s*
+    (?:
+      (?P<IDENTIFIER>[^\W\d]\w*)
+    | (?P<AND>[&*])
+    | (?P<OR>[|+])
+    | (?P<IMPLIES>->)
+    | (?P<NOT>!)
+    | (?P<LPAREN>\()
+    | (?P<RPAREN>\))
+    | (?P<STRING>"[^"]*"?)
+    | (?P<EQUIVALENCE><->)
+    | (?P<QUESTION>\?)
+    | (?P<LINE_COMMENT>//)
+    | (?P<BLOCK_COMMENT>/\*(?:.*?\*/|.*))
+    | (?P<END>\Z)
+    | (?P<ERROR>.)
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+SIMPLE_TOKENS = {
+    "AND": TokenType.AND,
+    "OR": TokenType.OR,
+    "IMPLIES": TokenType.IMPLIES,
+    "NOT": TokenType.NOT,
+    "LPAREN": TokenType.LPAREN,
+    "RPAREN": TokenType.RPAREN,
+    "EQUIVALENCE": TokenType.EQUIVALENCE,
+    "QUESTION": TokenType.QUESTION,
+}
+
+
+class Lexer:
+    def __init__(self, symbols: Optional[SymbolTable] = None):
+        # Таблица имён может быть общей для нескольких лексеров
+        self.symbols = symbols if symbols is not None else SymbolTable()
+    
+    def tokenize_line(self, text: str) -> list[Token]:
+        """Разбить строку на список лексем"""
+        self.tokens = list(self.iter_tokens(text))
+        return self.tokens
+    
+    def iter_tokens(self, text: str) -> Iterator[Token]:
+        """Лениво перебрать лексемы строки
+
+        Лексемы создаются по одной по мере запроса, последней всегда
+        выдаётся EOL. Ошибка возникает при чтении неверной лексемы.
+        """
+        intern = self.symbols.intern
+        for match in TOKEN_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == "IDENTIFIER":
+                yield Token(TokenType.IDENTIFIER, intern(match[kind]), match.start(kind))
                 continue
             
-            if self.current_char == '!':
-                self.tokens.append(Token(TokenType.NOT, '!', self.token_pos))
-                self.advance()
+            token_type = SIMPLE_TOKENS.get(kind)
+            if token_type is not None:
+                yield Token(token_type, match[kind], match.start(kind))
                 continue
             
-            if self.current_char == '(':
-                self.tokens.append(Token(TokenType.LPAREN, '(', self.token_pos))
-                self.advance()
+            # Строки в кавычках
+            if kind == "STRING":
+                value = match[kind]
+                position = match.start(kind)
+                if len(value) < 2 or value[-1] != '"':
+                    raise LexerException("Незакрытая строка", position)
+                yield Token(TokenType.IDENTIFIER, intern(value[1:-1]), position)
                 continue
             
-            if self.current_char == ')':
-                self.tokens.append(Token(TokenType.RPAREN, ')', self.token_pos))
-                self.advance()
+            # Многострочный комментарий пропускается
+            if kind == "BLOCK_COMMENT":
                 continue
             
-            if self.current_char == '?':
-                self.tokens.append(Token(TokenType.QUESTION, '?', self.token_pos))
-                self.advance()
-                continue
+            # Конец строки или начало однострочного комментария
+            if kind == "END" or kind == "LINE_COMMENT":
+                yield Token(TokenType.EOL, None, match.start(kind))
+                return
             
-            # Строки в кавычках
-            if self.current_char == '"':
-                self.advance()
-                self.parse_string()
-                if self.current_char != '"':
-                    raise LexerException("Незакрытая строка", self.token_pos)
-                self.advance()
+            raise LexerException(
+                f"Неожиданный символ: {match[kind]}", match.start(kind)
+            )
+
+
+class SourceReader:
+    """Построчное чтение исходного текста с удалением комментариев
+
+    Строки читаются по одной, поэтому файл не загружается в память целиком.
+    Состояние "внутри многострочного комментария" сохраняется между
+    строками; комментарии внутри строк в кавычках не распознаются.
+    """
+    
+    def __init__(self, lines: Iterable[str]):
+        self.lines = lines
+        self.line_num = 0
+        self.in_comment = False
+    
+    def __iter__(self) -> Iterator[tuple[int, str]]:
+        """Перебрать непустые строки кода вместе с их номерами"""
+        for line in self.lines:
+            self.line_num += 1
+            code = self.strip_comments(line).strip()
+            if code:
+                yield self.line_num, code
+    
+    def strip_comments(self, line: str) -> str:
+        """Удалить из строки комментарии с учётом незакрытого /* */"""
+        if not self.in_comment and "/" not in line:
+            return line
+        
+        parts = []
+        start = 0
+        pos = 0
+        in_string = False
+        while pos < len(line):
+            if self.in_comment:
+                end = line.find("*/", pos)
+                if end < 0:
+                    return " ".join(parts)
+                self.in_comment = False
+                pos = start = end + 2
                 continue
             
-            # Идентификаторы
-            if self.current_char.isalpha() or self.current_char == '_':
-                self.parse_identifier()
+            char = line[pos]
+            if char == '"':
+                in_string = not in_string
+            elif not in_string and char == "/" and line.startswith("//", pos):
+                break
+            elif not in_string and char == "/" and line.startswith("/*", pos):
+                parts.append(line[start:pos])
+                self.in_comment = True
+                pos += 2
                 continue
-            
-            raise LexerException(f"Неожиданный символ: {self.current_char}", self.token_pos)
-        
-        self.tokens.append(Token(TokenType.EOL, None, self.current_pos))
-        return self.tokens
-    
-    def parse_identifier(self, skip_spaces: bool = False):
-        self.current_value = []
-        while self.current_char and (
-            skip_spaces or self.current_char.isalnum() or self.current_char == "_"
-        ):
-            self.current_value.append(self.current_char)
-            self.advance()
-        
-        new_token = Token(
-            type=TokenType.IDENTIFIER,
-            value="".join(self.current_value),
-            position=self.token_pos,
-        )
-        self.tokens.append(new_token)
-    
-    def parse_string(self):
-        """Парсинг строки в кавычках"""
-        self.current_value = []
-        # Собираем все символы до закрывающей кавычки
-        while self.current_char and self.current_char != '"':
-            self.current_value.append(self.current_char)
-            self.advance()
+            pos += 1
         
-        # Создаем токен идентификатора из строки
-        new_token = Token(
-            type=TokenType.IDENTIFIER,
-            value="".join(self.current_value),
-            position=self.token_pos,
-        )
-        self.tokens.append(new_token)
+        parts.append(line[start:pos])
+        return " ".join(parts)
@@ -7,6 +7,12 @@ NOT = "!"
 EQUALS = "<->"
 IMPLIES = "->"
 
+# Полярность вхождения высказывания в выражение (битовая маска): под
+# чётным числом отрицаний, под нечётным или в обоих видах (под <->)
+POSITIVE = 1
+NEGATIVE = 2
+BOTH = POSITIVE | NEGATIVE
+
 
 class Predicate:
     def __init__(self, name: str, args: Sequence["Predicate"] | None):
@@ -46,6 +52,14 @@ class Predicate:
     def __bool__(self):
         return False
 
+    def variables(self) -> set[str]:
+        """Имена всех высказываний, входящих в выражение"""
+        return {self.name}
+
+    def polarities(self) -> dict[str, int]:
+        """Полярность вхождений каждого высказывания (POSITIVE, NEGATIVE, BOTH)"""
+        return {self.name: POSITIVE}
+
 
 class Variable(Predicate):
     def __init__(self, name: str):
@@ -85,6 +99,45 @@ class Operation:
     def __repr__(self):
         return f"{self.op}({','.join(str(child) for child in self.children)})"
 
+    def variables(self) -> set[str]:
+        """Имена всех высказываний, входящих в выражение"""
+        names = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Predicate):
+                names.add(node.name)
+            elif node.children is not None:
+                stack.extend(node.children)
+        return names
+
+    def polarities(self) -> dict[str, int]:
+        """Полярность вхождений каждого высказывания (POSITIVE, NEGATIVE, BOTH)
+
+        Отрицание и посылка импликации меняют полярность, операнды
+        эквивалентности входят в обоих видах - так же, как знаки литералов
+        в КНФ выражения.
+        """
+        result: dict[str, int] = {}
+        stack = [(self, POSITIVE)]
+        while stack:
+            node, polarity = stack.pop()
+            if isinstance(node, Predicate):
+                result[node.name] = result.get(node.name, 0) | polarity
+                continue
+            if node.children is None:
+                continue
+            if type(node) is Negation:
+                stack.extend((child, flip(polarity)) for child in node.children)
+            elif type(node) is Implication:
+                stack.extend((child, flip(polarity)) for child in node.children[:-1])
+                stack.append((node.children[-1], polarity))
+            elif type(node) is Equivalence:
+                stack.extend((child, BOTH) for child in node.children)
+            else:
+                stack.extend((child, polarity) for child in node.children)
+        return result
+
 
 class Disjunction(Operation):
     def __init__(self, children: Sequence[Operation | Predicate]):
@@ -147,8 +200,7 @@ class Disjunct(Operation):
         while i < len(children):
             if type(children[i]) is Disjunction:
                 disjunct = children.pop(i)
-                children.append(disjunct.children[0])
-                children.append(disjunct.children[1])
+                children.extend(disjunct.children)
             else:
                 i += 1
 
@@ -251,8 +303,7 @@ class CNF(Operation):
         while i < len(children):
             if type(children[i]) is Conjunction:
                 conjunct = children.pop(i)
-                children.append(conjunct.children[0])
-                children.append(conjunct.children[1])
+                children.extend(conjunct.children)
             elif type(children[i]) is Disjunction:
                 children[i] = Disjunct(children[i])
                 i += 1
@@ -312,3 +363,8 @@ class CNF(Operation):
         if len(self.children) == 0:
             return "Общезначима"
         return super().__str__()
+
+
+def flip(polarity: int) -> int:
+    """Полярность под отрицанием"""
+    return ((polarity & POSITIVE) << 1) | ((polarity & NEGATIVE) >> 1)
@@ -1,5 +1,6 @@
-from typing import Optional
-from lexer import Token, TokenType
+from collections import OrderedDict
+from typing import Iterable, Optional
+from lexer import Lexer, Token, TokenType
 from models import (
     Operation, Predicate, Variable,
     Conjunction, Disjunction, Negation,
@@ -10,6 +11,7 @@ from models import (
 class ParserException(Exception):
     """Исключение парсера"""
     def __init__(self, message: str, token: Optional[Token] = None):
+        self.message = message
         self.token = token
         if token:
             super().__init__(
@@ -17,99 +19,142 @@ class ParserException(Exception):
             )
         else:
             super().__init__(message)
+    
+    def __reduce__(self):
+        # Для передачи между процессами вместе с токеном
+        return type(self), (self.message, self.token)
+
+
+# Бинарные операции: приоритет, класс узла, правая ассоциативность.
+# Эквиваленция неассоциативна: повторная на одном уровне скобок - ошибка
+BINARY_OPERATORS = {
+    TokenType.EQUIVALENCE: (1, Equivalence, False),
+    TokenType.IMPLIES: (2, Implication, True),
+    TokenType.OR: (3, Disjunction, False),
+    TokenType.AND: (4, Conjunction, False),
+}
+NEGATION = (5, Negation, True)
+# Операции, которые в плоском режиме собираются в один n-арный узел
+FLAT_OPERATIONS = (Conjunction, Disjunction)
+# Открывающая скобка в стеке операций: ниже любого приоритета
+PARENTHESIS = (0, None, False)
 
 
 class Parser:
-    """Синтаксический анализатор логических выражений"""
+    """Синтаксический анализатор логических выражений
+
+    Лексемы читаются из итератора по одной: хранятся только текущая
+    (просмотр на один токен вперёд) и предыдущая, поэтому можно разбирать
+    поток из Lexer.iter_tokens, не собирая его в список.
     
-    def __init__(self, tokens: list[Token]):
-        self.tokens = tokens
-        self.current = 0
+    При flat=True цепочки конъюнкций и дизъюнкций строятся одним n-арным
+    узлом, а не левосторонней цепочкой бинарных.
+    """
     
-    def parse(self) -> Operation | Predicate:
-        """Главный метод парсинга"""
-        if not self.tokens or self.tokens[0].type == TokenType.EOL:
-            raise ParserException("Пустое выражение")
-        
-        result = self.parse_equivalence()
-        
-        if not self.is_at_end():
-            raise ParserException(
-                f"Неожиданный токен: {self.peek().value}",
-                self.peek()
-            )
-        
-        return result
+    def __init__(self, tokens: Iterable[Token], flat: bool = False):
+        self.flat = flat
+        self.reset(tokens)
     
-    def parse_equivalence(self) -> Operation | Predicate:
-        """Парсинг эквиваленции (самый низкий приоритет)"""
-        left = self.parse_implication()
-        
-        if self.match(TokenType.EQUIVALENCE):
-            right = self.parse_implication()
-            return Equivalence((left, right))
-        
-        return left
+    def reset(self, tokens: Iterable[Token]):
+        """Начать разбор новой последовательности лексем"""
+        self.tokens = iter(tokens)
+        self.current_token: Optional[Token] = None
+        self.previous_token: Optional[Token] = None
+        self.loaded = False
     
-    def parse_implication(self) -> Operation | Predicate:
-        """Парсинг импликации (правая ассоциативность)"""
-        left = self.parse_disjunction()
-        
-        if self.match(TokenType.IMPLIES):
-            right = self.parse_implication()  # Рекурсивный вызов для правой ассоциативности
-            return Implication((left, right))
-        
-        return left
-    
-    def parse_disjunction(self) -> Operation | Predicate:
-        """Парсинг дизъюнкции"""
-        left = self.parse_conjunction()
-        
-        while self.match(TokenType.OR):
-            right = self.parse_conjunction()
-            left = Disjunction((left, right))
+    def parse(self) -> Operation | Predicate:
+        """Главный метод парсинга
+
+        Разбор без рекурсии: операнды и ожидающие применения операции
+        хранятся в явных стеках, поэтому глубина вложенности выражения
+        ограничена только памятью, а время разбора линейно.
+        """
+        if self.is_at_end():
+            raise ParserException("Пустое выражение")
         
-        return left
-    
-    def parse_conjunction(self) -> Operation | Predicate:
-        """Парсинг конъюнкции"""
-        left = self.parse_negation()
+        operands: list[Operation | Predicate] = []
+        operators: list[tuple] = []
+        # Для каждого уровня скобок: встречалась ли уже эквиваленция
+        equivalences = [False]
         
-        while self.match(TokenType.AND):
-            right = self.parse_negation()
-            left = Conjunction((left, right))
+        while True:
+            # Операнд: отрицания и открывающие скобки, затем идентификатор
+            token = self.peek()
+            while token.type is TokenType.NOT or token.type is TokenType.LPAREN:
+                if token.type is TokenType.NOT:
+                    operators.append(NEGATION)
+                else:
+                    operators.append(PARENTHESIS)
+                    equivalences.append(False)
+                self.advance()
+                token = self.peek()
+            
+            if token.type is not TokenType.IDENTIFIER:
+                if token.type is TokenType.EOL:
+                    raise ParserException("Неожиданный токен: конец выражения")
+                raise ParserException(f"Неожиданный токен: {token.value}", token)
+            operands.append(Variable(token.value))
+            self.advance()
+            
+            # Закрывающие скобки, затем бинарная операция или конец выражения
+            token = self.peek()
+            while token.type is TokenType.RPAREN and len(equivalences) > 1:
+                while operators[-1] is not PARENTHESIS:
+                    self.reduce(operands, operators.pop())
+                operators.pop()
+                equivalences.pop()
+                self.advance()
+                token = self.peek()
+            
+            operator = BINARY_OPERATORS.get(token.type)
+            if operator is None or (
+                token.type is TokenType.EQUIVALENCE and equivalences[-1]
+            ):
+                if len(equivalences) > 1:
+                    raise ParserException("Ожидалась закрывающая скобка", token)
+                if token.type is TokenType.EOL:
+                    break
+                raise ParserException(f"Неожиданный токен: {token.value}", token)
+            if token.type is TokenType.EQUIVALENCE:
+                equivalences[-1] = True
+            
+            priority, _, right_associative = operator
+            while operators and (
+                operators[-1][0] > priority
+                or (operators[-1][0] == priority and not right_associative)
+            ):
+                self.reduce(operands, operators.pop())
+            operators.append(operator)
+            self.advance()
         
-        return left
+        while operators:
+            self.reduce(operands, operators.pop())
+        return operands[0]
     
-    def parse_negation(self) -> Operation | Predicate:
-        """Парсинг отрицания"""
-        if self.match(TokenType.NOT):
-            operand = self.parse_negation()
-            return Negation(operand)
+    def reduce(self, operands: list, operator: tuple):
+        """Применить операцию к операндам на вершине стека"""
+        node_class = operator[1]
+        if node_class is Negation:
+            operands[-1] = Negation(operands[-1])
+            return
         
-        return self.parse_primary()
-    
-    def parse_primary(self) -> Operation | Predicate:
-        """Парсинг базовых элементов"""
-        # Скобки
-        if self.match(TokenType.LPAREN):
-            expr = self.parse_equivalence()
-            if not self.match(TokenType.RPAREN):
-                raise ParserException(
-                    "Ожидалась закрывающая скобка",
-                    self.peek()
-                )
-            return expr
+        right = operands.pop()
+        if not self.flat or node_class not in FLAT_OPERATIONS:
+            operands[-1] = node_class((operands[-1], right))
+            return
         
-        # Идентификатор
-        if self.match(TokenType.IDENTIFIER):
-            name = self.previous().value
-            return Variable(name)
-        
-        raise ParserException(
-            f"Неожиданный токен: {self.peek().value if not self.is_at_end() else 'конец выражения'}",
-            self.peek() if not self.is_at_end() else None
-        )
+        # Все узлы в стеке построены этим разбором, поэтому список детей
+        # можно дополнять на месте
+        left = operands[-1]
+        if type(left) is node_class:
+            children = left.children
+        else:
+            children = [left]
+            operands[-1] = node_class(children)
+        if type(right) is node_class:
+            children.extend(right.children)
+        else:
+            children.append(right)
     
     # Вспомогательные методы
     
@@ -130,7 +175,8 @@ class Parser:
     def advance(self) -> Token:
         """Продвинуться к следующему токену"""
         if not self.is_at_end():
-            self.current += 1
+            self.previous_token = self.current_token
+            self.loaded = False
         return self.previous()
     
     def is_at_end(self) -> bool:
@@ -139,8 +185,81 @@ class Parser:
     
     def peek(self) -> Token:
         """Посмотреть текущий токен"""
-        return self.tokens[self.current]
+        if not self.loaded:
+            token = next(self.tokens, None)
+            if token is None:
+                # Последовательность без EOL завершается так же, как с ним
+                position = self.previous_token.position if self.previous_token else 0
+                token = Token(TokenType.EOL, None, position)
+            self.current_token = token
+            self.loaded = True
+        return self.current_token
     
     def previous(self) -> Token:
         """Получить предыдущий токен"""
-        return self.tokens[self.current - 1]
\ No newline at end of file
+        return self.previous_token
+
+
+class ParseCache:
+    """Кэш разобранных выражений с вытеснением давно не использованных (LRU)
+
+    Ключ - текст выражения без начальных и конечных пробелов. Для
+    одинаковых строк возвращается один и тот же объект дерева, поэтому
+    деревья из кэша нельзя изменять. Строки с ошибками не кэшируются.
+    """
+    
+    def __init__(self, lexer: Lexer, parser: Parser, maxsize: int = 100_000):
+        self.lexer = lexer
+        self.parser = parser
+        self.maxsize = maxsize
+        self.entries: OrderedDict[str, Operation | Predicate] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get(self, text: str) -> Optional[Operation | Predicate]:
+        """Найти разобранное выражение; None, если его нет в кэше"""
+        key = text.strip()
+        expression = self.entries.get(key)
+        if expression is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return expression
+    
+    def put(self, text: str, expression: Operation | Predicate):
+        """Запомнить разобранное выражение"""
+        self.entries[text.strip()] = expression
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+    
+    def parse(self, text: str) -> Operation | Predicate:
+        """Разобрать выражение, используя кэш"""
+        expression = self.get(text)
+        if expression is None:
+            self.parser.reset(self.lexer.iter_tokens(text))
+            expression = self.parser.parse()
+            self.put(text, expression)
+        return expression
+    
+    @property
+    def hit_rate(self) -> float:
+        """Доля запросов, найденных в кэше"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+    
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,320 @@
+"""Неизменяемые отображения со структурным разделением (HAMT)
+
+PersistentMap - префиксное дерево по 64 битам хеша ключа, по 5 бит на
+уровень. Узел хранит битовую маску занятых позиций и плотный список пар
+(ключ, значение); вместо пары может стоять дочерний узел. Изменение
+возвращает новое отображение, копируя только узлы на пути к ключу, поэтому
+прежние версии остаются доступны без копирования всего содержимого.
+
+Порядок обхода определяется хешами ключей, а не порядком добавления.
+
+Набор пар добавляется одной серией с общей меткой (update): каждый узел
+копируется не больше одного раза, а не для каждой пары, как при серии set
+без метки.
+
+Серию изменений можно выполнять на месте: узлы и отображения, созданные с
+меткой owner, изменяются при следующих изменениях с той же меткой без
+копирования. Метку нужно сменить, как только отображение стало доступно
+другим читателям (см. KnowledgeBase.snapshot) - тогда опубликованные узлы
+больше не изменяются.
+"""
+
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, Optional
+
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# Метка на месте ключа: значение пары - дочерний узел
+_CHILD = object()
+_MISSING = object()
+
+
+class _Node:
+    """Узел с битовой маской занятых позиций"""
+    __slots__ = ("bitmap", "entries", "owner")
+
+    def __init__(self, bitmap: int, entries: list, owner: Optional[object]):
+        self.bitmap = bitmap
+        self.entries = entries
+        self.owner = owner
+
+
+class _Collisions:
+    """Ключи с одинаковым хешем: пары хранятся подряд"""
+    __slots__ = ("hash", "entries", "owner")
+
+    def __init__(self, key_hash: int, entries: list, owner: Optional[object]):
+        self.hash = key_hash
+        self.entries = entries
+        self.owner = owner
+
+
+_EMPTY = _Node(0, [], None)
+
+
+def _hash(key: Any) -> int:
+    return hash(key) & HASH_MASK
+
+
+def _edited(node, owner: Optional[object]):
+    """Узел, который можно изменять сеансу owner: сам узел или его копия"""
+    if owner is not None and node.owner is owner:
+        return node
+    if type(node) is _Node:
+        return _Node(node.bitmap, node.entries.copy(), owner)
+    return _Collisions(node.hash, node.entries.copy(), owner)
+
+
+def _find(node, key_hash: int, key: Any) -> Any:
+    shift = 0
+    while type(node) is _Node:
+        bit = 1 << ((key_hash >> shift) & MASK)
+        bitmap = node.bitmap
+        if not bitmap & bit:
+            return _MISSING
+        i = 2 * (bitmap & (bit - 1)).bit_count()
+        found = node.entries[i]
+        if found is _CHILD:
+            node = node.entries[i + 1]
+            shift += BITS
+        elif found is key or found == key:
+            return node.entries[i + 1]
+        else:
+            return _MISSING
+    entries = node.entries
+    for i in range(0, len(entries), 2):
+        if entries[i] is key or entries[i] == key:
+            return entries[i + 1]
+    return _MISSING
+
+
+def _pair(
+    shift: int,
+    key1: Any,
+    value1: Any,
+    hash1: int,
+    key2: Any,
+    value2: Any,
+    hash2: int,
+    owner: Optional[object],
+):
+    """Узел из двух пар с разными ключами"""
+    if shift >= HASH_BITS or hash1 == hash2:
+        return _Collisions(hash1, [key1, value1, key2, value2], owner)
+    index1 = (hash1 >> shift) & MASK
+    index2 = (hash2 >> shift) & MASK
+    if index1 == index2:
+        child = _pair(shift + BITS, key1, value1, hash1, key2, value2, hash2, owner)
+        return _Node(1 << index1, [_CHILD, child], owner)
+    if index1 > index2:
+        key1, value1, key2, value2 = key2, value2, key1, value1
+        index1, index2 = index2, index1
+    return _Node((1 << index1) | (1 << index2), [key1, value1, key2, value2], owner)
+
+
+def _assoc(
+    node, shift: int, key_hash: int, key: Any, value: Any, owner: Optional[object]
+) -> tuple[Any, bool]:
+    """Узел с парой (key, value) и признак того, что ключ добавлен"""
+    if type(node) is _Collisions:
+        entries = node.entries
+        for i in range(0, len(entries), 2):
+            if entries[i] is key or entries[i] == key:
+                if entries[i + 1] is value:
+                    return node, False
+                node = _edited(node, owner)
+                node.entries[i + 1] = value
+                return node, False
+        node = _edited(node, owner)
+        node.entries.extend((key, value))
+        return node, True
+
+    bitmap = node.bitmap
+    bit = 1 << ((key_hash >> shift) & MASK)
+    i = 2 * (bitmap & (bit - 1)).bit_count()
+    # Копия узла создаётся, только если узел не принадлежит сеансу owner
+    owned = owner is not None and node.owner is owner
+    if not bitmap & bit:
+        if not owned:
+            node = _Node(bitmap, node.entries.copy(), owner)
+        node.bitmap = bitmap | bit
+        node.entries[i:i] = (key, value)
+        return node, True
+
+    entries = node.entries
+    found, current = entries[i], entries[i + 1]
+    if found is _CHILD:
+        child, added = _assoc(current, shift + BITS, key_hash, key, value, owner)
+        if child is not current:
+            if not owned:
+                node = _Node(bitmap, entries.copy(), owner)
+            node.entries[i + 1] = child
+        return node, added
+    if found is key or found == key:
+        if current is not value:
+            if not owned:
+                node = _Node(bitmap, entries.copy(), owner)
+            node.entries[i + 1] = value
+        return node, False
+    child = _pair(
+        shift + BITS, found, current, hash(found) & HASH_MASK, key, value, key_hash, owner
+    )
+    if not owned:
+        node = _Node(bitmap, entries.copy(), owner)
+    node.entries[i] = _CHILD
+    node.entries[i + 1] = child
+    return node, True
+
+
+def _dissoc(
+    node, shift: int, key_hash: int, key: Any, owner: Optional[object]
+) -> tuple[Any, bool]:
+    """Узел без ключа key (None, если он пуст) и признак того, что ключ был"""
+    if type(node) is _Collisions:
+        entries = node.entries
+        for i in range(0, len(entries), 2):
+            if entries[i] is key or entries[i] == key:
+                if len(entries) == 2:
+                    return None, True
+                node = _edited(node, owner)
+                del node.entries[i:i + 2]
+                return node, True
+        return node, False
+
+    bit = 1 << ((key_hash >> shift) & MASK)
+    if not node.bitmap & bit:
+        return node, False
+    i = 2 * (node.bitmap & (bit - 1)).bit_count()
+    found, current = node.entries[i], node.entries[i + 1]
+    if found is _CHILD:
+        child, removed = _dissoc(current, shift + BITS, key_hash, key, owner)
+        if not removed:
+            return node, False
+        if child is current:
+            return node, True
+        if child is not None:
+            node = _edited(node, owner)
+            node.entries[i + 1] = child
+            return node, True
+    elif not (found is key or found == key):
+        return node, False
+    if node.bitmap == bit:
+        return None, True
+    node = _edited(node, owner)
+    node.bitmap ^= bit
+    del node.entries[i:i + 2]
+    return node, True
+
+
+def _walk(node) -> Iterator[tuple[Any, Any]]:
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        entries = node.entries
+        for i in range(0, len(entries), 2):
+            if entries[i] is _CHILD:
+                stack.append(entries[i + 1])
+            else:
+                yield entries[i], entries[i + 1]
+
+
+class PersistentMap(Mapping):
+    """Неизменяемое отображение: set и delete возвращают новую версию"""
+    __slots__ = ("_root", "_size", "_owner")
+
+    def __init__(self, items: Mapping | Iterable[tuple[Any, Any]] = ()):
+        self._root = _EMPTY
+        self._size = 0
+        self._owner = None
+        if items:
+            # Узлы нового отображения никому не доступны, пока оно строится
+            owner = object()
+            pairs = items.items() if isinstance(items, Mapping) else items
+            for key, value in pairs:
+                self._root, added = _assoc(self._root, 0, _hash(key), key, value, owner)
+                self._size += added
+
+    @classmethod
+    def fromkeys(cls, keys: Iterable[Any], value: Any = None) -> "PersistentMap":
+        return cls((key, value) for key in keys)
+
+    def _replace(self, root, size: int, owner: Optional[object]) -> "PersistentMap":
+        """Отображение с новым корнем: само это отображение, если оно принадлежит owner"""
+        if owner is not None and self._owner is owner:
+            result = self
+        else:
+            result = PersistentMap.__new__(PersistentMap)
+            result._owner = owner
+        result._root = _EMPTY if root is None else root
+        result._size = size
+        return result
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, key: Any) -> Any:
+        value = _find(self._root, hash(key) & HASH_MASK, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        value = _find(self._root, hash(key) & HASH_MASK, key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: Any) -> bool:
+        return _find(self._root, hash(key) & HASH_MASK, key) is not _MISSING
+
+    def __iter__(self) -> Iterator:
+        return (key for key, _ in _walk(self._root))
+
+    def items(self) -> Iterator[tuple[Any, Any]]:
+        return _walk(self._root)
+
+    def values(self) -> Iterator[Any]:
+        return (value for _, value in _walk(self._root))
+
+    def __repr__(self):
+        return f"PersistentMap({dict(self.items())!r})"
+
+    def set(self, key: Any, value: Any, owner: Optional[object] = None) -> "PersistentMap":
+        """Версия с парой (key, value)
+
+        Если задан owner, узлы, созданные ранее с той же меткой, изменяются
+        на месте (см. описание модуля).
+        """
+        root, added = _assoc(self._root, 0, hash(key) & HASH_MASK, key, value, owner)
+        if root is self._root and not added:
+            return self
+        return self._replace(root, self._size + added, owner)
+
+    def update(
+        self,
+        items: Mapping | Iterable[tuple[Any, Any]],
+        owner: Optional[object] = None,
+    ) -> "PersistentMap":
+        """Версия со всеми парами items (как серия set)
+
+        Без owner пары добавляются с новой меткой: узлы копируются один раз
+        на всю серию, а не для каждой пары.
+        """
+        if owner is None:
+            owner = object()
+        root, size = self._root, self._size
+        pairs = items.items() if isinstance(items, Mapping) else items
+        for key, value in pairs:
+            root, added = _assoc(root, 0, _hash(key), key, value, owner)
+            size += added
+        if root is self._root and size == self._size:
+            return self
+        return self._replace(root, size, owner)
+
+    def delete(self, key: Any, owner: Optional[object] = None) -> "PersistentMap":
+        """Версия без ключа key (та же, если его нет)"""
+        root, removed = _dissoc(self._root, 0, hash(key) & HASH_MASK, key, owner)
+        if not removed:
+            return self
+        return self._replace(root, self._size - 1, owner)
@@ -0,0 +1,215 @@
+from array import array
+
+from models import Disjunct, Negation, Operation, Predicate
+
+
+class ProofTrace:
+    """Граф вывода метода резолюций
+
+    Хранит все дизъюнкты - исходные и выведенные - и для каждого номера
+    родительских дизъюнктов. Исходные дизъюнкты родителей не имеют (-1).
+    Строки для вывода формируются только по запросу. Удалённые (reduce)
+    резольвенты заменяются на None; номера остальных не меняются.
+    """
+
+    def __init__(self, clauses: list | None = None):
+        self.clauses: list[Operation | Predicate | None] = []
+        self.left = array("i")
+        self.right = array("i")
+        # Сколько резольвент получено из каждого дизъюнкта и сколько из
+        # них не удалено
+        self.activity = array("i")
+        self._children = array("i")
+        self._keys: set[frozenset] = set()
+        # Ключи удалённых резольвент: они не выводятся повторно
+        self._forgotten: set[frozenset] = set()
+        self.deleted = 0
+        # Число исходных дизъюнктов
+        self.input_count = 0
+        for clause in clauses or ():
+            self.add_input(clause)
+
+    def __len__(self):
+        return len(self.clauses)
+
+    def add_input(self, clause: Operation | Predicate) -> int:
+        """Добавить исходный дизъюнкт"""
+        self._keys.add(clause_key(clause))
+        return self._append(clause, -1, -1)
+
+    def add_lemma(self, clause: Operation | Predicate) -> int | None:
+        """Добавить исходный дизъюнкт, если такого дизъюнкта ещё нет в графе"""
+        key = clause_key(clause)
+        if key in self._keys:
+            return None
+        self._keys.add(key)
+        return self._append(clause, -1, -1)
+
+    def add_resolvent(
+        self, clause: Operation | Predicate, left: int, right: int
+    ) -> int | None:
+        """Добавить резольвенту дизъюнктов left и right
+
+        Возвращает номер нового дизъюнкта или None, если такой дизъюнкт уже
+        есть в графе либо он тождественно истинен.
+        """
+        key = clause_key(clause)
+        if key in self._keys or is_tautology(key) or key in self._forgotten:
+            return None
+        self._keys.add(key)
+        return self._append(clause, left, right)
+
+    def _append(self, clause: Operation | Predicate, left: int, right: int) -> int:
+        self.clauses.append(clause)
+        self.left.append(left)
+        self.right.append(right)
+        self.activity.append(0)
+        self._children.append(0)
+        if left >= 0:
+            for parent in (left, right):
+                self.activity[parent] += 1
+                self._children[parent] += 1
+        else:
+            self.input_count += 1
+        return len(self.clauses) - 1
+
+    def reduce(self, target: int) -> int:
+        """Удалить резольвенты, чтобы их осталось не больше target
+
+        Удаляются только резольвенты, из которых не выведено ни одного
+        неудалённого дизъюнкта, поэтому вывод каждого оставшегося дизъюнкта
+        сохраняется. Первыми удаляются длинные, затем реже использованные
+        (activity), затем более старые. Возвращает число удалённых.
+        """
+        excess = len(self.clauses) - self.input_count - self.deleted - target
+        if excess <= 0:
+            return 0
+        candidates = [
+            index
+            for index, clause in enumerate(self.clauses)
+            if clause is not None and not self.is_input(index) and not self._children[index]
+        ]
+        candidates.sort(
+            key=lambda index: (
+                -len(clause_key(self.clauses[index])),
+                self.activity[index],
+                index,
+            )
+        )
+        for index in candidates[:excess]:
+            key = clause_key(self.clauses[index])
+            self._keys.discard(key)
+            self._forgotten.add(key)
+            self.clauses[index] = None
+            for parent in (self.left[index], self.right[index]):
+                self._children[parent] -= 1
+        removed = min(excess, len(candidates))
+        self.deleted += removed
+        return removed
+
+    def is_input(self, index: int) -> bool:
+        return self.left[index] < 0
+
+    def derivation(self, index: int) -> list[int]:
+        """Номера дизъюнктов, участвующих в выводе дизъюнкта index"""
+        used = set()
+        stack = [index]
+        while stack:
+            current = stack.pop()
+            if current in used:
+                continue
+            used.add(current)
+            if not self.is_input(current):
+                stack.append(self.left[current])
+                stack.append(self.right[current])
+        return sorted(used)
+
+    def proof_trace(self, index: int) -> tuple["ProofTrace", list[int]]:
+        """Граф вывода только с дизъюнктами вывода index
+
+        Возвращает граф и прежние номера его дизъюнктов; дизъюнкт index в
+        нём последний.
+        """
+        used = self.derivation(index)
+        numbers = {}
+        trace = ProofTrace()
+        for old in used:
+            clause = self.clauses[old]
+            trace._keys.add(clause_key(clause))
+            if self.is_input(old):
+                numbers[old] = trace._append(clause, -1, -1)
+            else:
+                numbers[old] = trace._append(
+                    clause, numbers[self.left[old]], numbers[self.right[old]]
+                )
+        return trace, used
+
+    def without(self, removed: set[int]) -> "ProofTrace":
+        """Граф вывода без дизъюнктов removed и всех выведенных из них
+
+        Оставшиеся дизъюнкты сохраняют порядок и получают новые номера.
+        """
+        trace = ProofTrace()
+        numbers = array("i", [-1]) * len(self.clauses)
+        for index, clause in enumerate(self.clauses):
+            if index in removed or clause is None:
+                continue
+            if self.is_input(index):
+                numbers[index] = trace.add_input(clause)
+                continue
+            left, right = numbers[self.left[index]], numbers[self.right[index]]
+            if left >= 0 and right >= 0:
+                trace._keys.add(clause_key(clause))
+                numbers[index] = trace._append(clause, left, right)
+        return trace
+
+    def format_clause(self, index: int) -> str:
+        return f"({index + 1}) {self.clauses[index]}"
+
+    def format_step(self, index: int, conclusion: str) -> str:
+        """Оформить шаг резолюции, на котором получен дизъюнкт index"""
+        first_str = self.format_clause(self.left[index])
+        second_str = self.format_clause(self.right[index])
+        max_len = max(len(first_str), len(second_str))
+        if is_empty(self.clauses[index]):
+            result = f"Пустой дизъюнкт - {conclusion}."
+        else:
+            result = self.format_clause(index)
+        return "\n".join(
+            (
+                first_str.ljust(max_len) + " |",
+                " " * max_len + f" |--> {result}",
+                second_str.ljust(max_len) + " |",
+                "\n\n",
+            )
+        )
+
+    def format_derivation(self, index: int, conclusion: str) -> str:
+        """Оформить вывод дизъюнкта index: используемые исходные дизъюнкты и шаги"""
+        used = self.derivation(index)
+        lines = [self.format_clause(i) for i in used if self.is_input(i)]
+        lines.append("")
+        lines.extend(self.format_step(i, conclusion) for i in used if not self.is_input(i))
+        return "\n".join(lines)
+
+
+def clause_key(clause: Operation | Predicate) -> frozenset:
+    """Множество литералов дизъюнкта в виде пар (имя, знак)"""
+    literals = clause.children if type(clause) is Disjunct else (clause,)
+    return frozenset(literal_key(literal) for literal in literals)
+
+
+def literal_key(literal: Operation | Predicate) -> tuple[str, bool]:
+    if type(literal) is Negation and isinstance(literal.child, Predicate):
+        return literal.child.name, False
+    if isinstance(literal, Predicate):
+        return literal.name, True
+    return str(literal), True
+
+
+def is_tautology(key: frozenset) -> bool:
+    return any((name, not sign) in key for name, sign in key)
+
+
+def is_empty(clause: Operation | Predicate) -> bool:
+    return type(clause) is Disjunct and len(clause.children) == 0
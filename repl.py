@@ -1,36 +1,163 @@
-import os
+import argparse
+import json
 import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from dataclasses import dataclass
 from typing import Optional
 
-from lexer import Lexer, LexerException
-from parser import Parser, ParserException
+from lexer import Lexer, LexerException, SourceReader
+from parser import ParseCache, Parser, ParserException
 from models import Operation, Predicate, Variable, Implication
-from engine import LogicalEngine, Implication, Conjunction, Disjunction
-from knowledge_base import KnowledgeBase
+from engine import LogicalEngine, QueryContext, Implication, Conjunction, Disjunction
+from knowledge_base import KnowledgeBase, Statement
+from sqlite_knowledge_base import SQLiteKnowledgeBase
+
+
+# Вердикты LogicalEngine.resolution_method в машинном режиме
+VERDICTS = {True: "proved", False: "not_proved", None: "inconsistent"}
+
+
+def verdict_name(verdict: Optional[bool], context: QueryContext) -> str:
+    """Вердикт для машинного режима: при неполном поиске not_proved - unknown"""
+    if verdict is False and not context.complete:
+        return "unknown"
+    return VERDICTS[verdict]
+
+# Команды REPL - первое слово строки; у команд ARGUMENT_COMMANDS аргумент
+# обязателен
+ARGUMENT_COMMANDS = {"load", "save", "restore", "find", "remove"}
+COMMANDS = {"help", "get", "clear", "trace", "exit", "quit", *ARGUMENT_COMMANDS}
+
+# Операторы, которые могут стоять после имени высказывания
+BINARY_OPERATORS = ("&", "*", "|", "+", "-", "<")
+
+
+def split_command(line: str) -> Optional[tuple[str, str]]:
+    """Команда строки и её аргумент или None, если строка - не команда
+
+    Если за первым словом следует оператор (find -> x) или нет
+    обязательного аргумента (load), строка - высказывание или аксиома.
+    """
+    parts = line.split(maxsplit=1)
+    if not parts or parts[0] not in COMMANDS:
+        return None
+    name = parts[0]
+    argument = parts[1].strip() if len(parts) > 1 else ""
+    if argument.startswith(BINARY_OPERATORS):
+        return None
+    if name in ARGUMENT_COMMANDS and not argument:
+        return None
+    return name, argument
+
+
+def is_command(line: str) -> bool:
+    """Проверить, является ли строка комментарием, командой или теоремой"""
+    return line.startswith(("//", "?")) or split_command(line) is not None
+
+
+@dataclass
+class LoadEntry:
+    """Разобранная строка загружаемого файла"""
+    line_num: int
+    line: str
+    expression: Optional[Operation | Predicate] = None
+    error: Optional[Exception] = None
+    # Дизъюнкты КНФ аксиомы, если они построены при разборе
+    clauses: Optional[list] = None
+    # Выражение взято из кэша разбора
+    cached: bool = False
+
+
+def is_axiom(expression: Operation | Predicate) -> bool:
+    """Проверить, является ли выражение аксиомой"""
+    # Аксиома должна содержать импликацию на верхнем уровне
+    # или быть сложным выражением
+    return isinstance(expression, (Implication, Conjunction, Disjunction))
+
+
+def parse_entry(cache: ParseCache, line_num: int, line: str) -> LoadEntry:
+    """Разобрать строку файла с высказыванием или аксиомой"""
+    hits = cache.hits
+    try:
+        expression = cache.parse(line)
+    except (LexerException, ParserException) as e:
+        return LoadEntry(line_num, line, error=e)
+    if not is_axiom(expression) and not isinstance(expression, Variable):
+        error = ValueError("Высказывание должно быть простым идентификатором")
+        return LoadEntry(line_num, line, error=error)
+    return LoadEntry(line_num, line, expression=expression, cached=cache.hits > hits)
+
+
+# Кэш разбора процесса пула; создаётся при первой обработанной пачке
+_worker_cache: Optional[ParseCache] = None
+
+
+def compile_chunk(
+    chunk: list[tuple[int, str]], cache: Optional[ParseCache] = None
+) -> list[LoadEntry]:
+    """Разобрать строки файла и построить КНФ аксиом
+
+    Без cache (в процессе пула) используется кэш разбора процесса.
+    """
+    global _worker_cache
+    if cache is None:
+        if _worker_cache is None:
+            _worker_cache = ParseCache(Lexer(), Parser([], flat=True))
+        cache = _worker_cache
+    entries = []
+    for line_num, line in chunk:
+        entry = parse_entry(cache, line_num, line)
+        if entry.error is None and is_axiom(entry.expression):
+            entry.clauses = LogicalEngine.to_clauses(entry.expression)
+        entries.append(entry)
+    return entries
 
 
 class REPL:
     """Read-Eval-Print Loop для логического языка"""
     
-    def __init__(self):
-        self.kb = KnowledgeBase()
+    def __init__(self, machine: bool = False, kb: Optional[KnowledgeBase] = None):
+        self.kb = kb if kb is not None else KnowledgeBase()
         self.engine = LogicalEngine(self.kb)
         self.lexer = Lexer()
-        self.parser = Parser([])
+        self.parser = Parser([], flat=True)
+        # Общий для ввода и загрузки файлов кэш разобранных строк
+        self.parse_cache = ParseCache(self.lexer, self.parser)
         self.running = True
+        # Как часто (в строках) сообщать о ходе загрузки файла
+        self.load_progress = 100_000
+        # Сколько высказываний и аксиом файла добавлять в базу знаний за раз
+        self.load_batch = 10_000
+        # Число процессов для разбора загружаемых файлов
+        self.load_workers = 1
+        # Радиус окрестности цели при доказательстве
+        # (LogicalEngine.resolution_method); None - вся компонента цели
+        self.relevance_depth: Optional[int] = None
+        # Машинный режим: вместо текста на каждую команду выводится
+        # одна строка JSON с результатом
+        self.machine = machine
+        self._record: Optional[dict] = None
+        self._json_out = sys.stdout
     
     def run(self):
         """Запустить REPL"""
-        self.print_welcome()
+        if not self.machine:
+            self.print_welcome()
+        prompt = "" if self.machine else ">>> "
         
         while self.running:
             try:
-                line = input(">>> ").strip()
+                line = input(prompt).strip()
                 if not line:
                     continue
                 
                 self.process_line(line)
                 
+            except EOFError:
+                break
             except KeyboardInterrupt:
                 print("\n Прервано. Используйте 'exit' для выхода")
             except LexerException as e:
@@ -52,29 +179,104 @@ class REPL:
     
     def process_line(self, line: str):
         """Обработать строку ввода"""
+        if not self.machine:
+            self.dispatch(line)
+            return
+        
+        # Текстовый вывод команды отбрасывается, вместо него выводится
+        # собранная командой запись
+        outer = self._record
+        if outer is None:
+            self._json_out = sys.stdout
+        self._record = {"command": None, "input": line, "ok": True}
+        try:
+            with redirect_stdout(None):
+                self.dispatch(line)
+        except Exception as e:
+            self.report_error(e)
+        finally:
+            record, self._record = self._record, outer
+        self.emit(record)
+    
+    def dispatch(self, line: str):
+        """Выполнить строку ввода"""
         # Пропустить комментарии
         if line.startswith("//"):
+            self.report(command="comment")
+            return
+        
+        if line.startswith("?"):
+            # Теорема
+            self.report(command="theorem")
+            self.process_theorem(line[1:].strip())
+            return
+        
+        command = split_command(line)
+        if command is None:
+            # Высказывание или аксиома
+            self.process_statement_or_axiom(line)
             return
         
         # Обработать команды
-        if line.startswith("help"):
+        name, argument = command
+        if name == "help":
+            self.report(command="help")
             self.cmd_help()
-        elif line.startswith("load "):
-            self.cmd_load(line[5:].strip())
-        elif line.startswith("get"):
+        elif name == "load":
+            self.report(command="load")
+            self.cmd_load(argument)
+        elif name == "save":
+            self.report(command="save")
+            self.cmd_save(argument)
+        elif name == "restore":
+            self.report(command="restore")
+            self.cmd_restore(argument)
+        elif name == "get":
+            self.report(command="get")
             self.cmd_get()
-        elif line.startswith("remove "):
-            self.cmd_remove(line[7:].strip())
-        elif line.startswith("clear"):
+        elif name == "find":
+            self.report(command="find")
+            self.cmd_find(argument)
+        elif name == "remove":
+            self.report(command="remove")
+            self.cmd_remove(argument)
+        elif name == "clear":
+            self.report(command="clear")
             self.cmd_clear()
-        elif line.startswith("exit") or line.startswith("quit"):
+        elif name == "trace":
+            self.report(command="trace")
+            self.cmd_trace(argument)
+        else:
+            self.report(command="exit")
             self.cmd_exit()
-        elif line.startswith("?"):
-            # Теорема
-            self.process_theorem(line[1:].strip())
+    
+    def report(self, **fields):
+        """Добавить поля в запись о текущей команде (машинный режим)"""
+        if self._record is not None:
+            self._record.update(fields)
+    
+    def report_error(self, error: Exception):
+        """Добавить в запись о текущей команде описание ошибки"""
+        self.report(ok=False, error=self.describe_error(error))
+    
+    @staticmethod
+    def describe_error(error: Exception) -> dict:
+        """Описание ошибки для машинного режима"""
+        position = None
+        if isinstance(error, LexerException):
+            kind = "lexer"
+            position = error.position
+        elif isinstance(error, ParserException):
+            kind = "parser"
+            if error.token is not None:
+                position = error.token.position
         else:
-            # Высказывание или аксиома
-            self.process_statement_or_axiom(line)
+            kind = "error"
+        return {"type": kind, "message": str(error), "position": position}
+    
+    def emit(self, record: dict):
+        """Вывести запись машинного режима"""
+        print(json.dumps(record, ensure_ascii=False), file=self._json_out)
     
     def cmd_help(self):
         """Вывести справку"""
@@ -103,9 +305,16 @@ class REPL:
 КОМАНДЫ:
   help                    - показать эту справку
   get                     - показать все высказывания и аксиомы
+  find <высказывание>     - показать аксиомы, в которые высказывание
+                            входит без отрицания и с отрицанием
   remove <id>             - удалить аксиому по ID
   load <файл>             - загрузить файл с высказываниями и аксиомами
+  save <файл>             - сохранить базу знаний вместе с КНФ аксиом
+                            в двоичный снимок
+  restore <файл>          - заменить базу знаний сохранённым снимком
   clear                   - очистить базу знаний
+  trace on|off            - выводить все шаги резолюции или только
+                            шаги, ведущие к пустому дизъюнкту
   exit / quit             - выйти из программы
 
 ИСПОЛЬЗОВАНИЕ:
@@ -180,61 +389,259 @@ class REPL:
         
         print("="*70 + "\n")
     
+    def cmd_find(self, name: str):
+        """Показать аксиомы, в которые входит высказывание, по полярности"""
+        name = name.strip('"')
+        positive, negative = self.kb.get_occurrences(name)
+        self.report(
+            ok=True,
+            name=name,
+            positive=[axiom.id for axiom in positive],
+            negative=[axiom.id for axiom in negative],
+        )
+        if not positive and not negative:
+            print(f" Высказывание {name} не входит ни в одну аксиому")
+            return
+        for title, axioms in (("без отрицания", positive), ("с отрицанием", negative)):
+            print(f"\nВходит {title} ({len(axioms)}):")
+            for axiom in axioms:
+                print(f"  {axiom}")
+        print()
+
     def cmd_remove(self, arg: str):
         """Удалить аксиому по ID"""
         try:
             axiom_id = int(arg)
-            if self.kb.remove_axiom(axiom_id):
+            # Из движка убираются только дизъюнкты удалённой аксиомы
+            if self.engine.retract_axiom(axiom_id):
                 print(f" Аксиома ({axiom_id}) удалена")
-                # Перезагрузить аксиомы в движок
-                self.engine.load_axioms_from_kb()
+                self.report(ok=True, id=axiom_id)
             else:
                 print(f" Аксиома с ID {axiom_id} не найдена")
-        except ValueError:
+                self.report(ok=False, id=axiom_id)
+        except ValueError as e:
             print(" Ошибка: ID должен быть числом")
+            self.report_error(e)
     
     def cmd_load(self, filename: str):
         """Загрузить файл"""
         try:
             with open(filename, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            print(f"Загрузка файла: {filename}")
-            
-            in_multiline_comment = False
-            for line_num, line in enumerate(lines, 1):
-                line = line.strip()
-                
-                # Обработка многострочных комментариев
-                if "/*" in line:
-                    in_multiline_comment = True
-                if "*/" in line:
-                    in_multiline_comment = False
-                    continue
-                if in_multiline_comment:
-                    continue
-                
-                # Пропустить пустые строки и комментарии
-                if not line or line.startswith("//"):
-                    continue
+                print(f"Загрузка файла: {filename}")
                 
-                try:
-                    self.process_line(line)
-                except Exception as e:
-                    print(f"  Строка {line_num}: Ошибка - {e}")
+                # Файл читается построчно, комментарии (в том числе
+                # многострочные) удаляются по ходу чтения. Высказывания и
+                # аксиомы накапливаются и добавляются в базу знаний пачками,
+                # команды и теоремы выполняются по порядку.
+                # При load_workers > 1 пачки разбираются в пуле процессов.
+                reader = SourceReader(f)
+                reported = 0
+                batch = []
+                pending = deque()
+                with ExitStack() as stack:
+                    executor = None
+                    if self.load_workers > 1:
+                        executor = stack.enter_context(
+                            ProcessPoolExecutor(max_workers=self.load_workers)
+                        )
+                    for line_num, line in reader:
+                        if self.is_command(line):
+                            self.submit_batch(batch, executor, pending)
+                            batch = []
+                            self.load_pending(pending)
+                            try:
+                                self.process_line(line)
+                            except Exception as e:
+                                print(f"  Строка {line_num}: Ошибка - {e}")
+                        else:
+                            batch.append((line_num, line))
+                            if len(batch) >= self.load_batch:
+                                self.submit_batch(batch, executor, pending)
+                                batch = []
+                        
+                        if not self.load_progress:
+                            continue
+                        if line_num // self.load_progress > reported:
+                            reported = line_num // self.load_progress
+                            print(f"  Обработано строк: {line_num}")
+                    
+                    self.submit_batch(batch, executor, pending)
+                    self.load_pending(pending)
             
             print(f" Файл загружен")
+            self.report(
+                ok=True,
+                file=filename,
+                lines=reader.line_num,
+                parse_cache=self.parse_cache.stats(),
+            )
             
-        except FileNotFoundError:
+        except FileNotFoundError as e:
             print(f" Файл не найден: {filename}")
+            self.report(file=filename)
+            self.report_error(e)
         except Exception as e:
             print(f" Ошибка при загрузке файла: {e}")
+            self.report(file=filename)
+            self.report_error(e)
+    
+    def cmd_save(self, filename: str):
+        """Сохранить базу знаний в снимок"""
+        try:
+            compiled = self.engine.compile()
+            self.kb.save(filename)
+            print(f" База знаний сохранена: {filename}")
+            self.report(ok=True, file=filename, compiled=compiled)
+        except Exception as e:
+            print(f" Ошибка при сохранении базы знаний: {e}")
+            self.report(file=filename)
+            self.report_error(e)
+    
+    def cmd_restore(self, filename: str):
+        """Заменить базу знаний сохранённым снимком"""
+        try:
+            started = time.perf_counter()
+            kb = KnowledgeBase.load(filename, self.lexer.symbols)
+        except FileNotFoundError as e:
+            print(f" Файл не найден: {filename}")
+            self.report(file=filename)
+            self.report_error(e)
+            return
+        except Exception as e:
+            print(f" Ошибка при чтении снимка: {e}")
+            self.report(file=filename)
+            self.report_error(e)
+            return
+        
+        self.kb = self.engine.kb = kb
+        self.engine.context = QueryContext()
+        # Версии новой базы не связаны с версиями прежней
+        self.engine.result_cache.clear()
+        self.engine.lemmas.clear()
+        elapsed = time.perf_counter() - started
+        print(
+            f" Загружено высказываний: {len(kb.statements)}, аксиом: {len(kb.axioms)}"
+            f" ({elapsed:.3f} с)"
+        )
+        self.report(
+            ok=True,
+            file=filename,
+            statements=len(kb.statements),
+            axioms=len(kb.axioms),
+            timings={"restore": elapsed},
+        )
+    
+    def is_command(self, line: str) -> bool:
+        """Проверить, является ли строка командой или теоремой"""
+        return is_command(line)
+    
+    def parse_entry(self, line_num: int, line: str) -> LoadEntry:
+        """Разобрать строку файла с высказыванием или аксиомой"""
+        return parse_entry(self.parse_cache, line_num, line)
+    
+    def submit_batch(
+        self,
+        batch: list[tuple[int, str]],
+        executor: Optional[ProcessPoolExecutor],
+        pending: deque[Future],
+    ):
+        """Передать пачку строк файла на обработку
+
+        Без пула процессов пачка разбирается и добавляется в базу знаний
+        сразу. С пулом она разбирается и компилируется в отдельном процессе,
+        а в базу знаний добавляется позже, в load_pending, строго в порядке
+        строк файла - поэтому ID высказываний и аксиом не зависят от числа
+        процессов.
+        """
+        if not batch:
+            return
+        if executor is None:
+            self.load_entries(
+                [self.parse_entry(line_num, line) for line_num, line in batch]
+            )
+            return
+        pending.append(executor.submit(compile_chunk, batch))
+        # Ограничиваем число пачек, ожидающих добавления
+        while len(pending) > 2 * self.load_workers:
+            self.load_entries(pending.popleft().result())
+    
+    def load_pending(self, pending: deque[Future]):
+        """Дождаться обработки всех переданных пачек и добавить их в базу знаний"""
+        while pending:
+            self.load_entries(pending.popleft().result())
+    
+    def load_entries(self, batch: list[LoadEntry]):
+        """Добавить разобранные строки файла в базу знаний одной пачкой
+
+        КНФ аксиом строится одним проходом после добавления всей пачки.
+        """
+        if not batch:
+            return
+        with self.kb.batch():
+            added = self.kb.bulk_load(
+                entry.expression for entry in batch if entry.error is None
+            )
+            # КНФ, построенная при разборе в пуле процессов, не строится заново
+            compiled = (entry for entry in batch if entry.error is None)
+            for entry, item in zip(compiled, added):
+                if entry.clauses is not None:
+                    self.kb.set_clauses(item.id, entry.clauses)
+            self.engine.compile(
+                axiom_ids=[item.id for item in added if not isinstance(item, Statement)]
+            )
+        
+        added = iter(added)
+        statements = axioms = cached = 0
+        for entry in batch:
+            if entry.error is not None:
+                print(f"  Строка {entry.line_num}: Ошибка - {entry.error}")
+                if self.machine:
+                    self.emit(
+                        {
+                            "command": "statement",
+                            "input": entry.line,
+                            "ok": False,
+                            "error": self.describe_error(entry.error),
+                        }
+                    )
+                continue
+            
+            item = next(added)
+            cached += entry.cached
+            if isinstance(item, Statement):
+                statements += 1
+                command = "statement"
+            else:
+                axioms += 1
+                command = "axiom"
+            if self.machine:
+                record = {"command": command, "input": entry.line, "ok": True, "id": item.id}
+                if entry.cached:
+                    record["parse_cached"] = True
+                self.emit(record)
+        print(
+            f"  Добавлено высказываний: {statements}, аксиом: {axioms}"
+            f" (из кэша разбора: {cached})"
+        )
     
     def cmd_clear(self):
         """Очистить базу знаний"""
         self.kb.clear()
-        self.engine.axioms.clear()
+        self.engine.context = QueryContext()
         print(" База знаний очищена")
+        self.report(ok=True)
+    
+    def cmd_trace(self, arg: str):
+        """Включить или выключить полный вывод шагов резолюции"""
+        if arg == "on":
+            self.engine.full_trace = True
+            print(" Выводятся все шаги резолюции")
+        elif arg == "off":
+            self.engine.full_trace = False
+            print(" Выводятся только шаги, ведущие к пустому дизъюнкту")
+        else:
+            state = "on" if self.engine.full_trace else "off"
+            print(f" Полный вывод шагов резолюции: {state}")
     
     def cmd_exit(self):
         """Выйти из программы"""
@@ -243,14 +650,9 @@ class REPL:
     
     def process_statement_or_axiom(self, line: str):
         """Обработать высказывание или аксиому"""
+        self.report(command="statement")
         try:
-            # Токенизация
-            tokens = self.lexer.tokenize_line(line)
-            
-            # Парсинг
-            self.parser.tokens = tokens
-            self.parser.current = 0
-            expression = self.parser.parse()
+            expression, timings = self.parse_timed(line)
             
             # Определить, это высказывание или аксиома
             if self.is_axiom(expression):
@@ -259,7 +661,15 @@ class REPL:
                 print(f"Добавлена аксиома ({axiom.id}): {axiom.expression}")
                 
                 # Добавить в движок
-                self.engine.add_axiom(expression)
+                started = time.perf_counter()
+                clauses = self.engine.add_axiom(expression, axiom.id)
+                timings["cnf"] = time.perf_counter() - started
+                self.report(
+                    command="axiom",
+                    id=axiom.id,
+                    timings=timings,
+                    clauses=len(clauses or ()),
+                )
             else:
                 # Это высказывание
                 if isinstance(expression, Variable):
@@ -267,21 +677,49 @@ class REPL:
                     print(f"Добавлено высказывание [{stmt.id}]: {stmt.name}")
                     # Также добавляем высказывание в движок как аксиому
                     self.engine.add_axiom(expression)
+                    self.report(id=stmt.id, timings=timings)
                 else:
-                    print("Высказывание должно быть простым идентификатором")
+                    message = "Высказывание должно быть простым идентификатором"
+                    print(message)
+                    self.report_error(ValueError(message))
         
         except LexerException as e:
             print(f"Ошибка лексера: {e}")
+            self.report_error(e)
         except ParserException as e:
             print(f" Ошибка парсера: {e}")
+            self.report_error(e)
         except Exception as e:
             print(f" Ошибка: {e}")
+            self.report_error(e)
+    
+    def parse_line(self, line: str) -> Operation | Predicate:
+        """Разобрать строку с выражением"""
+        return self.parse_cache.parse(line)
+    
+    def parse_timed(self, line: str) -> tuple[Operation | Predicate, dict[str, float]]:
+        """Разобрать строку, замерив время лексического и синтаксического анализа
+
+        Для строки из кэша разбора время поиска в кэше учитывается как "parse".
+        """
+        started = time.perf_counter()
+        expression = self.parse_cache.get(line)
+        if expression is not None:
+            self.report(parse_cached=True)
+            return expression, {"lex": 0.0, "parse": time.perf_counter() - started}
+        
+        started = time.perf_counter()
+        tokens = self.lexer.tokenize_line(line)
+        lexed = time.perf_counter()
+        self.parser.reset(tokens)
+        expression = self.parser.parse()
+        parsed = time.perf_counter()
+        self.parse_cache.put(line, expression)
+        return expression, {"lex": lexed - started, "parse": parsed - lexed}
     
     def is_axiom(self, expression: Operation | Predicate) -> bool:
         """Проверить, является ли выражение аксиомой"""
-        # Аксиома должна содержать импликацию на верхнем уровне
-        # или быть сложным выражением
-        return isinstance(expression, (Implication, Conjunction, Disjunction))
+        return is_axiom(expression)
     
     def process_theorem(self, line: str):
         """Проверить теорему"""
@@ -291,31 +729,78 @@ class REPL:
             print(f"{'='*70}\n")
             
             # Токенизация и парсинг
-            tokens = self.lexer.tokenize_line(line)
-            self.parser.tokens = tokens
-            self.parser.current = 0
-            expression = self.parser.parse()
-            
-            # Загрузить аксиомы из базы знаний
-            self.engine.load_axioms_from_kb()
+            expression, timings = self.parse_timed(line)
             
             # Применить метод резолюций
             print("Аксиомы в базе знаний:")
-            self.engine.resolution_method(expression)
+            verdict = self.engine.resolution_method(expression, self.relevance_depth)
             
             print(f"\n{'='*70}\n")
             
+            timings.update(self.engine.timings)
+            trace = self.engine.trace
+            if self.engine.context.cached:
+                self.report(result_cached=True)
+            self.report(
+                verdict=verdict_name(verdict, self.engine.context),
+                timings=timings,
+                clauses={
+                    "input": trace.input_count - self.engine.context.lemmas,
+                    "lemmas": self.engine.context.lemmas,
+                    "derived": len(trace) - trace.input_count,
+                    "deleted": self.engine.context.deleted,
+                },
+            )
+            
         except LexerException as e:
             print(f" Ошибка лексера: {e}")
+            self.report_error(e)
         except ParserException as e:
             print(f" Ошибка парсера: {e}")
+            self.report_error(e)
         except Exception as e:
             print(f" Ошибка: {e}")
+            self.report_error(e)
 
 
 def main():
     """Точка входа в REPL"""
-    repl = REPL()
+    arg_parser = argparse.ArgumentParser(description="Логический язык программирования")
+    arg_parser.add_argument(
+        "--json",
+        action="store_true",
+        help="выводить результат каждой команды одной строкой JSON",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="число процессов для разбора загружаемых файлов",
+    )
+    arg_parser.add_argument(
+        "--db",
+        metavar="PATH",
+        help="хранить базу знаний в файле SQLite",
+    )
+    arg_parser.add_argument(
+        "--max-clauses",
+        type=int,
+        default=500_000,
+        help="сколько резольвент хранить при доказательстве (0 - без ограничения)",
+    )
+    arg_parser.add_argument(
+        "--relevance-depth",
+        type=int,
+        metavar="N",
+        help="доказывать только по аксиомам не дальше N шагов от высказываний "
+        "теоремы (быстрее, но полнота не гарантируется)",
+    )
+    args = arg_parser.parse_args()
+    kb = SQLiteKnowledgeBase(args.db) if args.db else None
+    repl = REPL(machine=args.json, kb=kb)
+    repl.load_workers = args.workers
+    repl.engine.max_clauses = args.max_clauses or None
+    repl.relevance_depth = args.relevance_depth
     repl.run()
 
 
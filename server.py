@@ -0,0 +1,355 @@
+"""Сервер запросов к базе знаний
+
+Сервер держит в памяти одну базу знаний с построенной КНФ аксиом и
+принимает запросы по TCP (localhost) или через Unix-сокет. Протокол -
+строки JSON: на каждую строку запроса
+
+    {"seq": 1, "command": "add", "input": "a -> b"}
+
+сервер отвечает одной строкой с тем же seq (номером запроса, который
+выбирает клиент), полем ok и результатом:
+
+    add     - добавить высказывание или аксиому (input - строка языка);
+              ответ: kind ("statement" или "axiom"), id, clauses
+    remove  - удалить аксиому (input - ID); ответ: id
+    load    - загрузить файл на стороне сервера (input - путь); ответ: file,
+              lines, statements, axioms, errors (номер строки и ошибка)
+    ?       - доказать теорему (input - строка языка, timeout - предельное
+              время в секундах, relevance_depth - радиус окрестности теоремы,
+              по умолчанию --relevance-depth); ответ: verdict (unknown - поиск был
+              неполон, см. --max-clauses), timings, clauses (в том
+              числе deleted - удалённые из-за предела резольвенты), cached
+              (результат взят из кэша результатов движка)
+    stats   - статистика кэшей; ответ: result_cache, parse_cache
+
+Ошибки описываются полем error, как в машинном режиме REPL; для
+прерванного по времени доказательства тип ошибки - "timeout".
+
+Запросы одного соединения выполняются по порядку, запросы разных
+соединений - одновременно. Теоремы доказываются в пуле потоков на версиях
+базы (LogicalEngine.snapshot), поэтому изменения базы их не затрагивают;
+изменения выполняются по очереди.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from typing import Iterator, Optional
+
+from engine import LogicalEngine, QueryContext, QueryTimeout
+from knowledge_base import KnowledgeBase, Statement
+from lexer import Lexer, SourceReader
+from parser import ParseCache, Parser
+from models import Variable
+from repl import REPL, LoadEntry, compile_chunk, is_axiom, is_command, verdict_name
+
+
+class QueryServer:
+    """Сервер запросов к одной базе знаний"""
+
+    def __init__(
+        self,
+        kb: Optional[KnowledgeBase] = None,
+        workers: int = 4,
+        timeout: float = 30.0,
+        max_clauses: Optional[int] = 500_000,
+        relevance_depth: Optional[int] = None,
+        load_workers: int = 1,
+    ):
+        self.kb = kb if kb is not None else KnowledgeBase()
+        self.engine = LogicalEngine(self.kb)
+        self.engine.max_clauses = max_clauses
+        # Предельное время доказательства по умолчанию (в секундах)
+        self.timeout = timeout
+        # Радиус окрестности теоремы по умолчанию (None - вся её компонента)
+        self.relevance_depth = relevance_depth
+        # Сколько строк загружаемого файла добавлять в базу знаний за раз
+        self.load_batch = 10_000
+        # Число процессов для разбора загружаемых файлов (1 - без пула)
+        self.load_workers = load_workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # Разбор строк запросов выполняется в потоке цикла событий
+        self.parse_cache = ParseCache(Lexer(), Parser([], flat=True))
+        # Изменения базы знаний и снятие её версий выполняются по очереди
+        self.lock = asyncio.Lock()
+        self.handlers = {
+            "add": self.cmd_add,
+            "remove": self.cmd_remove,
+            "load": self.cmd_load,
+            "?": self.cmd_prove,
+            "stats": self.cmd_stats,
+        }
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """Начать приём соединений по TCP (port=0 - любой свободный порт)"""
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def start_unix(self, path: str) -> asyncio.Server:
+        """Начать приём соединений через Unix-сокет"""
+        return await asyncio.start_unix_server(self.handle_client, path)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """Обслужить соединение: запросы выполняются по порядку"""
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                response = await self.handle_line(line)
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_line(self, line: bytes) -> dict:
+        """Выполнить строку запроса и вернуть ответ"""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Запрос должен быть объектом JSON")
+        except ValueError as e:
+            return {"seq": None, "ok": False, "error": describe_error(e)}
+
+        command = request.get("command")
+        response = {"seq": request.get("seq"), "command": command, "ok": True}
+        handler = self.handlers.get(command)
+        try:
+            if handler is None:
+                raise ValueError(f"Неизвестная команда: {command}")
+            response.update(await handler(request))
+        except Exception as e:
+            response.update(ok=False, error=describe_error(e))
+        return response
+
+    async def run(self, function, *args):
+        """Выполнить функцию в пуле потоков"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, function, *args
+        )
+
+    async def cmd_add(self, request: dict) -> dict:
+        """Добавить высказывание или аксиому"""
+        expression = self.parse_cache.parse(str(request.get("input", "")))
+        if is_axiom(expression):
+            clauses = await self.run(LogicalEngine.to_clauses, expression)
+            async with self.lock:
+                axiom = self.kb.add_axiom(expression)
+                self.kb.set_clauses(axiom.id, clauses)
+            return {"kind": "axiom", "id": axiom.id, "clauses": len(clauses)}
+        if not isinstance(expression, Variable):
+            raise ValueError("Высказывание должно быть простым идентификатором")
+        async with self.lock:
+            statement = self.kb.add_statement(expression.name)
+        return {"kind": "statement", "id": statement.id}
+
+    async def cmd_remove(self, request: dict) -> dict:
+        """Удалить аксиому по ID"""
+        axiom_id = int(request.get("input"))
+        async with self.lock:
+            removed = self.kb.remove_axiom(axiom_id)
+        if not removed:
+            raise ValueError(f"Аксиома с ID {axiom_id} не найдена")
+        return {"id": axiom_id}
+
+    async def cmd_load(self, request: dict) -> dict:
+        """Загрузить файл с высказываниями и аксиомами
+
+        Файл читается построчно (SourceReader) пачками по load_batch строк,
+        в памяти одновременно только несколько пачек. Пачки разбираются и
+        компилируются в пуле потоков, а при load_workers > 1 - в пуле
+        процессов (как в REPL), и добавляются в базу знаний в порядке строк
+        файла; между пачками выполняются другие запросы. Команды и теоремы
+        в файле пропускаются.
+        """
+        filename = str(request.get("input", ""))
+        loop = asyncio.get_running_loop()
+        counts = {"statements": 0, "axioms": 0}
+        errors = []
+        with open(filename, "r", encoding="utf-8") as f, ExitStack() as stack:
+            reader = SourceReader(f)
+            lines = iter(reader)
+            executor = None
+            if self.load_workers > 1:
+                executor = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=self.load_workers)
+                )
+            cache = ParseCache(Lexer(), Parser([], flat=True))
+            # Без пула процессов пачка добавляется сразу после разбора
+            limit = 2 * self.load_workers if executor is not None else 0
+            pending = deque()
+            while chunk := await self.run(read_chunk, lines, self.load_batch):
+                if executor is None:
+                    future = loop.run_in_executor(
+                        self.executor, compile_chunk, chunk, cache
+                    )
+                else:
+                    future = loop.run_in_executor(executor, compile_chunk, chunk)
+                pending.append(future)
+                while len(pending) > limit:
+                    await self.add_entries(await pending.popleft(), counts, errors)
+            while pending:
+                await self.add_entries(await pending.popleft(), counts, errors)
+        return {"file": filename, "lines": reader.line_num, **counts, "errors": errors}
+
+    async def add_entries(self, batch: list[LoadEntry], counts: dict, errors: list):
+        """Добавить пачку разобранных строк файла и учесть её в ответе"""
+        async with self.lock:
+            added = await self.run(self.load_entries, batch)
+        for item in added:
+            counts["statements" if isinstance(item, Statement) else "axioms"] += 1
+        errors.extend(
+            {"line": entry.line_num, "error": describe_error(entry.error)}
+            for entry in batch
+            if entry.error is not None
+        )
+
+    def load_entries(self, batch: list[LoadEntry]) -> list:
+        """Добавить разобранные строки файла в базу знаний вместе с КНФ"""
+        compiled = [entry for entry in batch if entry.error is None]
+        added = self.kb.bulk_load(entry.expression for entry in compiled)
+        for entry, item in zip(compiled, added):
+            if entry.clauses is not None:
+                self.kb.set_clauses(item.id, entry.clauses)
+        return added
+
+    async def cmd_prove(self, request: dict) -> dict:
+        """Доказать теорему на текущей версии базы знаний"""
+        started = time.perf_counter()
+        expression = self.parse_cache.parse(str(request.get("input", "")))
+        parsed = time.perf_counter()
+        timeout = request.get("timeout", self.timeout)
+        depth = request.get("relevance_depth", self.relevance_depth)
+        context = QueryContext()
+        if timeout is not None:
+            context.deadline = started + float(timeout)
+        async with self.lock:
+            engine = self.engine.snapshot()
+        verdict = await self.run(
+            engine.resolution_method,
+            expression,
+            None if depth is None else int(depth),
+            context,
+        )
+        self.engine.adopt_verdicts(engine)
+        trace = context.trace
+        return {
+            "verdict": verdict_name(verdict, context),
+            "timings": {"parse": parsed - started, **context.timings},
+            "clauses": {
+                "input": trace.input_count - context.lemmas,
+                "lemmas": context.lemmas,
+                "derived": len(trace) - trace.input_count,
+                "deleted": context.deleted,
+            },
+            "cached": context.cached,
+        }
+
+    async def cmd_stats(self, request: dict) -> dict:
+        """Статистика кэша результатов и кэша разбора"""
+        return {
+            "result_cache": self.engine.result_cache.stats(),
+            "parse_cache": self.parse_cache.stats(),
+        }
+
+
+def read_chunk(lines: Iterator[tuple[int, str]], size: int) -> list[tuple[int, str]]:
+    """Следующие size строк файла с высказываниями и аксиомами (номер, строка)"""
+    chunk = []
+    for line_num, line in lines:
+        if is_command(line):
+            continue
+        chunk.append((line_num, line))
+        if len(chunk) >= size:
+            break
+    return chunk
+
+
+def describe_error(error: Exception) -> dict:
+    """Описание ошибки для ответа сервера"""
+    if isinstance(error, QueryTimeout):
+        return {"type": "timeout", "message": str(error), "position": None}
+    return REPL.describe_error(error)
+
+
+async def serve(args: argparse.Namespace):
+    """Запустить сервер и обслуживать соединения до остановки процесса"""
+    kb = KnowledgeBase.load(args.restore) if args.restore else None
+    server = QueryServer(
+        kb,
+        workers=args.workers,
+        timeout=args.timeout,
+        max_clauses=args.max_clauses or None,
+        relevance_depth=args.relevance_depth,
+        load_workers=args.load_workers,
+    )
+    if args.unix:
+        listener = await server.start_unix(args.unix)
+    else:
+        listener = await server.start_tcp(args.host, args.port)
+    for sock in listener.sockets:
+        print(f"Сервер слушает {sock.getsockname()}", file=sys.stderr)
+    try:
+        # Ход доказательств на экран не выводится
+        with redirect_stdout(None):
+            async with listener:
+                await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    """Точка входа сервера"""
+    arg_parser = argparse.ArgumentParser(description="Сервер запросов к базе знаний")
+    arg_parser.add_argument("--host", default="127.0.0.1", help="адрес для TCP")
+    arg_parser.add_argument("--port", type=int, default=8765, help="порт для TCP")
+    arg_parser.add_argument("--unix", metavar="PATH", help="слушать Unix-сокет")
+    arg_parser.add_argument(
+        "--restore", metavar="PATH", help="начать со снимка базы знаний"
+    )
+    arg_parser.add_argument(
+        "--workers", type=int, default=4, help="число потоков для доказательств"
+    )
+    arg_parser.add_argument(
+        "--load-workers",
+        type=int,
+        default=1,
+        help="число процессов для разбора загружаемых файлов",
+    )
+    arg_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="предельное время доказательства в секундах",
+    )
+    arg_parser.add_argument(
+        "--max-clauses",
+        type=int,
+        default=500_000,
+        help="сколько резольвент хранить при доказательстве (0 - без ограничения)",
+    )
+    arg_parser.add_argument(
+        "--relevance-depth",
+        type=int,
+        metavar="N",
+        help="доказывать только по аксиомам не дальше N шагов от высказываний "
+        "теоремы (быстрее, но полнота не гарантируется)",
+    )
+    try:
+        asyncio.run(serve(arg_parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
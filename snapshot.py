@@ -0,0 +1,364 @@
+"""Двоичный снимок скомпилированной базы знаний
+
+Формат (все числа - little-endian):
+
+    заголовок   MAGIC, версия (uint32), число разделов (uint32)
+    таблица     для каждого раздела смещение и длина в байтах (uint64, uint64)
+    разделы     выровнены по 8 байт
+
+Разделы:
+
+    STRING_OFFSETS  int32[n + 1]   границы строк в STRING_DATA
+    STRING_DATA     bytes          строки в UTF-8: имена и описания
+    STATEMENTS      int32[3 * k]   (ID, номер имени, номер описания или -1)
+    AXIOMS          int32[6 * m]   (ID, начало и конец в EXPRESSIONS, описание,
+                                   начало и конец в AXIOM_SYMBOLS)
+    EXPRESSIONS     int32[]        выражения аксиом в постфиксной записи
+    SYMBOLS         int32[3 * s]   обратный индекс: (номер имени, начало и
+                                   конец в SYMBOL_AXIOMS)
+    AXIOM_SYMBOLS   int32[]        номера имён высказываний каждой аксиомы
+    SYMBOL_AXIOMS   int32[]        вхождения высказывания в аксиомы: 2 * ID
+                                   аксиомы + 1, если вхождение отрицательное
+    CLAUSE_INDEX    int32[3 * c]   (ID аксиомы, первый дизъюнкт, следующий за
+                                   последним), по возрастанию ID
+    CLAUSE_LITERALS int32[]        литералы дизъюнктов
+    CLAUSE_OFFSETS  int32[d + 1]   границы дизъюнктов в CLAUSE_LITERALS
+    CLAUSE_KINDS    bytes[d]       1 - одиночный литерал вне дизъюнкта
+    COUNTERS        int32[2]       следующие ID высказывания и аксиомы
+
+Номера имён совпадают с номерами в таблице имён базы знаний.
+
+Выражение: номер имени (>= 0) - переменная; отрицательный код операции,
+за которым следует число операндов, - операция над последними операндами.
+Разделы CLAUSE_* - массивы хранилища дизъюнктов (clause_arena.ClauseArena).
+
+Файл читается через mmap: разделы используются как memoryview без
+копирования, в том числе как массивы хранилища дизъюнктов. Выражения и
+дизъюнкты аксиом разбираются только при обращении к ним, а обратный
+индекс и высказывания аксиом не строятся заново по выражениям.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Mapping, Optional
+
+from clause_arena import ClauseArena
+from lexer import SymbolTable
+from models import (
+    Conjunction,
+    Disjunction,
+    Equivalence,
+    Implication,
+    Negation,
+    Operation,
+    Predicate,
+    Variable,
+)
+
+
+MAGIC = b"SHLDNKB\0"
+VERSION = 4
+
+HEADER = struct.Struct("<8sII")
+SECTION = struct.Struct("<QQ")
+
+(
+    STRING_OFFSETS,
+    STRING_DATA,
+    STATEMENTS,
+    AXIOMS,
+    EXPRESSIONS,
+    SYMBOLS,
+    AXIOM_SYMBOLS,
+    SYMBOL_AXIOMS,
+    CLAUSE_INDEX,
+    CLAUSE_LITERALS,
+    CLAUSE_OFFSETS,
+    CLAUSE_KINDS,
+    COUNTERS,
+) = range(13)
+SECTION_COUNT = 13
+# Разделы, которые не являются массивами int32
+BYTE_SECTIONS = (STRING_DATA, CLAUSE_KINDS)
+
+OPERATION_CODES = {
+    Negation: -1,
+    Conjunction: -2,
+    Disjunction: -3,
+    Implication: -4,
+    Equivalence: -5,
+}
+OPERATION_TYPES = {code: node_class for node_class, code in OPERATION_CODES.items()}
+
+class SnapshotError(Exception):
+    """Ошибка чтения или записи снимка"""
+
+
+@dataclass
+class SnapshotData:
+    """Содержимое снимка, прочитанное из файла"""
+    names: list[str]
+    # (ID, имя, описание)
+    statements: list[tuple[int, str, Optional[str]]]
+    # (ID, выражение в постфиксной записи, описание, высказывания аксиомы)
+    axioms: list[tuple[int, memoryview, Optional[str], tuple[str, ...]]]
+    # Обратный индекс в виде KnowledgeBase._positive_axioms и _negative_axioms
+    positive_axioms: dict[str, set[int]]
+    negative_axioms: dict[str, set[int]]
+    clauses: ClauseArena
+    next_statement_id: int
+    next_axiom_id: int
+
+
+def encode_expression(
+    expression: Operation | Predicate, symbols: SymbolTable, out: array
+):
+    """Записать выражение в постфиксной записи (без рекурсии)"""
+    stack = [(expression, False)]
+    while stack:
+        node, visited = stack.pop()
+        if type(node) is Variable:
+            out.append(symbols.add(node.name))
+            continue
+        code = OPERATION_CODES.get(type(node))
+        if code is None:
+            raise SnapshotError(f"Выражение не может быть сохранено: {node!r}")
+        if visited:
+            out.append(code)
+            out.append(len(node.children))
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+
+
+def decode_expression(data: Iterable[int], names: list[str]) -> Operation | Predicate:
+    """Восстановить выражение из постфиксной записи"""
+    stack = []
+    values = iter(data)
+    for value in values:
+        if value >= 0:
+            stack.append(Variable(names[value]))
+            continue
+        arity = next(values)
+        node_class = OPERATION_TYPES[value]
+        if node_class is Negation:
+            stack[-1] = Negation(stack[-1])
+            continue
+        children = tuple(stack[-arity:])
+        del stack[-arity:]
+        stack.append(node_class(children))
+    return stack[0]
+
+
+def write_snapshot(
+    path: str,
+    statements: Iterable,
+    axioms: Iterable,
+    axiom_symbols: Mapping[int, Iterable[str]],
+    positive_axioms: Mapping[str, Iterable[int]],
+    negative_axioms: Mapping[str, Iterable[int]],
+    clauses: ClauseArena,
+    names: list[str],
+    next_statement_id: int,
+    next_axiom_id: int,
+):
+    """Записать снимок базы знаний
+
+    statements и axioms - объекты с полями id, name/expression и description,
+    axiom_symbols - высказывания каждой аксиомы по её ID, positive_axioms и
+    negative_axioms - ID аксиом с положительными и отрицательными
+    вхождениями каждого высказывания, clauses - хранилище дизъюнктов,
+    упорядоченное по ID аксиом (ClauseArena.compacted), names - таблица
+    имён, на номера в которой ссылаются его литералы.
+    Файл записывается во временный и затем подменяется, поэтому
+    отображённый в память прежний снимок по тому же пути остаётся корректным.
+    """
+    symbols = SymbolTable()
+    for name in names:
+        symbols.add(name)
+
+    def string_id(value: Optional[str]) -> int:
+        return -1 if value is None else symbols.add(value)
+
+    statement_data = array("i")
+    for statement in statements:
+        statement_data.extend(
+            (statement.id, string_id(statement.name), string_id(statement.description))
+        )
+
+    axiom_data = array("i")
+    expressions = array("i")
+    axiom_symbol_data = array("i")
+    for axiom in axioms:
+        start = len(expressions)
+        encode_expression(axiom.expression, symbols, expressions)
+        symbols_start = len(axiom_symbol_data)
+        axiom_symbol_data.extend(symbols.add(name) for name in axiom_symbols[axiom.id])
+        axiom_data.extend(
+            (
+                axiom.id,
+                start,
+                len(expressions),
+                string_id(axiom.description),
+                symbols_start,
+                len(axiom_symbol_data),
+            )
+        )
+
+    symbol_data = array("i")
+    symbol_axiom_data = array("i")
+    for name in sorted(positive_axioms.keys() | negative_axioms.keys()):
+        axioms_start = len(symbol_axiom_data)
+        occurrences = [2 * axiom_id for axiom_id in positive_axioms.get(name, ())]
+        occurrences.extend(2 * axiom_id + 1 for axiom_id in negative_axioms.get(name, ()))
+        symbol_axiom_data.extend(sorted(occurrences))
+        symbol_data.extend((symbols.add(name), axioms_start, len(symbol_axiom_data)))
+
+    clause_index = array("i")
+    for axiom_id in sorted(clauses.owners()):
+        clause_index.extend((axiom_id, *clauses.bounds(axiom_id)))
+
+    encoded = [name.encode("utf-8") for name in symbols.names]
+    string_offsets = array("i", [0])
+    for name in encoded:
+        string_offsets.append(string_offsets[-1] + len(name))
+
+    sections = [None] * SECTION_COUNT
+    sections[STRING_OFFSETS] = string_offsets
+    sections[STRING_DATA] = b"".join(encoded)
+    sections[STATEMENTS] = statement_data
+    sections[AXIOMS] = axiom_data
+    sections[EXPRESSIONS] = expressions
+    sections[SYMBOLS] = symbol_data
+    sections[AXIOM_SYMBOLS] = axiom_symbol_data
+    sections[SYMBOL_AXIOMS] = symbol_axiom_data
+    sections[CLAUSE_INDEX] = clause_index
+    sections[CLAUSE_LITERALS] = clauses.literals
+    sections[CLAUSE_OFFSETS] = clauses.offsets
+    sections[CLAUSE_KINDS] = bytes(clauses.kinds)
+    sections[COUNTERS] = array("i", (next_statement_id, next_axiom_id))
+
+    payloads = []
+    for section in sections:
+        if isinstance(section, array) and sys.byteorder != "little":
+            section = array("i", section)
+            section.byteswap()
+        payloads.append(bytes(section))
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        offset = HEADER.size + SECTION.size * SECTION_COUNT
+        table = []
+        for payload in payloads:
+            offset = align(offset)
+            table.append((offset, len(payload)))
+            offset += len(payload)
+        f.write(HEADER.pack(MAGIC, VERSION, SECTION_COUNT))
+        for section_offset, length in table:
+            f.write(SECTION.pack(section_offset, length))
+        for (section_offset, _), payload in zip(table, payloads):
+            f.write(b"\0" * (section_offset - f.tell()))
+            f.write(payload)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path: str, symbols: Optional[SymbolTable] = None) -> SnapshotData:
+    """Прочитать снимок базы знаний
+
+    Имена заносятся в таблицу имён symbols, если она задана (например,
+    таблицу лексера), чтобы разобранные позже выражения использовали те же
+    строки.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            raise SnapshotError(f"Файл не является снимком базы знаний: {path}")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    magic, version, section_count = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError(f"Файл не является снимком базы знаний: {path}")
+    if version != VERSION or section_count != SECTION_COUNT:
+        raise SnapshotError(f"Неподдерживаемая версия снимка: {version}")
+
+    sections = []
+    for i in range(SECTION_COUNT):
+        offset, length = SECTION.unpack_from(view, HEADER.size + SECTION.size * i)
+        if offset + length > size:
+            raise SnapshotError(f"Снимок повреждён: {path}")
+        section = view[offset:offset + length]
+        if i not in BYTE_SECTIONS:
+            section = section.cast("i")
+            if sys.byteorder != "little":
+                swapped = array("i", section)
+                swapped.byteswap()
+                section = memoryview(swapped)
+        sections.append(section)
+
+    offsets, data = sections[STRING_OFFSETS], sections[STRING_DATA]
+    names = [
+        str(data[offsets[i]:offsets[i + 1]], "utf-8") for i in range(len(offsets) - 1)
+    ]
+    if symbols is not None:
+        names = [symbols.intern(name) for name in names]
+
+    def string(value: int) -> Optional[str]:
+        return None if value < 0 else names[value]
+
+    statement_data = sections[STATEMENTS]
+    statements = [
+        (statement_data[i], names[statement_data[i + 1]], string(statement_data[i + 2]))
+        for i in range(0, len(statement_data), 3)
+    ]
+
+    axiom_data, expressions = sections[AXIOMS], sections[EXPRESSIONS]
+    axiom_symbol_data = sections[AXIOM_SYMBOLS]
+    name_of = names.__getitem__
+    axioms = [
+        (
+            axiom_data[i],
+            expressions[axiom_data[i + 1]:axiom_data[i + 2]],
+            string(axiom_data[i + 3]),
+            tuple(map(name_of, axiom_symbol_data[axiom_data[i + 4]:axiom_data[i + 5]])),
+        )
+        for i in range(0, len(axiom_data), 6)
+    ]
+
+    symbol_data = sections[SYMBOLS]
+    symbol_axiom_data = sections[SYMBOL_AXIOMS]
+    positive_axioms = {}
+    negative_axioms = {}
+    for i in range(0, len(symbol_data), 3):
+        name = names[symbol_data[i]]
+        occurrences = symbol_axiom_data[symbol_data[i + 1]:symbol_data[i + 2]]
+        positive = {value >> 1 for value in occurrences if not value & 1}
+        if positive:
+            positive_axioms[name] = positive
+        if len(positive) < len(occurrences):
+            negative_axioms[name] = {value >> 1 for value in occurrences if value & 1}
+
+    next_statement_id, next_axiom_id = sections[COUNTERS]
+    return SnapshotData(
+        names=names,
+        statements=statements,
+        axioms=axioms,
+        positive_axioms=positive_axioms,
+        negative_axioms=negative_axioms,
+        clauses=ClauseArena(
+            sections[CLAUSE_LITERALS],
+            sections[CLAUSE_OFFSETS],
+            sections[CLAUSE_KINDS],
+            sections[CLAUSE_INDEX],
+        ),
+        next_statement_id=next_statement_id,
+        next_axiom_id=next_axiom_id,
+    )
+
+
+def align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
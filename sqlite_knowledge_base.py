@@ -0,0 +1,625 @@
+import sqlite3
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Optional
+
+from clause_arena import ClauseArena
+from knowledge_base import Axiom, Component, KnowledgeBase, Statement
+from lexer import SymbolTable
+from models import BOTH, NEGATIVE, POSITIVE, Operation, Predicate, Variable
+from snapshot import decode_expression, encode_expression, write_snapshot
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS statements (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS axioms (
+    id INTEGER PRIMARY KEY,
+    expression BLOB NOT NULL,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS axiom_symbols (
+    symbol_id INTEGER NOT NULL,
+    axiom_id INTEGER NOT NULL,
+    polarity INTEGER NOT NULL,
+    PRIMARY KEY (symbol_id, axiom_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS axiom_symbols_by_axiom ON axiom_symbols (axiom_id);
+CREATE TABLE IF NOT EXISTS clauses (
+    axiom_id INTEGER PRIMARY KEY,
+    literals BLOB NOT NULL,
+    offsets BLOB NOT NULL,
+    kinds BLOB NOT NULL
+);
+"""
+
+# Наибольшее число параметров в одном запросе с IN (...)
+CHUNK_SIZE = 500
+
+
+class SQLiteKnowledgeBase(KnowledgeBase):
+    """База знаний в файле SQLite (или в памяти при path=":memory:")
+
+    Аксиомы и высказывания ищутся по первичному ключу, аксиомы с данным
+    высказыванием - по индексу axiom_symbols, поэтому поиск и удаление не
+    требуют просмотра всей базы. Выражения хранятся в постфиксной записи
+    снимка (snapshot.encode_expression), КНФ аксиом - в виде массивов
+    ClauseArena. Номера имён в обоих случаях - номера таблицы symbols.
+    Каждое изменение фиксируется сразу, поэтому база сохраняется между
+    запусками. Файл базы открывается в режиме WAL: версии базы (snapshot)
+    читают его, пока база изменяется.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self._depth = 0
+        with self.transaction():
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                (
+                    ("next_statement_id", 1),
+                    ("next_axiom_id", 1),
+                    ("version", 0),
+                    ("generation", 0),
+                ),
+            )
+        self._read_symbols()
+        # Линия изменений (см. KnowledgeBase.lineage): номер версии хранится
+        # в файле, поэтому линия меняется, только если номер повторится
+        self.lineage = object()
+        # Части базы последней версии, для которой они запрашивались
+        self._components_cache: tuple[int, list[Component]] = (-1, [])
+        self.statements = StatementView(self)
+        self.axioms = AxiomView(self)
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """Транзакция, фиксируемая при выходе из внешнего блока
+
+        Вложенные блоки (например, add_axiom внутри batch) отдельно не
+        фиксируются.
+        """
+        if self._depth:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        self._depth = 1
+        try:
+            with self.connection:
+                yield
+        except BaseException:
+            # Имена, добавленные в отменённой транзакции, забываются, а
+            # номер версии повторится с другим содержимым - в новой линии
+            self._read_symbols()
+            self._components_cache = (-1, [])
+            self.lineage = object()
+            raise
+        finally:
+            self._depth = 0
+
+    def batch(self):
+        """Выполнить серию изменений одной транзакцией"""
+        return self.transaction()
+
+    @property
+    def version(self) -> int:
+        """Номер версии: увеличивается при каждом изменении высказываний и аксиом"""
+        return self._peek_id("version")
+
+    def snapshot(self) -> "SQLiteSnapshot":
+        """Версия базы только для чтения (см. SQLiteSnapshot)
+
+        Версия видит последнее зафиксированное состояние файла: изменения
+        незавершённого batch в неё не попадают.
+        """
+        if self.path == ":memory:":
+            raise ValueError(
+                "Версии базы SQLite в памяти не поддерживаются: второе "
+                "соединение её не видит"
+            )
+        copy = SQLiteSnapshot(self.path)
+        copy.lineage = self.lineage
+        return copy
+
+    def add_statement(self, name: str, description: str = None) -> Statement:
+        """Добавить высказывание в алфавит"""
+        with self.transaction():
+            return self._add_statement(name, description)
+
+    def add_axiom(self, expression: Operation, description: str = None) -> Axiom:
+        """Добавить аксиому"""
+        with self.transaction():
+            return self._add_axiom(expression, description)
+
+    def bulk_load(
+        self, expressions: Iterable[Operation | Predicate]
+    ) -> list[Statement | Axiom]:
+        """Добавить набор высказываний и аксиом одной транзакцией"""
+        entries = []
+        with self.transaction():
+            for expression in expressions:
+                if isinstance(expression, Variable):
+                    entries.append(self._add_statement(expression.name, None))
+                else:
+                    entries.append(self._add_axiom(expression, None))
+        return entries
+
+    def _add_statement(self, name: str, description: Optional[str]) -> Statement:
+        statement = self.get_statement(name)
+        if statement is not None:
+            return statement
+        statement = Statement(self._next_id("next_statement_id"), name, description)
+        self._next_id("version")
+        self.connection.execute(
+            "INSERT INTO statements (id, name, description) VALUES (?, ?, ?)",
+            (statement.id, name, description),
+        )
+        return statement
+
+    def _add_axiom(self, expression: Operation, description: Optional[str]) -> Axiom:
+        axiom = Axiom(self._next_id("next_axiom_id"), expression, description)
+        self._next_id("version")
+        encoded = array("i")
+        encode_expression(expression, self.symbols, encoded)
+        polarities = {
+            self.symbols.add(name): polarity
+            for name, polarity in expression.polarities().items()
+        }
+        self._store_symbols()
+        self.connection.execute(
+            "INSERT INTO axioms (id, expression, description) VALUES (?, ?, ?)",
+            (axiom.id, encoded.tobytes(), description),
+        )
+        self.connection.executemany(
+            "INSERT INTO axiom_symbols (symbol_id, axiom_id, polarity) VALUES (?, ?, ?)",
+            ((symbol_id, axiom.id, polarity) for symbol_id, polarity in polarities.items()),
+        )
+        return axiom
+
+    def remove_axiom(self, axiom_id: int) -> bool:
+        """Удалить аксиому по ID"""
+        with self.transaction():
+            removed = self.connection.execute(
+                "DELETE FROM axioms WHERE id = ?", (axiom_id,)
+            ).rowcount
+            self.connection.execute(
+                "DELETE FROM axiom_symbols WHERE axiom_id = ?", (axiom_id,)
+            )
+            self.connection.execute("DELETE FROM clauses WHERE axiom_id = ?", (axiom_id,))
+            if removed:
+                self._next_id("version")
+        return removed > 0
+
+    def get_clauses(self, axiom_id: int) -> Optional[list[Operation | Predicate]]:
+        """Дизъюнкты КНФ аксиомы или None, если аксиома ещё не скомпилирована"""
+        arena = self._load_clauses(axiom_id)
+        return None if arena is None else arena.get(0, self.symbols.names)
+
+    def get_clause_literals(self, axiom_id: int) -> Optional[list]:
+        """Дизъюнкты КНФ аксиомы в виде номеров литералов (см. ClauseArena)"""
+        arena = self._load_clauses(axiom_id)
+        return None if arena is None else arena.clause_literals(0)
+
+    def is_compiled(self, axiom_id: int) -> bool:
+        """Построена ли КНФ аксиомы (без чтения дизъюнктов)"""
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM clauses WHERE axiom_id = ?", (axiom_id,)
+            ).fetchone()
+            is not None
+        )
+
+    def set_clauses(self, axiom_id: int, clauses: list[Operation | Predicate]):
+        """Сохранить дизъюнкты КНФ аксиомы"""
+        # Дизъюнкты каждой аксиомы лежат в отдельной строке таблицы, поэтому
+        # во временном хранилище у аксиомы всегда номер 0
+        arena = ClauseArena()
+        arena.add(0, clauses, self.symbols)
+        with self.transaction():
+            self._store_symbols()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO clauses (axiom_id, literals, offsets, kinds)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    axiom_id,
+                    arena.literals.tobytes(),
+                    arena.offsets.tobytes(),
+                    bytes(arena.kinds),
+                ),
+            )
+
+    def _load_clauses(self, axiom_id: int) -> Optional[ClauseArena]:
+        row = self.connection.execute(
+            "SELECT literals, offsets, kinds FROM clauses WHERE axiom_id = ?",
+            (axiom_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        literals, offsets, kinds = row
+        offsets = memoryview(offsets).cast("i")
+        return ClauseArena(
+            memoryview(literals).cast("i"),
+            offsets,
+            kinds,
+            (0, 0, len(offsets) - 1),
+        )
+
+    def save(self, path: str):
+        """Сохранить базу знаний и КНФ скомпилированных аксиом в снимок"""
+        axioms = self.get_all_axioms()
+        # Высказывания аксиом и обратный индекс строятся так же, как в базе
+        # в памяти
+        index = KnowledgeBase()
+        index._link_axioms(axioms)
+        clauses = ClauseArena()
+        for axiom in axioms:
+            arena = self._load_clauses(axiom.id)
+            if arena is not None:
+                clauses.copy(axiom.id, arena, source_id=0)
+        write_snapshot(
+            path,
+            self.get_all_statements(),
+            axioms,
+            index._axiom_symbols,
+            index._positive_axioms,
+            index._negative_axioms,
+            clauses,
+            self.symbols.names,
+            self._peek_id("next_statement_id"),
+            self._peek_id("next_axiom_id"),
+        )
+
+    def get_neighbours(self, name: str) -> set[str]:
+        """Высказывания, встречающиеся в одной аксиоме с данным"""
+        symbol_id = self.symbols.ids.get(name)
+        if symbol_id is None:
+            return set()
+        rows = self.connection.execute(
+            "SELECT DISTINCT other.symbol_id FROM axiom_symbols AS own"
+            " JOIN axiom_symbols AS other ON other.axiom_id = own.axiom_id"
+            " WHERE own.symbol_id = ? AND other.symbol_id != own.symbol_id",
+            (symbol_id,),
+        )
+        return {self.symbols.name(other_id) for (other_id,) in rows}
+
+    def relevant_symbols(
+        self, symbols: Iterable[str], depth: Optional[int] = None
+    ) -> set[str]:
+        """Высказывания, достижимые из данных не более чем за depth шагов"""
+        reached = set(symbols)
+        frontier = deque((symbol, 0) for symbol in reached)
+        while frontier:
+            symbol, distance = frontier.popleft()
+            if depth is not None and distance >= depth:
+                continue
+            for neighbour in self.get_neighbours(symbol):
+                if neighbour not in reached:
+                    reached.add(neighbour)
+                    frontier.append((neighbour, distance + 1))
+        return reached
+
+    def get_axiom_ids(self, name: str, positive: Optional[bool] = None) -> set[int]:
+        """ID аксиом, в которые входит высказывание (см. KnowledgeBase)"""
+        symbol_id = self.symbols.ids.get(name)
+        if symbol_id is None:
+            return set()
+        mask = BOTH if positive is None else POSITIVE if positive else NEGATIVE
+        return {
+            axiom_id
+            for (axiom_id,) in self.connection.execute(
+                "SELECT axiom_id FROM axiom_symbols WHERE symbol_id = ? AND polarity & ?",
+                (symbol_id, mask),
+            )
+        }
+
+    def get_occurrences(self, name: str) -> tuple[list[Axiom], list[Axiom]]:
+        """Аксиомы с положительными и с отрицательными вхождениями высказывания"""
+        return (
+            [self.get_axiom(i) for i in sorted(self.get_axiom_ids(name, True))],
+            [self.get_axiom(i) for i in sorted(self.get_axiom_ids(name, False))],
+        )
+
+    def get_axioms_with_symbols(self, symbols: Iterable[str]) -> list[Axiom]:
+        """Аксиомы, в которые входит хотя бы одно из высказываний"""
+        symbol_ids = [self.symbols.ids[name] for name in symbols if name in self.symbols]
+        axiom_ids = set()
+        for chunk in chunks(symbol_ids):
+            axiom_ids.update(
+                axiom_id
+                for (axiom_id,) in self.connection.execute(
+                    "SELECT axiom_id FROM axiom_symbols"
+                    f" WHERE symbol_id IN ({placeholders(chunk)})",
+                    chunk,
+                )
+            )
+        return self._get_axioms(axiom_ids)
+
+    def _get_axioms(self, axiom_ids: Iterable[int]) -> list[Axiom]:
+        """Аксиомы с данными ID по возрастанию ID"""
+        axioms = []
+        for chunk in chunks(sorted(axiom_ids)):
+            axioms.extend(
+                self._axiom(row)
+                for row in self.connection.execute(
+                    "SELECT id, expression, description FROM axioms"
+                    f" WHERE id IN ({placeholders(chunk)}) ORDER BY id",
+                    chunk,
+                )
+            )
+        return axioms
+
+    def components(self) -> Iterator[Component]:
+        """Независимые части базы знаний (см. KnowledgeBase)
+
+        Части строятся заново одним проходом по таблице axiom_symbols, но
+        не чаще одного раза на версию базы. Ключ части - ID её аксиом и
+        высказываний алфавита и номер очистки базы (ID после clear
+        выдаются заново).
+        """
+        version = self.version
+        if self._components_cache[0] != version:
+            self._components_cache = (version, self._build_components())
+        return iter(self._components_cache[1])
+
+    def component_axioms(self, component: Component) -> list[Axiom]:
+        """Аксиомы части базы знаний"""
+        return self._get_axioms(component.axiom_ids)
+
+    def component_statements(self, component: Component) -> list[Statement]:
+        """Высказывания алфавита, входящие в часть базы знаний"""
+        return self.get_statements_with_symbols(component.symbols)
+
+    def _build_components(self) -> list[Component]:
+        parent: dict[int, int] = {}
+
+        def find(symbol_id: int) -> int:
+            root = symbol_id
+            while parent.setdefault(root, root) != root:
+                root = parent[root]
+            while parent[symbol_id] != root:
+                parent[symbol_id], symbol_id = root, parent[symbol_id]
+            return root
+
+        axiom_symbol: dict[int, int] = {}
+        for symbol_id, axiom_id in self.connection.execute(
+            "SELECT symbol_id, axiom_id FROM axiom_symbols ORDER BY axiom_id"
+        ):
+            first = axiom_symbol.setdefault(axiom_id, symbol_id)
+            parent[find(symbol_id)] = find(first)
+
+        # Корень части -> ID аксиом, ID высказываний алфавита и высказывания части
+        parts: dict[int, tuple[list[int], list[int], set[str]]] = {}
+        for symbol_id in parent:
+            parts.setdefault(find(symbol_id), ([], [], set()))[2].add(
+                self.symbols.name(symbol_id)
+            )
+        for axiom_id, symbol_id in axiom_symbol.items():
+            parts[find(symbol_id)][0].append(axiom_id)
+        for statement_id, name in self.connection.execute(
+            "SELECT id, name FROM statements"
+        ):
+            symbol_id = self.symbols.ids.get(name)
+            if symbol_id is None or symbol_id not in parent:
+                parts[-len(parts) - 1] = ([], [statement_id], {name})
+            else:
+                parts[find(symbol_id)][1].append(statement_id)
+        generation = self._peek_id("generation")
+        components = []
+        for root, (axiom_ids, statement_ids, names) in parts.items():
+            axiom_ids = frozenset(axiom_ids)
+            # Аксиомы и высказывания не изменяются, а их ID не повторяются до
+            # очистки базы, поэтому ID задают содержимое части
+            key = (generation, axiom_ids, frozenset(statement_ids))
+            components.append(Component(root, key, frozenset(names), axiom_ids))
+        return components
+
+    def get_statements_with_symbols(self, symbols: Iterable[str]) -> list[Statement]:
+        """Высказывания алфавита из заданного множества имён"""
+        statements = []
+        for chunk in chunks(list(set(symbols))):
+            statements.extend(
+                Statement(*row)
+                for row in self.connection.execute(
+                    "SELECT id, name, description FROM statements"
+                    f" WHERE name IN ({placeholders(chunk)})",
+                    chunk,
+                )
+            )
+        return sorted(statements, key=lambda statement: statement.id)
+
+    def get_statement(self, name: str) -> Optional[Statement]:
+        """Получить высказывание по имени"""
+        row = self.connection.execute(
+            "SELECT id, name, description FROM statements WHERE name = ?", (name,)
+        ).fetchone()
+        return None if row is None else Statement(*row)
+
+    def get_axiom(self, axiom_id: int) -> Optional[Axiom]:
+        """Получить аксиому по ID"""
+        row = self.connection.execute(
+            "SELECT id, expression, description FROM axioms WHERE id = ?", (axiom_id,)
+        ).fetchone()
+        return None if row is None else self._axiom(row)
+
+    def get_all_statements(self) -> list[Statement]:
+        """Получить все высказывания"""
+        return [
+            Statement(*row)
+            for row in self.connection.execute(
+                "SELECT id, name, description FROM statements ORDER BY id"
+            )
+        ]
+
+    def get_all_axioms(self) -> list[Axiom]:
+        """Получить все аксиомы"""
+        return [
+            self._axiom(row)
+            for row in self.connection.execute(
+                "SELECT id, expression, description FROM axioms ORDER BY id"
+            )
+        ]
+
+    def clear(self):
+        """Очистить базу знаний"""
+        with self.transaction():
+            for table in ("statements", "axioms", "axiom_symbols", "clauses"):
+                self.connection.execute(f"DELETE FROM {table}")
+            self.connection.execute(
+                "UPDATE meta SET value = 1 WHERE key IN ('next_statement_id', 'next_axiom_id')"
+            )
+            self._next_id("version")
+            self._next_id("generation")
+
+    def _axiom(self, row: tuple) -> Axiom:
+        axiom_id, expression, description = row
+        encoded = memoryview(expression).cast("i")
+        return Axiom(axiom_id, decode_expression(encoded, self.symbols.names), description)
+
+    def _read_symbols(self):
+        self.symbols = SymbolTable.from_names(
+            name for (name,) in self.connection.execute("SELECT name FROM symbols ORDER BY id")
+        )
+        self._stored_symbols = len(self.symbols)
+
+    def _store_symbols(self):
+        """Записать в таблицу symbols имена, добавленные в таблицу имён"""
+        start = self._stored_symbols
+        self.connection.executemany(
+            "INSERT INTO symbols (id, name) VALUES (?, ?)",
+            enumerate(self.symbols.names[start:], start),
+        )
+        self._stored_symbols = len(self.symbols)
+
+    def _peek_id(self, key: str) -> int:
+        return self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()[0]
+
+    def _next_id(self, key: str) -> int:
+        value = self._peek_id(key)
+        self.connection.execute("UPDATE meta SET value = ? WHERE key = ?", (value + 1, key))
+        return value
+
+
+class SQLiteSnapshot(SQLiteKnowledgeBase):
+    """Версия базы SQLite только для чтения
+
+    Отдельное соединение держит открытой транзакцию чтения: в режиме WAL
+    она видит файл таким, каким он был в её начале, пока основное
+    соединение фиксирует изменения. Соединение можно передать в другой
+    поток. КНФ аксиом, построенная на версии, хранится в памяти (clauses).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("BEGIN")
+        self._depth = 0
+        # Первое чтение закрепляет версию
+        self._read_symbols()
+        self.lineage = object()
+        self._components_cache = (-1, [])
+        self.statements = StatementView(self)
+        self.axioms = AxiomView(self)
+        self.clauses = ClauseArena()
+
+    @contextmanager
+    def transaction(self):
+        raise ValueError("Версия базы SQLite доступна только для чтения")
+        yield
+
+    def snapshot(self) -> "SQLiteSnapshot":
+        """Версия не меняется, поэтому её версия - она сама"""
+        return self
+
+    def get_clauses(self, axiom_id: int) -> Optional[list[Operation | Predicate]]:
+        if axiom_id in self.clauses:
+            return self.clauses.get(axiom_id, self.symbols.names)
+        return super().get_clauses(axiom_id)
+
+    def get_clause_literals(self, axiom_id: int) -> Optional[list]:
+        if axiom_id in self.clauses:
+            return self.clauses.clause_literals(axiom_id)
+        return super().get_clause_literals(axiom_id)
+
+    def is_compiled(self, axiom_id: int) -> bool:
+        return axiom_id in self.clauses or super().is_compiled(axiom_id)
+
+    def set_clauses(self, axiom_id: int, clauses: list[Operation | Predicate]):
+        """Сохранить дизъюнкты КНФ аксиомы в памяти версии"""
+        self.clauses.remove(axiom_id)
+        self.clauses.add(axiom_id, clauses, self.symbols)
+
+
+class StatementView(Mapping):
+    """Высказывания базы SQLite по имени (как KnowledgeBase.statements)"""
+
+    def __init__(self, kb: SQLiteKnowledgeBase):
+        self.kb = kb
+
+    def __getitem__(self, name: str) -> Statement:
+        statement = self.kb.get_statement(name)
+        if statement is None:
+            raise KeyError(name)
+        return statement
+
+    def __iter__(self) -> Iterator[str]:
+        for (name,) in self.kb.connection.execute("SELECT name FROM statements ORDER BY id"):
+            yield name
+
+    def __len__(self):
+        return self.kb.connection.execute("SELECT COUNT(*) FROM statements").fetchone()[0]
+
+
+class AxiomView(Mapping):
+    """Аксиомы базы SQLite по ID (как KnowledgeBase.axioms)"""
+
+    def __init__(self, kb: SQLiteKnowledgeBase):
+        self.kb = kb
+
+    def __getitem__(self, axiom_id: int) -> Axiom:
+        axiom = self.kb.get_axiom(axiom_id)
+        if axiom is None:
+            raise KeyError(axiom_id)
+        return axiom
+
+    def __iter__(self) -> Iterator[int]:
+        for (axiom_id,) in self.kb.connection.execute("SELECT id FROM axioms ORDER BY id"):
+            yield axiom_id
+
+    def __len__(self):
+        return self.kb.connection.execute("SELECT COUNT(*) FROM axioms").fetchone()[0]
+
+
+def chunks(values: list) -> Iterator[list]:
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+def placeholders(values: list) -> str:
+    return ", ".join("?" * len(values))
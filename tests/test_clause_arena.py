@@ -0,0 +1,105 @@
+from array import array
+
+import pytest
+
+from clause_arena import ClauseArena
+from lexer import SymbolTable
+from models import Disjunct, Negation, Variable
+
+
+def test_clause_arena():
+    symbols = SymbolTable()
+    arena = ClauseArena()
+    clauses = [
+        Disjunct(predicates=[Variable("a"), Negation(Variable("b"))]),
+        Negation(Variable("c")),
+    ]
+    arena.add(1, clauses, symbols)
+    arena.add(3, [Variable("b")], symbols)
+    arena.add(4, [], symbols)
+
+    assert [str(c) for c in arena.get(1, symbols.names)] == [str(c) for c in clauses]
+    assert type(arena.get(1, symbols.names)[1]) is Negation
+    assert arena.get(2, symbols.names) is None
+    assert arena.get(4, symbols.names) == []
+    assert [list(c) for c in arena.clause_literals(1)] == [[0, 3], [5]]
+    assert len(arena) == 3
+    assert arena.clause_count == 3
+
+    # Повторное сохранение заменяет дизъюнкты, удаление освобождает ID
+    arena.add(3, [Variable("a")], symbols)
+    assert [list(c) for c in arena.clause_literals(3)] == [[0]]
+    arena.remove(1)
+    assert 1 not in arena
+    assert list(arena.owners()) == [3, 4]
+
+
+def test_clause_arena_readonly():
+    symbols = SymbolTable()
+    arena = ClauseArena()
+    arena.add(2, [Disjunct(predicates=[Variable("a"), Variable("b")])], symbols)
+    arena.add(5, [Negation(Variable("a"))], symbols)
+    compacted = arena.compacted([2, 5])
+
+    index = memoryview(bytes(array("i", [2, 0, 1, 5, 1, 2]))).cast("i")
+    readonly = ClauseArena(
+        memoryview(bytes(compacted.literals)).cast("i"),
+        memoryview(bytes(compacted.offsets)).cast("i"),
+        memoryview(bytes(compacted.kinds)),
+        index,
+    )
+    assert readonly.readonly
+    assert [str(c) for c in readonly.get(2, symbols.names)] == ['"a" + "b"']
+    assert [str(c) for c in readonly.get(5, symbols.names)] == ['!"a"']
+    assert readonly.get(3, symbols.names) is None
+
+    readonly.remove(2)
+    assert list(readonly.owners()) == [5]
+    with pytest.raises(ValueError):
+        readonly.add(6, [Variable("a")], symbols)
+
+    copy = ClauseArena()
+    assert copy.copy(5, readonly)
+    assert [list(c) for c in copy.clause_literals(5)] == [[1]]
+
+
+def test_clause_arena_compaction():
+    symbols = SymbolTable()
+    arena = ClauseArena()
+    arena.compact_min = 8
+    clause = Disjunct(predicates=[Variable("a"), Negation(Variable("b"))])
+    arena.add(1, [Variable("c")], symbols)
+    # Удаление и повторное добавление аксиом не увеличивает массивы без предела
+    for axiom_id in range(2, 200):
+        arena.add(axiom_id, [clause, clause], symbols)
+        arena.remove(axiom_id - 1)
+    assert len(arena.literals) < 20
+    assert list(arena.owners()) == [199]
+    assert [list(c) for c in arena.clause_literals(199)] == [[2, 5], [2, 5]]
+    # Замена дизъюнктов аксиомы тоже освобождает место
+    for _ in range(10):
+        arena.add(199, [clause], symbols)
+    assert len(arena.literals) < 20
+    assert len(arena) == 1 and arena.clause_count < 10
+
+
+def test_clause_arena_view():
+    symbols = SymbolTable()
+    arena = ClauseArena()
+    arena.compact_min = 1
+    arena.add(1, [Variable("a")], symbols)
+    arena.add(2, [Negation(Variable("b"))], symbols)
+    view = arena.view()
+    # Представление ничего не копирует
+    assert view.literals is arena.literals and view.first is arena.first
+
+    arena.remove(1)
+    arena.add(3, [Variable("c")], symbols)
+    assert list(view.owners()) == [1, 2]
+    assert [str(c) for c in view.get(1, symbols.names)] == ['"a"']
+    assert list(arena.owners()) == [2, 3]
+    # Удаление в представлении не меняет исходное хранилище
+    view.remove(2)
+    assert 2 in arena and 2 not in view
+    with pytest.raises(ValueError):
+        view.add(4, [Variable("a")], symbols)
@@ -1,8 +1,10 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
-from engine import LogicalEngine
+from engine import LemmaStore, LogicalEngine, QueryContext, ResultCache
+from proof import clause_key
 from models import (
     Disjunction,
     Conjunction,
@@ -249,6 +251,22 @@ def test_apply_de_morgan(input: Operation, expected: Operation, engine: LogicalE
                 )
             ),
         ),
+        (
+            Disjunction(
+                (
+                    Variable("a"),
+                    Conjunction((Variable("b"), Variable("c"), Variable("d"))),
+                    Variable("e"),
+                )
+            ),
+            Conjunction(
+                (
+                    Disjunction((Variable("a"), Variable("e"), Variable("b"))),
+                    Disjunction((Variable("a"), Variable("e"), Variable("c"))),
+                    Disjunction((Variable("a"), Variable("e"), Variable("d"))),
+                )
+            ),
+        ),
     ),
 )
 def test_group_conjunctions(
@@ -294,3 +312,330 @@ def test_group_conjunctions(
 def test_to_cnf(input: Operation, expected: CNF, engine: LogicalEngine):
     result = engine.to_cnf(input)
     assert result == expected
+
+
+def test_resolution_uses_relevant_axioms(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    engine.kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    engine.kb.add_axiom(Implication((Variable("y"), Variable("z"))))
+
+    engine.resolution_method(Variable("b"))
+    assert Disjunct(predicates=(Negation(Variable("x")), Variable("y"))) not in (
+        engine.axioms
+    )
+    assert len(engine.axioms) == 2
+
+    engine.resolution_method(Variable("z"), relevance_depth=0)
+    assert len(engine.axioms) == 1
+    engine.resolution_method(Variable("z"), relevance_depth=1)
+    assert len(engine.axioms) == 2
+
+
+def test_check_correctness_by_components(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    engine.kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    assert engine.check_correctness()
+    assert len(engine._component_verdicts) == 2
+
+    # Изменение одной части не сбрасывает вердикт другой
+    verdicts = dict(engine._component_verdicts)
+    engine.kb.add_axiom(Implication((Variable("b"), Negation(Variable("a")))))
+    assert not engine.check_correctness()
+    unchanged = set(verdicts) & set(engine._component_verdicts)
+    assert len(unchanged) == 1
+
+
+def test_check_correctness_parallel(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    engine.kb.add_axiom(Implication((Variable("a"), Negation(Variable("a")))))
+    engine.kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    assert not engine.check_correctness(workers=2)
+
+
+def test_resolution_method_records_proof(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+
+    assert engine.resolution_method(Variable("b")) is True
+    empty = len(engine.trace) - 1
+    assert engine.trace.clauses[empty].children == []
+    # "b" выведено при проверке непротиворечивости и добавлено как лемма (2)
+    assert engine.context.lemmas == 1
+    assert engine.trace.derivation(empty) == [2, 3, 5]
+
+    assert engine.resolution_method(Variable("c")) is False
+
+    engine.kb.add_axiom(Implication((Variable("a"), Negation(Variable("a")))))
+    assert engine.resolution_method(Variable("b")) is None
+
+
+def test_trimmed_proof_output(capsys):
+    def run(full_trace: bool) -> str:
+        engine = LogicalEngine(full_trace=full_trace)
+        engine.kb.add_statement("a")
+        engine.kb.add_statement("x")
+        engine.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+        engine.kb.add_axiom(Implication((Variable("a"), Variable("c"))))
+        engine.kb.add_axiom(Implication((Variable("c"), Variable("b"))))
+        capsys.readouterr()
+        assert engine.resolution_method(Variable("b"))
+        return capsys.readouterr().out
+
+    trimmed, full = run(False), run(True)
+    assert "теорема доказана" in trimmed
+    assert trimmed.count("|-->") < full.count("|-->")
+
+
+@pytest.mark.parametrize("workers", (None, 2))
+def test_compile(engine: LogicalEngine, workers):
+    engine.kb.bulk_load(
+        [
+            Variable("a"),
+            Implication((Variable("a"), Variable("b"))),
+            Implication((Variable("b"), Conjunction((Variable("c"), Variable("d"))))),
+        ]
+    )
+
+    assert engine.compile(workers) == 2
+    assert engine.kb.get_clauses(1) == [
+        Disjunct(predicates=(Negation(Variable("a")), Variable("b")))
+    ]
+    assert len(engine.kb.get_clauses(2)) == 2
+    assert engine.compile(workers) == 0
+
+    # Только перечисленные аксиомы
+    added = engine.kb.bulk_load(
+        [Implication((Variable("d"), Variable("e"))), Variable("e")]
+    )
+    engine.kb.add_axiom(Implication((Variable("e"), Variable("f"))))
+    assert engine.compile(workers, [added[0].id]) == 1
+    assert engine.kb.is_compiled(added[0].id)
+    assert not engine.kb.is_compiled(4)
+    assert engine.resolution_method(Variable("d"))
+
+
+def test_retract_axiom(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("c"))))
+    assert engine.resolution_method(Variable("b"))
+    assert list(engine.axiom_ids) == [1, 2, 0]
+    # Леммы "b" и "c" идут в графе вывода после аксиом
+    assert list(engine.trace_axiom_ids) == [1, 2, 0, -1, -1]
+
+    assert engine.retract_axiom(1)
+    assert not engine.retract_axiom(1)
+    assert engine.kb.get_axiom(1) is None
+    assert engine.axioms == [
+        Disjunct(predicates=(Negation(Variable("a")), Variable("c"))),
+        Disjunct(predicates=(Variable("a"),)),
+    ]
+    assert list(engine.axiom_ids) == [2, 0]
+    # Из графа вывода убраны дизъюнкт аксиомы и всё, что из него выведено
+    assert [str(c) for c in engine.trace.clauses] == ['!"a" + "c"', '"a"', '!"b"']
+    assert engine.trace.input_count == 3
+
+    assert not engine.resolution_method(Variable("b"))
+
+
+def test_query_context(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    for i in range(20):
+        engine.kb.add_axiom(Implication((Variable(f"p{i}"), Variable(f"p{i + 1}"))))
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("p0"))))
+    goals = [Variable(f"p{i}") for i in range(21)] + [Variable("b"), Variable("x")]
+
+    context = QueryContext()
+    assert engine.resolution_method(Variable("p3"), context=context) is True
+    # Состояние запроса хранится только в переданном контексте
+    assert len(engine.trace) == 0 and not engine.axioms
+    assert context.trace.clauses[-1].children == []
+    assert set(context.timings) == {"consistency", "cnf", "resolution"}
+
+    def prove(goal):
+        context = QueryContext()
+        verdict = engine.resolution_method(goal, context=context)
+        if not verdict:
+            return verdict, 0
+        return verdict, len(context.trace.derivation(len(context.trace) - 1))
+
+    expected = [prove(goal) for goal in goals]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(prove, goals * 4)) == expected * 4
+    assert [verdict for verdict, _ in expected] == [True] * 21 + [False, False]
+
+
+def test_result_cache(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("c"))))
+
+    goal = Conjunction((Variable("b"), Variable("c")))
+    assert engine.resolution_method(goal) is True
+    assert not engine.context.cached
+    proof = [
+        str(engine.trace.clauses[i])
+        for i in engine.trace.derivation(len(engine.trace) - 1)
+    ]
+    assert len(proof) < len(engine.trace)
+    # Равносильная с точностью до порядка операндов теорема берётся из кэша;
+    # из графа вывода хранится только вывод пустого дизъюнкта
+    same = Conjunction((Variable("c"), Variable("b"), Variable("c")))
+    assert engine.resolution_method(same) is True
+    assert engine.context.cached
+    assert [str(clause) for clause in engine.trace.clauses] == proof
+    assert engine.trace.derivation(len(engine.trace) - 1) == list(range(len(proof)))
+    assert len(engine.trace_axiom_ids) <= engine.trace.input_count
+    assert set(engine.timings) == {"cache"}
+    assert engine.resolution_method(Variable("d")) is False
+    assert engine.resolution_method(Variable("d")) is False
+    assert engine.result_cache.stats()["hits"] == 2
+    assert engine.result_cache.stats()["misses"] == 2
+
+    # Изменение базы знаний делает прежние результаты недействительными
+    engine.kb.add_axiom(Implication((Variable("c"), Variable("d"))))
+    assert engine.resolution_method(Variable("d")) is True
+    assert not engine.context.cached
+    assert engine.result_cache.stats()["invalidations"] == 1
+    assert len(engine.result_cache) == 1
+    # Результат для другой глубины поиска хранится отдельно
+    engine.resolution_method(Variable("d"), relevance_depth=0)
+    assert not engine.context.cached
+
+    assert LogicalEngine.goal_key(Disjunction((Variable("a"), Negation(Variable("a"))))) == (
+        frozenset()
+    )
+    assert LogicalEngine.goal_key(
+        Conjunction((Variable("a"), Negation(Variable("a"))))
+    ) != LogicalEngine.goal_key(Variable("a"))
+
+
+def test_result_cache_eviction():
+    cache = ResultCache(maxsize=2)
+    for goal in ("a", "b", "c"):
+        cache.put((1, None, goal), (True, None, None))
+    assert cache.get((1, None, "a")) is None
+    assert cache.get((1, None, "c")) is not None
+    # Результаты для старых версий базы не запоминаются
+    cache.put((0, None, "d"), (True, None, None))
+    assert cache.get((0, None, "d")) is None
+    assert cache.stats() == {
+        "size": 2, "hits": 1, "misses": 2, "hit_rate": 0.3333, "invalidations": 0
+    }
+
+
+def test_result_cache_snapshot_lineage(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    snapshot = engine.snapshot()
+    snapshot.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    assert snapshot.resolution_method(Variable("b")) is True
+    # База и изменённая копия с одним номером версии - разные базы
+    engine.kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    assert engine.kb.version == snapshot.kb.version
+    assert engine.kb.lineage is not snapshot.kb.lineage
+    # Ни результат, ни леммы копии не используются в доказательствах базы
+    assert engine.resolution_method(Variable("b")) is False
+    assert not engine.context.cached
+    assert engine.context.lemmas == 0
+
+    # Неизменённая копия продолжает линию базы и пользуется её кэшем
+    assert engine.resolution_method(Variable("y")) is False
+    reader = engine.snapshot()
+    assert reader.resolution_method(Variable("y")) is False
+    assert reader.context.cached
+
+
+def test_lemma_store():
+    a, b, c = Variable("a"), Variable("b"), Variable("c")
+    store = LemmaStore(maxsize=3, max_length=2)
+    assert store.add(1, [Disjunct(predicates=(a, b)), c, Disjunct(predicates=(a, b, c))]) == 2
+    # Тавтологии и повторы не запоминаются
+    assert store.add(1, [Disjunct(predicates=(a, Negation(a))), c]) == 0
+    assert store.select(1, ["a", "c"]) == [c, Disjunct(predicates=(a, b))]
+    assert store.select(1, ["x"]) == []
+    assert store.select(0, ["a"]) == []
+
+    # При переполнении короткие леммы вытесняют длинные, но не наоборот
+    assert store.add(1, [Disjunct(predicates=(b, c))]) == 1
+    assert store.add(1, [Disjunct(predicates=(a, c))]) == 0
+    assert store.add(1, [a]) == 1
+    assert store.select(1, ["a", "b", "c"]) == [c, a, Disjunct(predicates=(b, c))]
+    assert store.stats() == {"size": 3, "units": 2, "version": 1}
+
+    # Леммы относятся к одной версии базы знаний и одной линии её изменений
+    assert store.add(2, [b]) == 1
+    assert store.select(2, ["a", "b", "c"]) == [b]
+    fork = object()
+    assert store.add(2, [a], fork) == 0
+    assert store.select(2, ["b"], fork) == []
+    store.clear()
+    assert len(store) == 0
+
+
+def test_lemmas_reused(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    engine.kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    engine.kb.add_axiom(Implication((Variable("b"), Disjunction((Variable("c"), Variable("d"))))))
+    engine.kb.add_axiom(Implication((Variable("c"), Variable("e"))))
+    engine.kb.add_axiom(Implication((Variable("d"), Variable("e"))))
+
+    assert engine.resolution_method(Variable("e")) is True
+    # Доказанная теорема стала леммой
+    version, lineage = engine.kb.version, engine.kb.lineage
+    lemmas = engine.lemmas.select(version, ["e"], lineage)
+    assert clause_key(lemmas[0]) == frozenset({("e", True)})
+    context = QueryContext()
+    goal = Disjunction((Variable("e"), Variable("x")))
+    assert engine.resolution_method(goal, context=context) is True
+    assert context.lemmas > 0
+    derivation = context.trace.derivation(len(context.trace) - 1)
+    assert any(context.trace_axiom_ids[i] == -1 for i in derivation)
+
+    # После изменения базы знаний прежние леммы не используются
+    engine.kb.add_statement("x")
+    assert engine.resolution_method(Variable("z")) is False
+    assert engine.lemmas.version == engine.kb.version
+    assert engine.lemmas.select(version, ["e"], lineage) == []
+
+
+def test_max_clauses(engine: LogicalEngine):
+    engine.kb.add_statement("a")
+    for name, child in zip("abcdefgh", "bcdefghi"):
+        engine.kb.add_axiom(Implication((Variable(name), Variable(child))))
+    engine.max_clauses = 8
+
+    context = QueryContext()
+    assert engine.resolution_method(Variable("i"), context=context) is True
+    assert context.deleted > 0
+    trace = context.trace
+    assert all(trace.clauses[i] is not None for i in trace.derivation(len(trace) - 1))
+    assert all(trace.clauses[i] is not None for i in range(trace.input_count))
+
+
+def test_incomplete_results_not_remembered(engine: LogicalEngine):
+    a, b, c, d = map(Variable, "abcd")
+    for axiom in (
+        Disjunction((a, b)),
+        Implication((a, c)),
+        Implication((b, c)),
+        Implication((c, d)),
+        Negation(d),
+    ):
+        engine.kb.add_axiom(axiom)
+
+    # Система противоречива, но при малом пределе противоречие не найдено
+    engine.max_clauses = 2
+    context = QueryContext()
+    assert engine.check_correctness(context=context) is None
+    assert not context.complete
+    assert engine._component_verdicts == {}
+    assert engine.resolution_method(Variable("z"), context=context) is False
+    assert not context.complete
+    assert len(engine.result_cache) == 0
+
+    engine.max_clauses = None
+    assert engine.check_correctness() is False
+    assert engine.resolution_method(Variable("z")) is None
+    assert engine.context.complete
@@ -1,6 +1,12 @@
+import random
+from collections.abc import Mapping
+
 import pytest
+from engine import LogicalEngine
 from knowledge_base import KnowledgeBase, Statement, Axiom
-from models import Variable, Conjunction, Implication
+from lexer import SymbolTable
+from models import Variable, Conjunction, Disjunction, Equivalence, Implication, Negation
+from snapshot import SnapshotError
 
 
 def test_kb_creation():
@@ -143,4 +149,318 @@ def test_clear():
     axiom = kb.add_axiom(Variable("new_axiom"))
     
     assert stmt.id == 1
-    assert axiom.id == 1
\ No newline at end of file
+    assert axiom.id == 1
+
+def test_symbol_graph():
+    """Тест графа совместной встречаемости высказываний"""
+    kb = KnowledgeBase()
+    
+    first = kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    kb.add_axiom(Implication((Variable("b"), Variable("c"))))
+    kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    
+    assert kb.get_neighbours("b") == {"a", "c"}
+    assert kb.relevant_symbols(["a"]) == {"a", "b", "c"}
+    assert kb.relevant_symbols(["a"], depth=1) == {"a", "b"}
+    assert kb.relevant_symbols(["z"]) == {"z"}
+    
+    axioms = kb.get_axioms_with_symbols(kb.relevant_symbols(["c"]))
+    assert [axiom.id for axiom in axioms] == [1, 2]
+    
+    # Граф обновляется при удалении аксиомы
+    kb.remove_axiom(first.id)
+    assert kb.get_neighbours("b") == {"c"}
+    assert kb.get_neighbours("a") == set()
+    assert kb.relevant_symbols(["a"]) == {"a"}
+    
+    kb.clear()
+    assert kb.relevant_symbols(["x"]) == {"x"}
+
+
+def test_remove_single_symbol_axiom():
+    """Тест удаления аксиомы с одним высказыванием после его соседей"""
+    kb = KnowledgeBase()
+
+    kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    kb.add_axiom(Implication((Variable("a"), Variable("a"))))
+
+    assert kb.remove_axiom(1)
+    assert kb.get_neighbours("a") == set()
+    assert kb.get_axiom_ids("a") == {2}
+    assert kb.remove_axiom(2)
+    assert kb.get_axiom_ids("a") == set()
+    assert kb.relevant_symbols(["a"]) == {"a"}
+
+
+def test_get_components():
+    """Тест разбиения базы знаний на независимые части"""
+    kb = KnowledgeBase()
+    
+    kb.add_statement("a")
+    kb.add_statement("q")
+    kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    kb.add_axiom(Implication((Variable("b"), Variable("c"))))
+    
+    components = kb.get_components()
+    summary = [
+        ([axiom.id for axiom in axioms], [stmt.name for stmt in statements])
+        for axioms, statements in components
+    ]
+    assert sorted(summary) == [([], ["q"]), ([1, 3], ["a"]), ([2], [])]
+
+
+def test_components_follow_changes(tmp_path):
+    """Тест поддержки независимых частей при изменениях базы"""
+    kb = KnowledgeBase()
+    kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    bridge = kb.add_axiom(Implication((Variable("b"), Variable("c"))))
+    kb.add_axiom(Implication((Variable("c"), Variable("d"))))
+    kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    kb.add_statement("d")
+
+    def shape():
+        return sorted(
+            (sorted(axiom_ids), sorted(symbols))
+            for axiom_ids, symbols in (
+                (c.axiom_ids, c.symbols) for c in kb.components()
+            )
+        )
+
+    assert shape() == [([1, 2, 3], ["a", "b", "c", "d"]), ([4], ["x", "y"])]
+    keys = {frozenset(c.symbols): c.key for c in kb.components()}
+
+    # Удаление аксиомы разбивает часть; ключ другой части не меняется
+    kb.remove_axiom(bridge.id)
+    assert shape() == [([1], ["a", "b"]), ([3], ["c", "d"]), ([4], ["x", "y"])]
+    assert {frozenset(c.symbols): c.key for c in kb.components()}[
+        frozenset({"x", "y"})
+    ] == keys[frozenset({"x", "y"})]
+
+    # Высказывание без аксиом - отдельная часть, а после удаления
+    # единственной аксиомы с ним - тоже
+    kb.add_statement("q")
+    kb.remove_axiom(1)
+    assert shape() == [([], ["q"]), ([3], ["c", "d"]), ([4], ["x", "y"])]
+
+    kb.add_axiom(Conjunction((Variable("q"), Variable("x"), Variable("d"))))
+    assert shape() == [([3, 4, 5], ["c", "d", "q", "x", "y"])]
+
+    path = str(tmp_path / "kb.snapshot")
+    kb.save(path)
+    loaded = KnowledgeBase.load(path)
+    assert [
+        (sorted(c.axiom_ids), sorted(c.symbols)) for c in loaded.components()
+    ] == shape()
+
+
+def test_components_random_changes():
+    """Тест частей базы после случайных добавлений и удалений"""
+    rng = random.Random(7)
+    kb = KnowledgeBase()
+    for step in range(400):
+        if kb.axioms and rng.random() < 0.45:
+            kb.remove_axiom(rng.choice(list(kb.axioms)))
+        elif rng.random() < 0.1:
+            kb.add_statement(f"s{rng.randrange(30)}")
+        else:
+            names = rng.sample(range(30), rng.randint(1, 3))
+            kb.add_axiom(Conjunction(tuple(Variable(f"s{i}") for i in names)))
+        if step % 10 == 0:
+            expected = set()
+            names = set(kb.statements)
+            for axiom in kb.get_all_axioms():
+                names.update(axiom.expression.variables())
+            for name in names:
+                expected.add(frozenset(kb.relevant_symbols([name])))
+            assert {frozenset(c.symbols) for c in kb.components()} == expected
+            for component in kb.components():
+                assert set(component.axiom_ids) == {
+                    axiom.id for axiom in kb.get_axioms_with_symbols(component.symbols)
+                }
+
+
+class CountingMap(Mapping):
+    """Отображение, считающее обращения по ключу"""
+
+    def __init__(self, items):
+        self.items_ = items
+        self.reads = 0
+
+    def __getitem__(self, key):
+        self.reads += 1
+        return self.items_[key]
+
+    def __iter__(self):
+        return iter(self.items_)
+
+    def __len__(self):
+        return len(self.items_)
+
+
+def test_remove_axiom_does_not_walk_component(monkeypatch):
+    """Удаление аксиом не обходит часть, а разбиение обходит только
+    отделившиеся части"""
+    kb = KnowledgeBase()
+    n = 5_000
+    for i in range(n):
+        kb.add_axiom(Implication((Variable(f"p{i}"), Variable(f"p{i + 1}"))))
+
+    def walk(*args, **kwargs):
+        raise AssertionError("часть базы обходится при удалении аксиомы")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(KnowledgeBase, "relevant_symbols", walk)
+        patch.setattr(KnowledgeBase, "_split_components", walk)
+        for axiom_id in range(n, n - 200, -1):
+            kb.remove_axiom(axiom_id)
+        for axiom_id in range(n - 250, n - 260, -1):
+            kb.remove_axiom(axiom_id)
+
+    kb._axiom_symbols = counting = CountingMap(kb._axiom_symbols)
+    assert len(list(kb.components())) == 2
+    # Отделилась часть из 50 аксиом (p4750 -> ... -> p4800): обходится
+    # она и столько же аксиом остальной части
+    assert counting.reads < 200
+
+
+def test_bulk_load():
+    """Тест массовой загрузки высказываний и аксиом"""
+    kb = KnowledgeBase()
+    
+    entries = kb.bulk_load([
+        Variable("a"),
+        Implication((Variable("a"), Variable("b"))),
+        Variable("c"),
+    ])
+    
+    assert [type(entry) for entry in entries] == [Statement, Axiom, Statement]
+    assert [stmt.name for stmt in kb.get_all_statements()] == ["a", "c"]
+    assert kb.get_axiom(1) is entries[1]
+    # КНФ аксиом при загрузке не строится
+    assert kb.get_clauses(1) is None
+    
+    kb.set_clauses(1, [Variable("b")])
+    assert kb.get_clauses(1) == [Variable("b")]
+    kb.remove_axiom(1)
+    assert kb.get_clauses(1) is None
+
+
+def test_polarity_index():
+    """Тест обратного индекса вхождений высказываний по полярности"""
+    kb = KnowledgeBase()
+    kb.add_axiom(
+        Implication((Conjunction((Variable("a"), Negation(Variable("b")))), Variable("c")))
+    )
+    kb.add_axiom(Negation(Disjunction((Variable("a"), Variable("c")))))
+    kb.add_axiom(Equivalence((Variable("b"), Variable("d"))))
+
+    assert kb.get_axiom_ids("a") == {1, 2}
+    assert kb.get_axiom_ids("a", positive=True) == set()
+    assert kb.get_axiom_ids("a", positive=False) == {1, 2}
+    assert kb.get_axiom_ids("b", positive=True) == {1, 3}
+    assert kb.get_axiom_ids("b", positive=False) == {3}
+    positive, negative = kb.get_occurrences("c")
+    assert [axiom.id for axiom in positive] == [1]
+    assert [axiom.id for axiom in negative] == [2]
+    assert kb.get_occurrences("нет") == ([], [])
+
+    kb.remove_axiom(3)
+    assert kb.get_axiom_ids("b", positive=False) == set()
+    assert kb.get_axiom_ids("d") == set()
+    kb.clear()
+    assert kb.get_axiom_ids("a") == set()
+
+
+def test_snapshot(tmp_path):
+    """Тест сохранения базы знаний в снимок и загрузки из него"""
+    kb = KnowledgeBase()
+    kb.add_statement("игрок_1", "Первый игрок")
+    kb.add_statement("b")
+    kb.add_axiom(
+        Implication(
+            (
+                Conjunction((Variable("игрок_1"), Negation(Variable("b")), Variable("c"))),
+                Disjunction((Variable("d"), Variable("e"))),
+            )
+        ),
+        "Правило",
+    )
+    kb.add_axiom(Equivalence((Variable("x"), Variable("y"))))
+    kb.add_axiom(Implication((Variable("x"), Variable("z"))))
+    kb.remove_axiom(3)
+    LogicalEngine(kb).compile()
+    
+    path = str(tmp_path / "kb.snapshot")
+    kb.save(path)
+    symbols = SymbolTable()
+    loaded = KnowledgeBase.load(path, symbols)
+    
+    assert [str(stmt) for stmt in loaded.get_all_statements()] == [
+        str(stmt) for stmt in kb.get_all_statements()
+    ]
+    assert loaded.get_statement("игрок_1").description == "Первый игрок"
+    assert [str(axiom) for axiom in loaded.get_all_axioms()] == [
+        str(axiom) for axiom in kb.get_all_axioms()
+    ]
+    assert loaded.get_axiom(1).description == "Правило"
+    for axiom_id in (1, 2):
+        assert [str(c) for c in loaded.get_clauses(axiom_id)] == [
+            str(c) for c in kb.get_clauses(axiom_id)
+        ]
+    assert loaded.get_clauses(3) is None
+    assert loaded.get_neighbours("x") == {"y"}
+    assert loaded.get_axiom_ids("b", positive=True) == {1}
+    assert loaded.get_axiom_ids("x", positive=False) == {2}
+    assert loaded.get_axiom_ids("x", positive=True) == {2}
+    assert loaded.relevant_symbols(["игрок_1"]) == kb.relevant_symbols(["игрок_1"])
+    assert "игрок_1" in symbols
+    
+    # Загруженную базу можно изменять: ID продолжаются
+    assert loaded.add_axiom(Implication((Variable("y"), Variable("z")))).id == 4
+    assert loaded.remove_axiom(2)
+    assert loaded.get_neighbours("x") == set()
+    assert loaded.add_statement("q").id == 3
+
+
+def test_snapshot_errors(tmp_path):
+    """Тест чтения файла, не являющегося снимком"""
+    path = tmp_path / "kb.snapshot"
+    path.write_bytes(b"not a snapshot at all")
+    with pytest.raises(SnapshotError):
+        KnowledgeBase.load(str(path))
+
+
+def test_version_snapshot():
+    """Тест версии базы знаний, не меняющейся при изменениях базы"""
+    kb = KnowledgeBase()
+    kb.add_statement("x")
+    kb.add_axiom(Implication((Variable("x"), Variable("y"))))
+    kb.add_axiom(Implication((Variable("y"), Variable("z"))))
+    LogicalEngine(kb).compile()
+    version = kb.version
+    
+    snapshot = kb.snapshot()
+    assert snapshot.version == version
+    assert snapshot.lineage is kb.lineage
+    kb.add_statement("w")
+    kb.add_axiom(Implication((Variable("z"), Variable("w"))))
+    kb.remove_axiom(2)
+    assert kb.version == version + 3
+    
+    assert snapshot.version == version
+    assert [str(a) for a in snapshot.get_all_axioms()] == ['(1) "x" -> "y"', '(2) "y" -> "z"']
+    assert [s.name for s in snapshot.get_all_statements()] == ["x"]
+    assert snapshot.get_neighbours("z") == {"y"}
+    assert kb.get_neighbours("z") == {"w"}
+    assert snapshot.get_axiom_ids("y") == {1, 2}
+    assert len(snapshot.get_clauses(2)) == 1 and kb.get_clauses(2) is None
+    assert LogicalEngine(snapshot).resolution_method(Variable("z")) is True
+    assert LogicalEngine(kb).resolution_method(Variable("z")) is False
+    
+    # Изменения копии не видны в исходной базе
+    assert snapshot.add_axiom(Implication((Variable("z"), Variable("q")))).id == 3
+    # Изменённая копия начинает свою линию изменений, база остаётся в прежней
+    assert snapshot.lineage is not kb.lineage
+    assert str(kb.get_axiom(3)) == '(3) "z" -> "w"'
+    assert kb.get_neighbours("q") == set()
@@ -1,6 +1,6 @@
 import pytest
 
-from lexer import Lexer, LexerException, Token, TokenType
+from lexer import Lexer, LexerException, SourceReader, SymbolTable, Token, TokenType
 
 
 TEST_DATA = [
@@ -58,6 +58,27 @@ TEST_DATA = [
             Token(TokenType.EOL, None, 8),
         ],
     },
+    {"input": "a $ b", "error": LexerException("Неожиданный символ: $", 2)},
+    {
+        "input": "a /* b */ -> c // d ",
+        "expected": [
+            Token(TokenType.IDENTIFIER, "a", 0),
+            Token(TokenType.IMPLIES, "->", 10),
+            Token(TokenType.IDENTIFIER, "c", 13),
+            Token(TokenType.EOL, None, 15),
+        ],
+    },
+    {
+        "input": "a * b + c /* d ",
+        "expected": [
+            Token(TokenType.IDENTIFIER, "a", 0),
+            Token(TokenType.AND, "*", 2),
+            Token(TokenType.IDENTIFIER, "b", 4),
+            Token(TokenType.OR, "+", 6),
+            Token(TokenType.IDENTIFIER, "c", 8),
+            Token(TokenType.EOL, None, 15),
+        ],
+    },
     {
         "input": '"уровень игрока 1 равен 10"',
         "expected": [
@@ -91,3 +112,47 @@ def test_lexer_errors(input: str, error: LexerException):
     assert isinstance(exc_info.value, type(error))
     if error.position is not None:
         assert exc_info.value.position == error.position
+
+
+def test_source_reader():
+    source = [
+        "// комментарий\n",
+        "a /* начало\n",
+        "   продолжение\n",
+        "конец */ b\n",
+        "\n",
+        '"x // y" -> c // хвост\n',
+        "d /* x */ & e\n",
+    ]
+    reader = SourceReader(source)
+    assert list(reader) == [
+        (2, "a"),
+        (4, "b"),
+        (6, '"x // y" -> c'),
+        (7, "d   & e"),
+    ]
+    assert reader.line_num == 7
+    assert not reader.in_comment
+
+
+def test_iter_tokens_is_lazy():
+    lexer = Lexer()
+    tokens = lexer.iter_tokens("a & $")
+    assert next(tokens) == Token(TokenType.IDENTIFIER, "a", 0)
+    assert next(tokens) == Token(TokenType.AND, "&", 2)
+    # Ошибка возникает только при чтении неверной лексемы
+    with pytest.raises(LexerException):
+        next(tokens)
+
+
+def test_symbol_table():
+    symbols = SymbolTable()
+    first = Lexer(symbols).tokenize_line("игрок_2 & " + '"игрок_2"')
+    second = Lexer(symbols).tokenize_line("b | игрок_2")
+    
+    # Одинаковые имена - один и тот же объект строки
+    assert first[0].value is first[2].value is second[2].value
+    assert len(symbols) == 2
+    assert symbols.add("игрок_2") == 0
+    assert symbols.name(1) == "b"
+    assert "c" not in symbols
@@ -1,7 +1,9 @@
 import pytest
 from lexer import Lexer
-from parser import Parser, ParserException
+from parser import ParseCache, Parser, ParserException
 from models import *
+from engine import LogicalEngine
+from proof import clause_key
 
 
 def parse_expression(text: str):
@@ -38,6 +40,10 @@ ERROR_TEST_DATA = [
     ("a &", "конец выражения"),
     ("(a & b", "Ожидалась закрывающая скобка"),
     ("a & & b", "Неожиданный токен"),
+    ("a <-> b <-> c", "Неожиданный токен: <->"),
+    ("(a <-> b <-> c)", "Ожидалась закрывающая скобка"),
+    ("(a))", "Неожиданный токен: )"),
+    ("!", "конец выражения"),
 ]
 
 
@@ -46,4 +52,72 @@ def test_parser_errors(input: str, error_message: str):
     with pytest.raises(ParserException) as exc_info:
         parse_expression(input)
     
-    assert error_message in str(exc_info.value)
\ No newline at end of file
+    assert error_message in str(exc_info.value)
+
+def test_parser_token_stream():
+    lexer = Lexer()
+    parser = Parser(lexer.iter_tokens("a -> b | c"))
+    assert str(parser.parse()) == str(
+        Implication((Variable("a"), Disjunction((Variable("b"), Variable("c")))))
+    )
+    
+    # Повторное использование разборщика и поток без EOL
+    parser.reset(token for token in lexer.tokenize_line("!a & b")[:-1])
+    assert str(parser.parse()) == str(
+        Conjunction((Negation(Variable("a")), Variable("b")))
+    )
+    
+    parser.reset(iter(()))
+    with pytest.raises(ParserException):
+        parser.parse()
+
+
+def test_parser_deep_nesting():
+    depth = 20_000
+    expression = parse_expression("(" * depth + "!" * depth + "a" + ")" * depth + " & b")
+    assert isinstance(expression, Conjunction)
+    
+    node = expression.children[0]
+    negations = 0
+    while isinstance(node, Negation):
+        negations += 1
+        node = node.child
+    assert negations == depth
+    assert node == Variable("a")
+
+
+def test_parser_flat():
+    lexer = Lexer()
+    text = "a & b & (c & d) & !e -> f | (g | h) | i & j"
+    flat = Parser(lexer.iter_tokens(text), flat=True).parse()
+    premise, conclusion = flat.children
+    assert type(premise) is Conjunction
+    assert [str(child) for child in premise.children] == ['"a"', '"b"', '"c"', '"d"', '!"e"']
+    assert type(conclusion) is Disjunction
+    assert len(conclusion.children) == 4
+    
+    # КНФ плоского и бинарного дерева совпадают
+    binary = parse_expression(text)
+    assert {clause_key(c) for c in LogicalEngine.to_clauses(flat)} == {
+        clause_key(c) for c in LogicalEngine.to_clauses(binary)
+    }
+
+
+def test_parse_cache():
+    cache = ParseCache(Lexer(), Parser([], flat=True), maxsize=2)
+    first = cache.parse("a & b")
+    assert cache.parse("  a & b ") is first
+    assert cache.get("a") is None
+    
+    # Строки с ошибками не кэшируются
+    with pytest.raises(ParserException):
+        cache.parse("a &")
+    assert len(cache) == 1
+    
+    # Вытесняется давно не использованная строка
+    cache.parse("b")
+    cache.parse("a & b")
+    cache.parse("c")
+    assert cache.get("b") is None
+    assert cache.get("a & b") is first
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 6, "hit_rate": 0.3333}
@@ -0,0 +1,108 @@
+import random
+from persistent import PersistentMap
+
+
+class Colliding:
+    """Ключ с заданным хешем"""
+
+    def __init__(self, name: str, key_hash: int):
+        self.name = name
+        self.key_hash = key_hash
+
+    def __hash__(self):
+        return self.key_hash
+
+    def __eq__(self, other):
+        return isinstance(other, Colliding) and other.name == self.name
+
+
+def test_persistent_map():
+    """Тест совпадения PersistentMap со словарём и сохранности прежних версий"""
+    rng = random.Random(0)
+    versions = [(PersistentMap(), {})]
+    current, expected = versions[0]
+    for step in range(3000):
+        key = rng.randrange(500)
+        if rng.random() < 0.3:
+            current = current.delete(key)
+            expected = {k: v for k, v in expected.items() if k != key}
+        else:
+            current = current.set(key, step)
+            expected = {**expected, key: step}
+        if step % 100 == 0:
+            versions.append((current, expected))
+    versions.append((current, expected))
+
+    for mapping, reference in versions:
+        assert len(mapping) == len(reference)
+        assert dict(mapping.items()) == reference
+        assert set(mapping) == set(reference)
+        for key in range(500):
+            assert mapping.get(key) == reference.get(key)
+            assert (key in mapping) == (key in reference)
+
+    assert current.delete(1000) is current
+    assert current.set(next(iter(current)), current[next(iter(current))]) is current
+    assert PersistentMap({"a": 1}) == {"a": 1}
+    assert PersistentMap.fromkeys([1, 2]) == {1: None, 2: None}
+
+
+def test_persistent_map_collisions():
+    """Тест ключей с одинаковым хешем"""
+    keys = [Colliding(str(i), 42) for i in range(4)]
+    mapping = PersistentMap((key, i) for i, key in enumerate(keys))
+    assert len(mapping) == 4
+    assert [mapping[key] for key in keys] == [0, 1, 2, 3]
+    smaller = mapping.delete(keys[1])
+    assert keys[1] not in smaller and keys[1] in mapping
+    assert len(smaller) == 3
+    assert smaller.set(keys[1], 5)[keys[1]] == 5
+    assert len(smaller.delete(keys[0]).delete(keys[2]).delete(keys[3])) == 0
+
+
+def test_persistent_map_owner():
+    """Тест изменений на месте с меткой owner"""
+    owner = object()
+    base = PersistentMap((i, i) for i in range(100))
+    first = base.set(1000, 0, owner)
+    assert first is not base and 1000 not in base
+    # Отображение и узлы, созданные с меткой, изменяются на месте
+    second = first.set(1001, 0, owner).delete(5, owner)
+    assert second is first
+    assert 1001 in first and 5 not in first and 5 in base
+    # С другой меткой опубликованная версия больше не меняется
+    third = first.set(1002, 0, object())
+    assert third is not first and 1002 not in first
+
+
+def test_persistent_map_update():
+    """Тест добавления набора пар"""
+    rng = random.Random(1)
+    owner = object()
+    current, expected = PersistentMap(), {}
+    versions = []
+    for step in range(60):
+        batch = [
+            (
+                Colliding(str(rng.randrange(40)), rng.randrange(3))
+                if rng.random() < 0.2
+                else rng.randrange(2000),
+                (step, i),
+            )
+            for i in range(rng.randrange(1, 80))
+        ]
+        if step % 3 == 0:
+            # Сохранённая версия опубликована: метка меняется
+            versions.append((current, dict(current.items())))
+            owner = object()
+        current = current.update(batch, owner if step % 2 else None)
+        expected = {**expected, **dict(batch)}
+        assert len(current) == len(expected)
+        assert dict(current.items()) == expected
+        if step % 7 == 0:
+            current = current.delete(next(iter(current)))
+            expected = dict(current.items())
+    # Прежние версии не изменились
+    for mapping, reference in versions:
+        assert dict(mapping.items()) == reference
+    assert current.update([]) is current
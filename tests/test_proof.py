@@ -0,0 +1,133 @@
+from models import Disjunct, Negation, Variable
+from proof import ProofTrace
+
+
+def clause(*literals):
+    return Disjunct(predicates=list(literals))
+
+
+def test_trace_records_parents():
+    trace = ProofTrace(
+        [clause(Negation(Variable("a")), Variable("b")), clause(Variable("a"))]
+    )
+    resolve, _ = trace.clauses[0].add_predicate(trace.clauses[1])
+    index = trace.add_resolvent(resolve, 0, 1)
+
+    assert index == 2
+    assert not trace.is_input(index)
+    assert (trace.left[index], trace.right[index]) == (0, 1)
+    assert trace.derivation(index) == [0, 1, 2]
+
+
+def test_trace_skips_duplicates_and_tautologies():
+    trace = ProofTrace([clause(Variable("a"), Variable("b"))])
+    assert trace.add_resolvent(clause(Variable("b"), Variable("a")), 0, 0) is None
+    tautology = clause(Variable("c"), Negation(Variable("c")))
+    assert trace.add_resolvent(tautology, 0, 0) is None
+    assert len(trace) == 1
+
+
+def test_derivation_is_trimmed():
+    trace = ProofTrace(
+        [
+            clause(Negation(Variable("a")), Variable("b")),
+            clause(Variable("x"), Variable("y")),
+            clause(Variable("a")),
+            clause(Negation(Variable("b"))),
+        ]
+    )
+    first = trace.add_resolvent(clause(Variable("b")), 0, 2)
+    trace.add_resolvent(clause(Variable("y"), Variable("b")), 1, 0)
+    empty = trace.add_resolvent(clause(), first, 3)
+
+    assert trace.derivation(empty) == [0, 2, 3, first, empty]
+    text = trace.format_derivation(empty, "теорема доказана")
+    assert "Пустой дизъюнкт - теорема доказана." in text
+    assert '"x"' not in text
+
+
+def test_trace_without_removed_inputs():
+    trace = ProofTrace(
+        [
+            clause(Negation(Variable("a")), Variable("b")),
+            clause(Negation(Variable("b")), Variable("c")),
+            clause(Variable("a")),
+        ]
+    )
+    b = trace.add_resolvent(clause(Variable("b")), 0, 2)
+    trace.add_resolvent(clause(Variable("c")), b, 1)
+    a_to_c = trace.add_resolvent(clause(Negation(Variable("a")), Variable("c")), 0, 1)
+
+    reduced = trace.without({1})
+    assert [str(c) for c in reduced.clauses] == [
+        str(trace.clauses[i]) for i in (0, 2, b)
+    ]
+    assert (reduced.left[2], reduced.right[2]) == (0, 1)
+    assert reduced.add_resolvent(trace.clauses[a_to_c], 0, 0) is not None
+    assert reduced.add_resolvent(clause(Variable("b")), 0, 1) is None
+
+
+def test_reduce_keeps_inputs_and_derivations():
+    trace = ProofTrace(
+        [
+            clause(Negation(Variable("a")), Variable("b")),
+            clause(Negation(Variable("b")), Variable("c")),
+            clause(Variable("a")),
+            clause(Variable("x"), Variable("y")),
+        ]
+    )
+    b = trace.add_resolvent(clause(Variable("b")), 0, 2)
+    c = trace.add_resolvent(clause(Variable("c")), b, 1)
+    long = trace.add_resolvent(clause(Negation(Variable("a")), Variable("c")), 0, 1)
+
+    assert trace.reduce(2) == 1
+    # b - родитель c, а из длинной резольвенты ничего не выведено
+    assert trace.clauses[long] is None
+    assert trace.clauses[b] is not None and trace.clauses[c] is not None
+    assert trace.derivation(c) == [0, 1, 2, b, c]
+    assert trace.deleted == 1
+    # Удалённая резольвента не строится повторно
+    assert trace.add_resolvent(clause(Variable("c"), Negation(Variable("a"))), 0, 1) is None
+
+    assert trace.reduce(0) == 1
+    assert trace.clauses[c] is None
+    assert all(trace.clauses[i] is not None for i in range(trace.input_count))
+
+
+def test_reduce_forgets_only_removed_clause():
+    class Name(str):
+        """Имя с одним хешем для всех высказываний"""
+
+        def __hash__(self):
+            return 1
+
+    p, q = Variable(Name("p")), Variable(Name("q"))
+    trace = ProofTrace([clause(p, q), clause(Negation(q))])
+    removed = trace.add_resolvent(clause(p), 0, 1)
+    assert trace.reduce(0) == 1 and trace.clauses[removed] is None
+    assert trace.add_resolvent(clause(p), 0, 1) is None
+    # Резольвента с тем же хешем ключа не считается удалённой
+    assert trace.add_resolvent(clause(q), 0, 1) is not None
+    assert trace.input_count == 2
+
+
+def test_proof_trace():
+    trace = ProofTrace(
+        [
+            clause(Negation(Variable("a")), Variable("b")),
+            clause(Variable("x"), Variable("y")),
+            clause(Variable("a")),
+            clause(Negation(Variable("b"))),
+        ]
+    )
+    first = trace.add_resolvent(clause(Variable("b")), 0, 2)
+    trace.add_resolvent(clause(Variable("y"), Variable("b")), 1, 0)
+    empty = trace.add_resolvent(clause(), first, 3)
+
+    proof, used = trace.proof_trace(empty)
+    assert used == [0, 2, 3, first, empty]
+    assert [str(c) for c in proof.clauses] == [str(trace.clauses[i]) for i in used]
+    assert proof.input_count == 3
+    assert (proof.left[3], proof.right[3]) == (0, 1)
+    assert (proof.left[4], proof.right[4]) == (3, 2)
+    assert "Пустой дизъюнкт" in proof.format_derivation(4, "теорема доказана")
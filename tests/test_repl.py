@@ -0,0 +1,178 @@
+import json
+
+from repl import REPL
+
+
+def run_machine(capsys, *lines: str) -> list[dict]:
+    repl = REPL(machine=True)
+    for line in lines:
+        repl.process_line(line)
+    output = capsys.readouterr().out
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def test_machine_output(capsys):
+    records = run_machine(capsys, "a", "a -> b", "? b", "? c")
+
+    assert [record["command"] for record in records] == [
+        "statement",
+        "axiom",
+        "theorem",
+        "theorem",
+    ]
+    assert records[1]["id"] == 1
+    assert records[2]["verdict"] == "proved"
+    assert records[3]["verdict"] == "not_proved"
+    assert set(records[2]["timings"]) == {
+        "lex",
+        "parse",
+        "cnf",
+        "consistency",
+        "resolution",
+    }
+    assert records[2]["clauses"]["input"] == 3
+
+
+def test_machine_output_result_cache(capsys):
+    records = run_machine(capsys, "a", "a -> b", "? b", "? b", "a -> c", "? b")
+    assert [record.get("result_cached", False) for record in records] == [
+        False, False, False, True, False, False
+    ]
+    assert records[3]["verdict"] == "proved"
+
+
+def test_machine_output_errors(capsys):
+    records = run_machine(capsys, "a & & b", '"abc', "remove x")
+
+    assert records[0]["error"]["type"] == "parser"
+    assert records[0]["error"]["position"] == 4
+    assert records[1]["error"] == {
+        "type": "lexer",
+        "message": "Ошибка на позиции 0: Незакрытая строка",
+        "position": 0,
+    }
+    assert not records[2]["ok"]
+
+
+def test_machine_output_load(capsys, tmp_path):
+    source = tmp_path / "rules.shldn"
+    source.write_text("a\na -> b\n? b\n", encoding="utf-8")
+    records = run_machine(capsys, f"load {source}")
+
+    assert [record["command"] for record in records] == [
+        "statement",
+        "axiom",
+        "theorem",
+        "load",
+    ]
+    assert records[-1]["ok"]
+
+
+def test_parallel_load(tmp_path):
+    source = tmp_path / "rules.shldn"
+    lines = []
+    for i in range(50):
+        lines.append(f"p{i}")
+        lines.append(f"p{i} & q{i} -> r{i}")
+        lines.append(f"p{i} & ")
+    source.write_text("\n".join(lines), encoding="utf-8")
+
+    def load(workers: int) -> REPL:
+        repl = REPL()
+        repl.load_batch = 7
+        repl.load_workers = workers
+        repl.cmd_load(str(source))
+        return repl
+
+    sequential, parallel = load(1), load(3)
+    assert [str(axiom) for axiom in parallel.kb.get_all_axioms()] == [
+        str(axiom) for axiom in sequential.kb.get_all_axioms()
+    ]
+    assert [str(stmt) for stmt in parallel.kb.get_all_statements()] == [
+        str(stmt) for stmt in sequential.kb.get_all_statements()
+    ]
+    assert parallel.kb.get_clauses(50) == sequential.kb.get_clauses(50)
+
+
+def test_parallel_load_errors(capsys, tmp_path):
+    source = tmp_path / "rules.shldn"
+    source.write_text('a\n"b\n? a\n', encoding="utf-8")
+    repl = REPL(machine=True)
+    repl.load_workers = 2
+    repl.process_line(f"load {source}")
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert [record["command"] for record in records] == [
+        "statement",
+        "statement",
+        "theorem",
+        "load",
+    ]
+    assert records[1]["error"]["position"] == 0
+    assert records[2]["verdict"] == "proved"
+
+
+def test_parse_cache_shared_by_load(capsys, tmp_path):
+    source = tmp_path / "rules.shldn"
+    source.write_text("a\na -> b\na -> b\n", encoding="utf-8")
+    records = run_machine(capsys, "a -> b", f"load {source}", "a -> b")
+
+    assert "parse_cached" not in records[0]
+    assert [record.get("parse_cached", False) for record in records[1:4]] == [
+        False,
+        True,
+        True,
+    ]
+    assert records[4]["parse_cache"]["hits"] == 2
+    assert records[5]["parse_cached"]
+    assert records[5]["id"] == 4
+
+
+def test_save_and_restore(capsys, tmp_path):
+    path = tmp_path / "kb.snapshot"
+    records = run_machine(
+        capsys, "a", "a -> b", f"save {path}", "clear", f"restore {path}", "? b"
+    )
+
+    assert records[2]["ok"] and records[2]["compiled"] == 0
+    assert records[4]["axioms"] == 1
+    assert records[4]["statements"] == 1
+    assert records[5]["verdict"] == "proved"
+
+
+def test_find(capsys):
+    records = run_machine(capsys, "a -> b", "b & !c -> a", "c <-> d", "find a", "find x")
+
+    assert records[3]["positive"] == [2]
+    assert records[3]["negative"] == [1]
+    assert records[4]["positive"] == records[4]["negative"] == []
+
+
+def test_command_names_are_words(capsys, tmp_path):
+    records = run_machine(
+        capsys, "trace_x -> y", "trace_x", "find -> x", "load", "trace off", "find x"
+    )
+
+    assert [record["command"] for record in records] == [
+        "axiom", "statement", "axiom", "statement", "trace", "find"
+    ]
+    assert records[4]["ok"]
+
+    source = tmp_path / "rules.shldn"
+    source.write_text("trace_x -> y\ntrace_x\nfind -> x\ntrace on\n", encoding="utf-8")
+    repl = REPL(machine=True)
+    repl.process_line(f"load {source}")
+    assert len(repl.kb.axioms) == 2
+    assert len(repl.kb.statements) == 1
+
+
+def test_machine_output_unknown_verdict(capsys):
+    repl = REPL(machine=True)
+    repl.engine.max_clauses = 2
+    for line in ("p1 | q1", "p1 -> r", "q1 -> r", "p2 | q2", "p2 -> s", "q2 -> s",
+                 "r & s -> !t", "t", "? z"):
+        repl.process_line(line)
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert records[-1]["verdict"] == "unknown"
+    assert records[-1]["clauses"]["deleted"] > 0
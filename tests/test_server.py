@@ -0,0 +1,180 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+from server import QueryServer
+
+
+async def request(reader, writer, **fields) -> dict:
+    writer.write(json.dumps(fields, ensure_ascii=False).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+def run_server(scenario, **options):
+    """Запустить сервер на свободном порту localhost и выполнить сценарий"""
+
+    async def main():
+        server = QueryServer(**options)
+        listener = await server.start_tcp("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            async with listener:
+                return await scenario(server, port)
+        finally:
+            server.close()
+
+    return asyncio.run(main())
+
+
+def test_server_commands(tmp_path):
+    source = tmp_path / "kb.shldn"
+    source.write_text("x\nx -> y\n? y\nx & & y\n", encoding="utf-8")
+
+    async def scenario(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = [
+            await request(reader, writer, seq=1, command="add", input="a"),
+            await request(reader, writer, seq=2, command="add", input="a -> b"),
+            await request(reader, writer, seq=3, command="?", input="b"),
+            await request(reader, writer, seq=4, command="?", input="c"),
+            await request(reader, writer, seq=5, command="remove", input="1"),
+            await request(reader, writer, seq=6, command="?", input="b"),
+            await request(reader, writer, seq=7, command="remove", input="1"),
+            await request(reader, writer, seq=8, command="load", input=str(source)),
+            await request(reader, writer, seq=9, command="?", input="y"),
+            await request(reader, writer, seq=10, command="add", input="a & & b"),
+            await request(reader, writer, seq=11, command="unknown"),
+        ]
+        writer.write(b"not json\n")
+        responses.append(json.loads(await reader.readline()))
+        writer.close()
+        return responses
+
+    responses = run_server(scenario)
+    assert [r["seq"] for r in responses] == list(range(1, 12)) + [None]
+    assert responses[0] == {
+        "seq": 1, "command": "add", "ok": True, "kind": "statement", "id": 1
+    }
+    assert responses[1]["kind"] == "axiom" and responses[1]["clauses"] == 1
+    assert responses[2]["verdict"] == "proved"
+    assert responses[2]["clauses"]["derived"] > 0
+    assert set(responses[2]["timings"]) == {"parse", "consistency", "cnf", "resolution"}
+    assert responses[3]["verdict"] == "not_proved"
+    assert responses[4]["ok"] and responses[4]["id"] == 1
+    assert responses[5]["verdict"] == "not_proved"
+    assert not responses[6]["ok"]
+    assert responses[6]["error"] == {
+        "type": "error", "message": "Аксиома с ID 1 не найдена", "position": None
+    }
+    load = responses[7]
+    assert (load["lines"], load["statements"], load["axioms"]) == (4, 1, 1)
+    assert [error["line"] for error in load["errors"]] == [4]
+    assert responses[8]["verdict"] == "proved"
+    assert responses[9]["error"]["type"] == "parser"
+    assert not responses[10]["ok"]
+    assert not responses[11]["ok"]
+
+
+def test_server_concurrent_clients():
+    async def client(port, goals):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        verdicts = [
+            (await request(reader, writer, seq=i, command="?", input=goal))["verdict"]
+            for i, goal in enumerate(goals)
+        ]
+        writer.close()
+        return verdicts
+
+    async def scenario(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await request(reader, writer, command="add", input="p0")
+        for i in range(15):
+            await request(reader, writer, command="add", input=f"p{i} -> p{i + 1}")
+        goals = ["p15", "q", "p7", "p0 -> p9"]
+        results = await asyncio.gather(
+            *(client(port, goals) for _ in range(6)),
+            # Изменения базы во время доказательств не затрагивают их
+            request(reader, writer, command="add", input="x -> y"),
+        )
+        timeout = await request(reader, writer, command="?", input="p14", timeout=0)
+        stats = await request(reader, writer, command="stats")
+        writer.close()
+        return results[:-1], timeout, stats
+
+    results, timeout, stats = run_server(scenario, workers=4)
+    result_cache = stats["result_cache"]
+    assert result_cache["hits"] + result_cache["misses"] == 6 * 4 + 1
+    assert results == [["proved", "not_proved", "proved", "proved"]] * 6
+    assert not timeout["ok"] and timeout["error"]["type"] == "timeout"
+
+
+def test_server_relevance_depth():
+    async def scenario(server, port):
+        # Леммы проверки непротиворечивости доказали бы теорему при любой глубине
+        server.engine.lemmas.max_length = 0
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for line in ("a", "a -> b", "b -> c"):
+            await request(reader, writer, command="add", input=line)
+        responses = [
+            await request(reader, writer, command="?", input="c", relevance_depth=1),
+            await request(reader, writer, command="?", input="c", relevance_depth=2),
+            await request(reader, writer, command="?", input="c"),
+        ]
+        writer.close()
+        return responses
+
+    responses = run_server(scenario)
+    assert [r["verdict"] for r in responses] == ["not_proved", "proved", "proved"]
+    # Глубина по умолчанию задаётся при запуске сервера
+    responses = run_server(scenario, relevance_depth=1)
+    assert [r["verdict"] for r in responses] == ["not_proved", "proved", "not_proved"]
+
+
+@pytest.mark.parametrize("load_workers", (1, 2))
+def test_server_load_batches(tmp_path, load_workers):
+    """Файл загружается пачками; ID не зависят от числа процессов"""
+    source = tmp_path / "kb.shldn"
+    lines = [f"p{i} -> p{i + 1}" for i in range(20)]
+    lines[5:5] = ["? p1", "x & & y", "p0"]
+    source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    async def scenario(server, port):
+        server.load_batch = 3
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = [
+            await request(reader, writer, command="load", input=str(source)),
+            await request(reader, writer, command="?", input="p0 -> p20"),
+        ]
+        writer.close()
+        # Аксиомы пронумерованы в порядке строк файла
+        order = [server.kb.get_axiom_ids(f"p{i}", positive=False) for i in range(20)]
+        return responses, order
+
+    (load, proof), order = run_server(scenario, load_workers=load_workers)
+    assert (load["lines"], load["statements"], load["axioms"]) == (23, 1, 20)
+    assert [error["line"] for error in load["errors"]] == [7]
+    assert order == [{i + 1} for i in range(20)]
+    assert proof["verdict"] == "proved"
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="нет Unix-сокетов")
+def test_server_unix_socket(tmp_path):
+    path = str(tmp_path / "server.sock")
+
+    async def main():
+        server = QueryServer()
+        listener = await server.start_unix(path)
+        try:
+            async with listener:
+                reader, writer = await asyncio.open_unix_connection(path)
+                await request(reader, writer, command="add", input="a")
+                response = await request(reader, writer, command="?", input="a")
+                writer.close()
+                return response
+        finally:
+            server.close()
+
+    assert asyncio.run(main())["verdict"] == "proved"
@@ -0,0 +1,152 @@
+import pytest
+from engine import LogicalEngine
+from knowledge_base import KnowledgeBase
+from models import Variable, Conjunction, Disjunction, Equivalence, Implication, Negation
+from sqlite_knowledge_base import SQLiteKnowledgeBase
+
+
+def fill(kb):
+    kb.add_statement("игрок_1", "Первый игрок")
+    kb.add_statement("b")
+    kb.add_axiom(
+        Implication(
+            (
+                Conjunction((Variable("игрок_1"), Negation(Variable("b")), Variable("c"))),
+                Disjunction((Variable("d"), Variable("e"))),
+            )
+        ),
+        "Правило",
+    )
+    kb.add_axiom(Equivalence((Variable("x"), Variable("y"))))
+    kb.add_axiom(Implication((Variable("x"), Variable("z"))))
+    kb.add_statement("q")
+
+
+def test_sqlite_kb():
+    """Тест совпадения ответов базы SQLite и базы в памяти"""
+    kb = SQLiteKnowledgeBase()
+    reference = KnowledgeBase()
+    fill(kb)
+    fill(reference)
+
+    assert len(kb.statements) == 3
+    assert len(kb.axioms) == 3
+    assert "b" in kb.statements and "c" not in kb.statements
+    assert kb.axioms[3].id == 3 and 4 not in kb.axioms
+    assert kb.add_statement("b").id == 2
+    assert kb.get_statement("игрок_1").description == "Первый игрок"
+    assert kb.get_axiom(1).description == "Правило"
+    assert kb.get_axiom(10) is None
+    assert str(kb) == str(reference)
+
+    assert kb.get_neighbours("x") == reference.get_neighbours("x") == {"y", "z"}
+    assert kb.get_neighbours("нет") == set()
+    assert kb.relevant_symbols(["y"], 1) == reference.relevant_symbols(["y"], 1)
+    assert kb.relevant_symbols(["y"]) == {"x", "y", "z"}
+    assert [a.id for a in kb.get_axioms_with_symbols(["z", "d"])] == [1, 3]
+    assert [s.name for s in kb.get_statements_with_symbols(["q", "b", "c"])] == ["b", "q"]
+    for name in ("игрок_1", "b", "x", "z"):
+        for positive in (None, True, False):
+            assert kb.get_axiom_ids(name, positive) == reference.get_axiom_ids(
+                name, positive
+            )
+
+    def shape(components):
+        return sorted(
+            (sorted(a.id for a in axioms), sorted(s.name for s in statements))
+            for axioms, statements in components
+        )
+
+    assert shape(kb.get_components()) == shape(reference.get_components())
+
+    assert kb.remove_axiom(3)
+    assert not kb.remove_axiom(3)
+    assert kb.get_neighbours("x") == {"y"}
+    assert kb.add_axiom(Implication((Variable("y"), Variable("z")))).id == 4
+
+    # Серия изменений в batch отменяется целиком
+    with pytest.raises(RuntimeError):
+        with kb.batch():
+            kb.add_statement("новое")
+            kb.add_axiom(Implication((Variable("новое"), Variable("x"))))
+            raise RuntimeError
+    assert kb.get_statement("новое") is None
+    assert len(kb.axioms) == 3
+    assert "новое" not in kb.symbols
+    assert kb.add_axiom(Implication((Variable("x"), Variable("w")))).id == 5
+
+    version = kb.version
+    kb.clear()
+    assert kb.version == version + 1
+    assert len(kb.statements) == 0 and len(kb.axioms) == 0
+    with pytest.raises(ValueError):
+        kb.snapshot()
+    assert kb.add_statement("a").id == 1
+
+
+def test_sqlite_kb_persistence(tmp_path):
+    """Тест сохранения базы и КНФ аксиом между открытиями файла"""
+    path = str(tmp_path / "kb.sqlite")
+    kb = SQLiteKnowledgeBase(path)
+    fill(kb)
+    engine = LogicalEngine(kb)
+    engine.compile()
+    clauses = [str(c) for c in kb.get_clauses(1)]
+    literals = [list(c) for c in kb.get_clause_literals(1)]
+    kb.close()
+
+    kb = SQLiteKnowledgeBase(path)
+    assert [str(s) for s in kb.get_all_statements()] == ["[1] игрок_1", "[2] b", "[3] q"]
+    assert str(kb.get_axiom(2)) == '(2) "x" <-> "y"'
+    assert [str(c) for c in kb.get_clauses(1)] == clauses
+    assert [list(c) for c in kb.get_clause_literals(1)] == literals
+    assert kb.add_axiom(Implication((Variable("y"), Variable("w")))).id == 4
+
+    engine = LogicalEngine(kb)
+    assert engine.resolution_method(Implication((Variable("x"), Variable("w")))) is True
+
+    # Снимок базы SQLite читается обычной базой
+    snapshot = str(tmp_path / "kb.snapshot")
+    kb.save(snapshot)
+    loaded = KnowledgeBase.load(snapshot)
+    assert [str(a) for a in loaded.get_all_axioms()] == [
+        str(a) for a in kb.get_all_axioms()
+    ]
+    assert [str(c) for c in loaded.get_clauses(1)] == clauses
+    assert loaded.get_neighbours("y") == kb.get_neighbours("y")
+    assert loaded.get_axiom_ids("b", positive=True) == {1}
+    kb.close()
+
+
+def test_sqlite_snapshot(tmp_path):
+    """Тест версии базы SQLite, не меняющейся при изменениях базы"""
+    kb = SQLiteKnowledgeBase(str(tmp_path / "kb.sqlite"))
+    kb.add_statement("a")
+    kb.add_axiom(Implication((Variable("a"), Variable("b"))))
+    engine = LogicalEngine(kb)
+
+    version = engine.snapshot()
+    kb.remove_axiom(1)
+    kb.add_axiom(Implication((Variable("a"), Variable("c"))))
+    assert kb.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    assert version.kb.version == 2
+    assert list(version.kb.axioms) == [1]
+    # КНФ, построенная версией, хранится в её памяти
+    assert version.resolution_method(Variable("b")) is True
+    assert version.kb.is_compiled(1) and not kb.is_compiled(1)
+    assert version.resolution_method(Variable("c")) is False
+    with pytest.raises(ValueError):
+        version.kb.add_statement("d")
+    assert engine.resolution_method(Variable("c")) is True
+
+
+@pytest.mark.parametrize("make_kb", (KnowledgeBase, SQLiteKnowledgeBase))
+def test_statement_changes_component(make_kb):
+    """Высказывание, уже входящее в аксиому, меняет вердикт её части"""
+    engine = LogicalEngine(make_kb())
+    engine.kb.add_axiom(Implication((Variable("a"), Negation(Variable("a")))))
+    assert engine.check_correctness() is True
+    engine.kb.add_statement("a")
+    assert engine.check_correctness() is False
+    assert engine.resolution_method(Variable("b")) is None